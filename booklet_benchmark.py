@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Benchmark the booklet pipeline on synthetic PDF corpora.
+Generates text-only, image-heavy and mixed-page-size books (plus the bundled
+liesoflockelamora.pdf), runs each through the stages of process_pdf in a
+fresh process and saves pages/sec, peak RSS and output size as JSON.
+
+    python booklet_benchmark.py --sizes 16 2000 20000 --output bench.json
+    python booklet_benchmark.py --compare bench.json
+    python booklet_benchmark.py --startup
+    python booklet_benchmark.py --epub --workers 4
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Corpora generated for every requested size
+CORPUS_KINDS = ("text", "images", "mixed")
+
+DEFAULT_SIZES = (16, 256, 2000)
+
+# Bundled real-world book, benchmarked as-is
+SAMPLE_BOOK = os.path.join(HERE, "liesoflockelamora.pdf")
+
+# Page sizes cycled through by the "mixed" corpus (points)
+MIXED_PAGE_SIZES = [(612, 792), (595, 842), (420, 595), (612, 1008)]
+
+# Slower than this (relative to the baseline) counts as a regression
+REGRESSION_TOLERANCE = 0.15
+
+# Command lines timed by --startup, and whether they must stay within STARTUP_BUDGET_MS
+STARTUP_COMMANDS = [
+    ("probe", ["booklet_cli.py", "probe", SAMPLE_BOOK], True),
+    ("plan", ["booklet_cli.py", "plan", "100000", "-s", "auto"], True),
+    ("impose --help", ["booklet_cli.py", "impose", "--help"], True),
+    ("import pipeline", ["-c", "import improved_book_ordering"], False),
+]
+
+STARTUP_BUDGET_MS = 100
+
+
+def corpus_path(corpus_dir: str, kind: str, pages: int) -> str:
+    return os.path.join(corpus_dir, f"{kind}_{pages}.pdf")
+
+
+def generate_corpus(filename: str, kind: str, pages: int, seed: int = 1):
+    """Write a synthetic book; the same seed always gives the same file."""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.utils import ImageReader
+
+    rng = random.Random(seed)
+    words = ["booklet", "signature", "folio", "quire", "gathering", "press",
+             "sheet", "margin", "gutter", "recto", "verso", "colophon"]
+    images = []
+    if kind == "images":
+        from PIL import Image
+        # A handful of distinct noisy scans, reused across pages
+        for _ in range(8):
+            noise = bytes(rng.getrandbits(8) for _ in range(300 * 300 * 3))
+            images.append(ImageReader(Image.frombytes("RGB", (300, 300), noise)))
+
+    c = canvas.Canvas(filename, pagesize=letter, invariant=1)
+    for page_num in range(pages):
+        width, height = MIXED_PAGE_SIZES[page_num % len(MIXED_PAGE_SIZES)] if kind == "mixed" else letter
+        c.setPageSize((width, height))
+        c.setFont("Helvetica", 10)
+        for line in range(40):
+            text = " ".join(rng.choice(words) for _ in range(10))
+            c.drawString(50, height - 60 - line * 14, text)
+        if images:
+            c.drawImage(images[page_num % len(images)], 100, 100, width=width - 200, height=width - 200)
+        c.showPage()
+    c.save()
+
+
+def ensure_corpora(corpus_dir: str, sizes: List[int], kinds: List[str]) -> List[Dict]:
+    """Generate any missing corpus files and list the benchmark cases."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    cases = []
+    for kind in kinds:
+        for pages in sizes:
+            path = corpus_path(corpus_dir, kind, pages)
+            if not os.path.exists(path):
+                print(f" Generating {kind} corpus with {pages} pages...")
+                generate_corpus(path, kind, pages)
+            cases.append({"corpus": f"{kind}_{pages}", "path": path})
+    if os.path.exists(SAMPLE_BOOK):
+        cases.append({"corpus": "liesoflockelamora", "path": SAMPLE_BOOK})
+    return cases
+
+
+def measure_stages(input_file: str, signature_size: int, pages_per_sheet: int) -> Dict:
+    """Run process_pdf with a StageTracer attached and report each stage.
+
+    Peak RSS is the process peak when the stage finishes, so each stage's
+    figure includes everything before it.
+    """
+    from booklet_trace import StageTracer, peak_rss_kib
+    from improved_book_ordering import BookletProcessor
+
+    processor = BookletProcessor()
+    processor.quiet = True
+    processor.tracer = StageTracer()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, "booklet.pdf")
+        with redirect_stdout(io.StringIO()):
+            if not processor.process_pdf(input_file, signature_size, pages_per_sheet, output_file):
+                raise RuntimeError(f"Could not impose {input_file}")
+        output_bytes = os.path.getsize(output_file)
+
+    stages = {
+        name: {
+            "seconds": round(record["wall_seconds"], 6),
+            "pages_per_sec": round(record["pages_per_sec"], 1) if record["pages_per_sec"] else None,
+            "peak_rss_kib": record["peak_rss_kib"],
+        }
+        for name, record in processor.tracer.summary().items()
+    }
+    total_pages = processor.last_result["original_pages"]
+    total_seconds = sum(stage["seconds"] for stage in stages.values())
+    return {
+        "pages": total_pages,
+        "blank_pages": processor.last_result["blank_pages"],
+        "input_bytes": os.path.getsize(input_file),
+        "output_bytes": output_bytes,
+        "seconds": round(total_seconds, 6),
+        "pages_per_sec": round(total_pages / total_seconds, 1),
+        "peak_rss_kib": peak_rss_kib(),
+        "stages": stages,
+    }
+
+
+def run_case(case: Dict, signature_size: int, pages_per_sheet: int) -> Dict:
+    """Measure one corpus in a freshly spawned process so RSS peaks don't mix."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        result = executor.submit(measure_stages, case["path"], signature_size, pages_per_sheet).result()
+    return {"corpus": case["corpus"], **result}
+
+
+def measure_epub(input_file: str, workers: int) -> Dict:
+    """Convert ``input_file`` to EPUB and report pages/sec."""
+    from pdf_epub import convert_pdf_to_epub
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        result = convert_pdf_to_epub(input_file, os.path.join(tmp, "book.epub"), "Benchmark", "Benchmark",
+                                     workers=workers)
+        seconds = time.perf_counter() - start
+    return {**result, "workers": workers, "seconds": round(seconds, 6),
+            "pages_per_sec": round(result["pages"] / seconds, 1)}
+
+
+def measure_startup(repeats: int = 5) -> List[Dict]:
+    """Wall time of short command lines, each in a fresh interpreter."""
+    results = []
+    for name, arguments, budgeted in STARTUP_COMMANDS:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + arguments, cwd=HERE, stdout=subprocess.DEVNULL, check=True)
+            times.append((time.perf_counter() - start) * 1000)
+        results.append({"command": name, "budgeted": budgeted,
+                        "min_ms": round(min(times), 1), "median_ms": round(statistics.median(times), 1)})
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current: Dict, baseline: Dict) -> List[str]:
+    """Regressions of the current run against a saved baseline."""
+    previous = {result["corpus"]: result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(result["corpus"])
+        if before is None:
+            continue
+        for stage, numbers in result["stages"].items():
+            old = before["stages"].get(stage)
+            if not old or not old["pages_per_sec"] or not numbers["pages_per_sec"]:
+                continue
+            if numbers["pages_per_sec"] < old["pages_per_sec"] * (1 - REGRESSION_TOLERANCE):
+                regressions.append(f"{result['corpus']} {stage}: {old['pages_per_sec']} -> "
+                                   f"{numbers['pages_per_sec']} pages/sec")
+        if result["output_bytes"] > before["output_bytes"] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(f"{result['corpus']} output: {before['output_bytes']} -> "
+                               f"{result['output_bytes']} bytes")
+    return regressions
+
+
+def print_table(results: List[Dict]):
+    print(f"\n{'corpus':<22}{'pages':>7}{'pages/s':>10}{'read':>10}{'number':>10}"
+          f"{'serialize':>11}{'RSS MiB':>9}{'out KiB':>10}")
+    for result in results:
+        stages = result["stages"]
+        rss = f"{result['peak_rss_kib'] / 1024:>9.1f}" if result["peak_rss_kib"] is not None else f"{'-':>9}"
+        print(f"{result['corpus']:<22}{result['pages']:>7}{result['pages_per_sec']:>10}"
+              f"{stages['read']['pages_per_sec']:>10}{stages['number_and_impose']['pages_per_sec']:>10}"
+              f"{stages['serialize']['pages_per_sec']:>11}{rss}"
+              f"{result['output_bytes'] / 1024:>10.0f}")
+
+
+def run_startup(repeats: int) -> int:
+    """Handle --startup: light commands must start within STARTUP_BUDGET_MS."""
+    results = measure_startup(repeats)
+    print(f"\n{'command':<18}{'min ms':>9}{'median ms':>11}")
+    over_budget = []
+    for result in results:
+        print(f"{result['command']:<18}{result['min_ms']:>9}{result['median_ms']:>11}")
+        if result["budgeted"] and result["median_ms"] > STARTUP_BUDGET_MS:
+            over_budget.append(result["command"])
+    for command in over_budget:
+        print(f"Warning: '{command}' takes over {STARTUP_BUDGET_MS} ms to start")
+    return 1 if over_budget else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the booklet pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="page counts to generate (16 to 20000)")
+    parser.add_argument("--kinds", nargs="+", choices=CORPUS_KINDS, default=list(CORPUS_KINDS))
+    parser.add_argument("-s", "--signature-size", type=int, default=16)
+    parser.add_argument("-p", "--pages-per-sheet", type=int, default=2)
+    parser.add_argument("--corpus-dir", default=os.path.join(HERE, ".bench_corpus"))
+    parser.add_argument("-o", "--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--startup", action="store_true",
+                        help="time command line startup instead of the pipeline")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per command for --startup")
+    parser.add_argument("--epub", action="store_true",
+                        help="time PDF to EPUB conversion of liesoflockelamora.pdf instead")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1],
+                        help="worker counts to try with --epub")
+    args = parser.parse_args(argv)
+
+    if args.epub:
+        for workers in args.workers:
+            result = measure_epub(SAMPLE_BOOK, workers)
+            print(f" {workers} worker(s): {result['pages']} pages in {result['seconds']:.2f}s, "
+                  f"{result['pages_per_sec']} pages/sec, {result['output_bytes'] / 1024:.0f} KiB")
+        return 0
+
+    if args.startup:
+        return run_startup(args.repeats)
+
+    cases = ensure_corpora(args.corpus_dir, args.sizes, args.kinds)
+    results = []
+    for case in cases:
+        print(f" Benchmarking {case['corpus']}...")
+        results.append(run_case(case, args.signature_size, args.pages_per_sheet))
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "signature_size": args.signature_size,
+        "pages_per_sheet": args.pages_per_sheet,
+        "results": results,
+    }
+    print_table(results)
+
+    with open(args.output, "w") as output_fp:
+        json.dump(report, output_fp, indent=2)
+    print(f"\n Results saved as '{args.output}'")
+
+    if args.compare:
+        with open(args.compare) as baseline_fp:
+            regressions = compare_results(report, json.load(baseline_fp))
+        for regression in regressions:
+            print(f"Warning: Regression {regression}")
+        if regressions:
+            return 1
+        print("OK No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
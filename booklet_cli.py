@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Command line of the booklet program.
+Only the planning and probing modules are imported up front; the PDF
+machinery (PyPDF2, ReportLab) is loaded by the commands that impose, so
+``probe``, ``plan`` and ``--help`` answer without paying for it.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from imposition_plan import (CUTTING_LINE_MODES, NUMBER_POSITIONS, SIGNATURE_SIZES, check_signature_size,
+                             describe_layout, parse_range, parse_signature_size, plan_job, sheet_grid)
+from pdf_probe import describe_sizes, probe_pdf
+
+if TYPE_CHECKING:
+    from booklet_trace import StageTracer
+    from result_cache import ResultCache
+
+
+def collect_batch_inputs(source: str) -> List[str]:
+    """PDF files in a directory, or the files matching a glob pattern."""
+    import glob
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.pdf")
+    return sorted(path for path in glob.glob(source)
+                  if path.lower().endswith('.pdf') and os.path.isfile(path))
+
+
+def collect_inputs(sources: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """PDF files named by several files, directories or glob patterns, in order.
+    
+    Also returns the sources that name no file (a directory always counts,
+    even an empty one), so a mistyped path can be reported rather than
+    silently left out.
+    """
+    input_files, unmatched = [], []
+    for source in sources:
+        matches = collect_batch_inputs(source)
+        if not matches and not os.path.isdir(source):
+            unmatched.append(source)
+        input_files += matches
+    return input_files, unmatched
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """Handle the ``batch`` command."""
+    try:
+        signature_size = parse_signature_size(args.signature_size)
+        check_signature_size(signature_size, args.pages_per_sheet, args.allowed_sizes)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    
+    input_files = collect_batch_inputs(args.source)
+    # Booklets an earlier run wrote next to their inputs are not books to impose again
+    booklets = [path for path in input_files if path.endswith("_booklet.pdf")]
+    if booklets:
+        input_files = [path for path in input_files if not path.endswith("_booklet.pdf")]
+        print(f" Skipping {len(booklets)} booklet(s) from an earlier run")
+    if not input_files:
+        print(f"Error: No PDF files found for '{args.source}'")
+        return 1
+    
+    from improved_book_ordering import batch_process, write_batch_summary
+    
+    print(f" Imposing {len(input_files)} file(s) with {args.workers or os.cpu_count()} worker(s)...")
+    start = time.perf_counter()
+    results = batch_process(input_files, signature_size, args.pages_per_sheet, args.output_dir, args.workers,
+                            args.streaming, args.optimize, open_cache(args), args.allowed_sizes)
+    elapsed = time.perf_counter() - start
+    
+    for result in results:
+        status = "OK" if result["success"] else "FAIL"
+        print(f"   {status} {result['input']}: {result['pages']} pages, "
+              f"{result['blank_pages']} blank, {result['seconds']:.2f}s, "
+              f"{result['output_bytes']} bytes {result['error']}".rstrip())
+    
+    summary_file = args.summary or os.path.join(args.output_dir or ".", "batch_summary.csv")
+    write_batch_summary(results, summary_file)
+    
+    failed = sum(1 for result in results if not result["success"])
+    print(f"\n Done in {elapsed:.2f}s: {len(results) - failed} succeeded, {failed} failed")
+    print(f" Summary saved as '{summary_file}'")
+    return 1 if failed else 0
+
+
+def run_impose(args: argparse.Namespace) -> int:
+    """Handle the ``impose`` command."""
+    try:
+        signature_size = parse_signature_size(args.signature_size)
+        check_signature_size(signature_size, args.pages_per_sheet, args.allowed_sizes)
+        if args.sheets:
+            sheet_grid(args.pages_per_sheet)
+        if args.number_size <= 0:
+            raise ValueError(f"Page number size must be positive, got {args.number_size:g}")
+        reprint = args.reprint_sheets or args.reprint_signatures
+        reprint_range = parse_range(reprint) if reprint else None
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    try:
+        args.number_format.format(n=1)
+    except (KeyError, IndexError, AttributeError, TypeError, ValueError) as e:
+        print(f"Error: Page number format '{args.number_format}' is not a format of {{n}}: {e}")
+        return 2
+    
+    from improved_book_ordering import BookletProcessor
+    
+    stem = os.path.splitext(os.path.basename(args.input))[0]
+    if reprint_range:
+        kind = "sheets" if args.reprint_sheets else "signatures"
+        output_file = args.output or f"{stem}_{kind}_{reprint_range[0]}-{reprint_range[1]}.pdf"
+    else:
+        output_file = args.output or f"{stem}_booklet.pdf"
+    processor = BookletProcessor()
+    processor.sheet_layout = args.sheets
+    processor.head_to_head = args.head_to_head
+    processor.sewing_marks = args.sewing_marks
+    processor.cutting_lines = args.cutting_lines
+    processor.number_format = args.number_format
+    processor.number_position = args.number_position
+    processor.number_size = args.number_size
+    processor.quiet = args.quiet
+    processor.optimize = args.optimize
+    processor.cache = open_cache(args)
+    processor.signature_sizes = tuple(args.allowed_sizes)
+    processor.manifest = args.manifest
+    if args.trace:
+        from booklet_trace import StageTracer
+        processor.tracer = StageTracer(track_allocations=args.trace_allocations)
+    
+    if args.reprint_sheets:
+        success = processor.reprint_sheets(args.input, signature_size, args.pages_per_sheet, output_file,
+                                           sheets=reprint_range)
+    elif args.reprint_signatures:
+        success = processor.reprint_sheets(args.input, signature_size, args.pages_per_sheet, output_file,
+                                           signatures=reprint_range)
+    else:
+        success = processor.process_pdf(args.input, signature_size, args.pages_per_sheet, output_file,
+                                        streaming=args.streaming, workers=args.workers)
+    
+    if args.trace:
+        print_trace_summary(processor.tracer)
+        processor.tracer.save(args.trace, args.trace_format)
+        print(f" Trace saved as '{args.trace}'")
+    return 0 if success else 1
+
+
+def run_update(args: argparse.Namespace) -> int:
+    """Handle the ``update`` command."""
+    from improved_book_ordering import BookletProcessor
+    
+    processor = BookletProcessor()
+    processor.quiet = args.quiet
+    success = processor.update_pdf(args.input, args.previous, args.output)
+    return 0 if success else 1
+
+
+def run_merge(args: argparse.Namespace) -> int:
+    """Handle the ``merge`` command."""
+    from improved_book_ordering import BookletProcessor
+    from pdf_merge import read_merge_list
+    
+    input_files, unmatched = collect_inputs(args.inputs)
+    if unmatched:
+        print(f"Error: No PDF files found for '{unmatched[0]}'")
+        return 1
+    if args.list:
+        try:
+            input_files += read_merge_list(args.list)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return 2
+    # Merge lists name files directly; check each one exists
+    missing = [path for path in input_files if not os.path.isfile(path)]
+    if missing:
+        print(f"Error: File '{missing[0]}' not found")
+        return 1
+    
+    processor = BookletProcessor()
+    processor.quiet = args.quiet
+    processor.optimize = args.optimize
+    success = processor.merge_pdfs(input_files, args.output)
+    return 0 if success else 1
+
+
+def run_epub(args: argparse.Namespace) -> int:
+    """Handle the ``epub`` command."""
+    from pdf_epub import convert_pdf_to_epub
+    
+    if not os.path.isfile(args.input):
+        print(f"Error: File '{args.input}' not found")
+        return 1
+    stem = os.path.splitext(os.path.basename(args.input))[0]
+    output_file = args.output or f"{stem}.epub"
+    # Like the browser version, the title defaults to the file name
+    title = args.title or stem.replace("_", " ").replace("-", " ")
+    
+    print(f"\n Converting '{args.input}' to EPUB with {args.workers} worker(s)...")
+    start = time.perf_counter()
+    try:
+        result = convert_pdf_to_epub(args.input, output_file, title, args.author, args.language,
+                                     args.description, args.pages_per_chapter, args.workers)
+    except Exception as e:
+        print(f"Error: Error converting PDF to EPUB: {str(e)}")
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"OK Success! EPUB saved as '{output_file}'")
+    print(f" {result['pages']} pages in {result['chapters']} chapter(s), {result['images']} image(s), "
+          f"{result['pages'] / elapsed:.1f} pages/s")
+    return 0
+
+
+def run_cover(args: argparse.Namespace) -> int:
+    """Handle the ``cover`` command."""
+    from epub_cover import replace_cover
+    
+    for path in (args.input, args.cover):
+        if not os.path.isfile(path):
+            print(f"Error: File '{path}' not found")
+            return 1
+    output_file = args.output or os.path.splitext(os.path.basename(args.input))[0] + "_cover.epub"
+    # With -o - the EPUB goes to stdout, so messages go to stderr
+    log = sys.stderr if output_file == "-" else sys.stdout
+    with open(args.cover, "rb") as cover_fp:
+        cover_data = cover_fp.read()
+    try:
+        with open(args.input, "rb") as input_fp:
+            if output_file == "-":
+                result = replace_cover(input_fp, sys.stdout.buffer, cover_data, args.cover)
+                sys.stdout.buffer.flush()
+            else:
+                with open(output_file, "wb") as output_fp:
+                    result = replace_cover(input_fp, output_fp, cover_data, args.cover)
+    except Exception as e:
+        print(f"Error: Error processing EPUB: {str(e)}", file=log)
+        return 1
+    if output_file != "-":
+        print(f"OK Success! EPUB saved as '{output_file}'", file=log)
+    print(f" Cover {result['cover']}, {result['entries_copied']} entries copied unchanged "
+          f"({result['bytes_copied'] / 1024:.0f} KiB), {result['bytes_rewritten'] / 1024:.0f} KiB rewritten", file=log)
+    return 0
+
+
+def pages_per_chapter(value: str):
+    """A chapter length as typed: a page count or 'all'."""
+    if value.lower() == "all":
+        return "all"
+    if not value.isdigit() or int(value) < 1:
+        raise argparse.ArgumentTypeError(f"expected a page count or 'all', got '{value}'")
+    return int(value)
+
+
+def run_gang(args: argparse.Namespace) -> int:
+    """Handle the ``gang`` command."""
+    try:
+        signature_size = parse_signature_size(args.signature_size)
+        check_signature_size(signature_size, args.pages_per_sheet, args.allowed_sizes)
+        sheet_grid(args.pages_per_sheet)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    
+    from improved_book_ordering import BookletProcessor
+    
+    input_files, unmatched = collect_inputs(args.inputs)
+    if unmatched:
+        print(f"Error: No PDF files found for '{unmatched[0]}'")
+        return 1
+    
+    manifest_file = args.manifest or os.path.splitext(args.output)[0] + ".gang.json"
+    processor = BookletProcessor()
+    processor.head_to_head = args.head_to_head
+    processor.cutting_lines = args.cutting_lines
+    processor.quiet = args.quiet
+    processor.optimize = args.optimize
+    processor.signature_sizes = tuple(args.allowed_sizes)
+    success = processor.gang_run(input_files, signature_size, args.pages_per_sheet, args.output, manifest_file)
+    return 0 if success else 1
+
+
+def run_plan(args: argparse.Namespace) -> int:
+    """Handle the ``plan`` command."""
+    try:
+        signature_size = parse_signature_size(args.signature_size)
+        check_signature_size(signature_size, args.pages_per_sheet, args.allowed_sizes)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    
+    if args.input.isdigit():
+        total_pages = int(args.input)
+    else:
+        try:
+            total_pages = probe_pdf(args.input)["pages"]
+        except Exception as e:
+            print(f"Error: {args.input}: {e}")
+            return 1
+        if total_pages is None:
+            print(f"Error: {args.input}: encrypted, password required")
+            return 1
+    
+    try:
+        if args.map:
+            with open(args.map, "w") as map_fp:
+                summary = plan_job(total_pages, signature_size, args.pages_per_sheet, args.allowed_sizes, map_fp)
+        else:
+            summary = plan_job(total_pages, signature_size, args.pages_per_sheet, args.allowed_sizes)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    layout = summary["layout"]
+    print(f" {total_pages} pages: {len(layout)} signature(s) of {describe_layout(layout)}")
+    print(f" {summary['blank_pages']} blank page(s), {summary['press_sheets']} press sheet(s) "
+          f"at {args.pages_per_sheet} pages per sheet")
+    if args.map:
+        print(f" Sheet map saved as '{args.map}'")
+    return 0
+
+
+def print_trace_summary(tracer: "StageTracer"):
+    """One line per top-level stage of a traced run."""
+    print("\n Stage timings:")
+    for name, record in tracer.summary().items():
+        rate = f", {record['pages_per_sec']:.1f} pages/s" if record["pages_per_sec"] else ""
+        print(f"   {name}: {record['wall_seconds']:.3f}s wall, {record['cpu_seconds']:.3f}s CPU, "
+              f"{record['pages']} pages{rate}")
+
+
+def run_probe(args: argparse.Namespace) -> int:
+    """Handle the ``probe`` command."""
+    input_files = [path for source in args.inputs for path in collect_batch_inputs(source)]
+    if not input_files:
+        print(f"Error: No PDF files found for {' '.join(args.inputs)}")
+        return 1
+    
+    results, failed = [], 0
+    for input_file in input_files:
+        try:
+            results.append(probe_pdf(input_file))
+        except Exception as e:
+            failed += 1
+            results.append({"path": input_file, "error": str(e)})
+    
+    if args.json:
+        import json
+        print(json.dumps(results, indent=2))
+        return 1 if failed else 0
+    
+    for result in results:
+        if "error" in result:
+            print(f"Error: {result['path']}: {result['error']}")
+        elif result["pages"] is None:
+            print(f" {result['path']}: encrypted, password required")
+        else:
+            encrypted = "encrypted" if result["encrypted"] else "not encrypted"
+            print(f" {result['path']}: {result['pages']} pages, {describe_sizes(result['media_boxes'])}, "
+                  f"{encrypted} [{result['method']}, {result['seconds'] * 1000:.1f} ms]")
+    return 1 if failed else 0
+
+
+def add_signature_arguments(parser: argparse.ArgumentParser, default: str = "16"):
+    parser.add_argument("-s", "--signature-size", default=default,
+                        help="pages per signature, a mix such as 32+32+8, or 'auto' for the mix "
+                             f"with the fewest blank pages (default: {default})")
+    parser.add_argument("--allowed-sizes", type=int, nargs="+", default=list(SIGNATURE_SIZES), metavar="SIZE",
+                        help="signature sizes the bindery accepts, for -s auto")
+
+
+def open_cache(args: argparse.Namespace) -> Optional["ResultCache"]:
+    """The result cache selected on the command line, if any."""
+    if not args.cache_dir:
+        return None
+    from result_cache import DEFAULT_CACHE_BYTES, ResultCache
+    max_bytes = DEFAULT_CACHE_BYTES if args.cache_size is None else int(args.cache_size * 1024 * 1024)
+    return ResultCache(args.cache_dir, max_bytes)
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--cache-dir", help="reuse booklets already imposed with the same input and settings")
+    parser.add_argument("--cache-size", type=float, metavar="MIB",
+                        help="evict least recently used booklets past this size (default: 1024)")
+
+
+def worker_count(value: str) -> int:
+    """A number of worker processes as typed: 1 or more."""
+    if not value.isdigit() or int(value) < 1:
+        raise argparse.ArgumentTypeError(f"expected at least 1 worker, got '{value}'")
+    return int(value)
+
+
+def add_impose_command(commands):
+    impose = commands.add_parser("impose", help="impose a single PDF without prompts")
+    impose.add_argument("input", help="PDF to impose")
+    add_signature_arguments(impose)
+    impose.add_argument("-p", "--pages-per-sheet", type=int, default=2)
+    impose.add_argument("-o", "--output", help="output PDF (default: <name>_booklet.pdf)")
+    impose.add_argument("-w", "--workers", type=worker_count, default=1,
+                        help="impose signature chunks in this many worker processes")
+    impose.add_argument("--streaming", action="store_true",
+                        help="write one signature at a time to bound memory on very large books")
+    impose.add_argument("--sheets", action="store_true",
+                        help="lay pages out N-up on press sheets (2, 4, 8 or 16 per sheet)")
+    impose.add_argument("--head-to-head", action="store_true",
+                        help="with --sheets, turn every second row 180 degrees")
+    impose.add_argument("--sewing-marks", type=int, default=0, metavar="HOLES",
+                        help="sewing-hole marks per fold (default: none)")
+    impose.add_argument("--cutting-lines", choices=CUTTING_LINE_MODES, default="none")
+    impose.add_argument("--number-format", default="{n}",
+                        help="page number text, {n} being the number, e.g. 'Page {n}' (default: {n})")
+    impose.add_argument("--number-position", choices=NUMBER_POSITIONS, default="bottom-center",
+                        help="outside = right on odd pages, left on even ones")
+    impose.add_argument("--number-size", type=float, default=12, metavar="POINTS")
+    impose.add_argument("--optimize", action="store_true",
+                        help="merge duplicate objects and compress the output (PDF 1.5 object streams)")
+    impose.add_argument("-q", "--quiet", action="store_true", help="skip per-signature progress lines")
+    impose.add_argument("--trace", metavar="FILE", help="save per-stage timings to FILE")
+    impose.add_argument("--trace-format", choices=("json", "chrome"), default="json",
+                        help="plain JSON records or Chrome trace events (chrome://tracing, Perfetto)")
+    impose.add_argument("--trace-allocations", action="store_true",
+                        help="also record allocations per stage with tracemalloc (slower)")
+    impose.add_argument("--manifest", action="store_true",
+                        help="save a manifest next to the booklet so 'update' can rebuild only changed signatures")
+    add_cache_arguments(impose)
+    reprint = impose.add_mutually_exclusive_group()
+    reprint.add_argument("--reprint-sheets", metavar="RANGE",
+                         help="impose only these press sheets (e.g. 212-218, numbered as in the sheet map), "
+                              "with the job's settings")
+    reprint.add_argument("--reprint-signatures", metavar="RANGE",
+                         help="impose only these signatures (e.g. 3-4), with the job's settings")
+    impose.set_defaults(func=run_impose)
+
+
+def add_update_command(commands):
+    update = commands.add_parser("update", help="re-impose a revised PDF, rebuilding only the changed signatures")
+    update.add_argument("input", help="revised PDF")
+    update.add_argument("previous", help="booklet imposed from the earlier version with --manifest")
+    update.add_argument("-o", "--output", help="output PDF (default: replace the previous booklet)")
+    update.add_argument("-q", "--quiet", action="store_true", help="skip per-signature progress lines")
+    update.set_defaults(func=run_update)
+
+
+def add_probe_command(commands):
+    probe = commands.add_parser("probe", help="page count, page sizes and encryption of PDFs, fast")
+    probe.add_argument("inputs", nargs="+", help="PDFs, directories of PDFs or globs")
+    probe.add_argument("--json", action="store_true", help="print the full results (every media box) as JSON")
+    probe.set_defaults(func=run_probe)
+
+
+def add_merge_command(commands):
+    merge = commands.add_parser("merge", help="merge chapter PDFs, in order, into one book")
+    merge.add_argument("inputs", nargs="*", help="PDFs, directories of PDFs or globs, in order")
+    merge.add_argument("--list", metavar="FILE",
+                       help="merge list: one path per line, or a JSON array (added after INPUTS)")
+    merge.add_argument("-o", "--output", required=True, help="merged PDF")
+    merge.add_argument("--optimize", action="store_true",
+                       help="compress the output (PDF 1.5 object streams)")
+    merge.add_argument("-q", "--quiet", action="store_true", help="skip the per-file lines")
+    merge.set_defaults(func=run_merge)
+
+
+def add_gang_command(commands):
+    gang = commands.add_parser("gang", help="pack several short booklets onto shared press sheets")
+    gang.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns, one job each")
+    add_signature_arguments(gang, default="auto")
+    gang.add_argument("-p", "--pages-per-sheet", type=int, default=4,
+                      help="pages per press sheet side (default: 4)")
+    gang.add_argument("-o", "--output", required=True, help="output PDF of press sheets")
+    gang.add_argument("--manifest", metavar="FILE",
+                      help="cut and collate manifest (default: <output>.gang.json)")
+    gang.add_argument("--head-to-head", action="store_true", help="turn every second row 180 degrees")
+    gang.add_argument("--cutting-lines", choices=CUTTING_LINE_MODES, default="both")
+    gang.add_argument("--optimize", action="store_true",
+                      help="merge duplicate objects and compress the output (PDF 1.5 object streams)")
+    gang.add_argument("-q", "--quiet", action="store_true", help="skip per-sheet progress lines")
+    gang.set_defaults(func=run_gang)
+
+
+def add_epub_command(commands):
+    epub = commands.add_parser("epub", help="convert a PDF's text and images to an EPUB")
+    epub.add_argument("input", help="PDF to convert")
+    epub.add_argument("-o", "--output", help="output EPUB (default: <name>.epub)")
+    epub.add_argument("--title", help="book title (default: from the file name)")
+    epub.add_argument("--author", required=True)
+    epub.add_argument("--language", default="en")
+    epub.add_argument("--description", default="")
+    epub.add_argument("--pages-per-chapter", type=pages_per_chapter, default=10, metavar="PAGES",
+                      help="pages per chapter, or 'all' for one chapter (default: 10)")
+    epub.add_argument("-w", "--workers", type=worker_count, default=1,
+                      help="extract pages in this many worker processes")
+    epub.set_defaults(func=run_epub)
+
+
+def add_cover_command(commands):
+    cover = commands.add_parser("cover", help="set an EPUB's cover image")
+    cover.add_argument("input", help="EPUB to update")
+    cover.add_argument("cover", help="cover image (JPEG, PNG, GIF or WebP)")
+    cover.add_argument("-o", "--output", help="output EPUB, or - for stdout (default: <name>_cover.epub)")
+    cover.set_defaults(func=run_cover)
+
+
+def add_plan_command(commands):
+    plan = commands.add_parser("plan", help="signature layout, blank pages and press sheets, without imposing")
+    plan.add_argument("input", help="PDF to plan for, or a page count")
+    add_signature_arguments(plan)
+    plan.add_argument("-p", "--pages-per-sheet", type=int, default=2)
+    plan.add_argument("--map", metavar="FILE",
+                      help="save every press sheet's sides, slots and source pages as JSON")
+    plan.set_defaults(func=run_plan)
+
+
+def add_batch_command(commands):
+    batch = commands.add_parser("batch", help="impose every PDF in a directory or glob")
+    batch.add_argument("source", help="directory of PDFs or a glob such as 'orders/*.pdf'")
+    add_signature_arguments(batch)
+    batch.add_argument("-p", "--pages-per-sheet", type=int, default=2)
+    batch.add_argument("-o", "--output-dir", help="write booklets here instead of next to each input")
+    batch.add_argument("-w", "--workers", type=worker_count, help="worker processes (default: CPU count)")
+    batch.add_argument("--summary", help="CSV summary path (default: batch_summary.csv)")
+    batch.add_argument("--streaming", action="store_true",
+                       help="write one signature at a time to bound memory on very large books")
+    batch.add_argument("--optimize", action="store_true",
+                       help="merge duplicate objects and compress the output (PDF 1.5 object streams)")
+    add_cache_arguments(batch)
+    batch.set_defaults(func=run_batch)
+
+
+# Every command and the function setting up its arguments
+COMMANDS = {
+    "impose": add_impose_command,
+    "update": add_update_command,
+    "probe": add_probe_command,
+    "merge": add_merge_command,
+    "gang": add_gang_command,
+    "epub": add_epub_command,
+    "cover": add_cover_command,
+    "plan": add_plan_command,
+    "batch": add_batch_command,
+}
+
+
+def build_parser(command: Optional[str] = None) -> argparse.ArgumentParser:
+    """Command line interface; running without a command starts the interactive program.
+    
+    With ``command`` only that command is set up, which is all parsing its
+    command line needs; building every command's options is a good part
+    of a light command's startup.
+    """
+    parser = argparse.ArgumentParser(description="Prepare PDFs for booklet printing.")
+    commands = parser.add_subparsers(dest="command")
+    for name, add_command in COMMANDS.items():
+        if command is None or command == name:
+            add_command(commands)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the program."""
+    if argv is None:
+        argv = sys.argv[1:]
+    # Anything but a known command (no command, --help, a typo) gets the full parser
+    command = argv[0] if argv and argv[0] in COMMANDS else None
+    args = build_parser(command).parse_args(argv)
+    
+    if args.command is None:
+        from improved_book_ordering import BookletProcessor
+        processor = BookletProcessor()
+        processor.run()
+        return 0
+    
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
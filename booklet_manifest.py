@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Booklet manifests for incremental re-imposition.
+A manifest sits next to a booklet and records the settings it was imposed
+with, a content hash of every source page and which source pages each
+output sheet carries. When a revised input arrives, only the signatures
+holding changed pages need imposing again; the rest are copied from the
+previous booklet.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, List, Sequence
+
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Bump when the manifest layout or the page hash changes
+MANIFEST_FORMAT = 1
+
+
+def manifest_path(output_file: str) -> str:
+    """Where the manifest of ``output_file`` lives: book_booklet.pdf -> book_booklet.manifest.json"""
+    return os.path.splitext(output_file)[0] + ".manifest.json"
+
+
+def page_fingerprints(pages) -> List[str]:
+    """Content hash of every page: its dictionary, content streams and resources.
+
+    Objects shared between pages (fonts, images) are hashed once. Other
+    pages a page points at (link targets) count by reference only, so
+    editing one page doesn't mark the pages linking to it as changed.
+    """
+    memo: Dict[tuple, bytes] = {}
+    return [_digest(page, memo, top=True).hex()[:32] for page in pages]
+
+
+def _digest(obj, memo: Dict[tuple, bytes], top: bool = False) -> bytes:
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            # Placeholder while the object is hashed, in case it refers back to itself
+            memo[key] = b"cycle"
+            target = obj.get_object()
+            if isinstance(target, DictionaryObject) and target.get("/Type") == "/Page":
+                memo[key] = b"page"
+            else:
+                memo[key] = _digest(target, memo)
+        return memo[key]
+
+    digest = hashlib.sha256(type(obj).__name__.encode())
+    if isinstance(obj, DictionaryObject):
+        for name, value in sorted(dict.items(obj)):
+            if name == "/Parent" and top:
+                continue
+            digest.update(name.encode())
+            digest.update(_digest(value, memo))
+        if isinstance(obj, StreamObject):
+            digest.update(obj._data)
+    elif isinstance(obj, ArrayObject):
+        for value in obj:
+            digest.update(_digest(value, memo))
+    else:
+        digest.update(repr(obj).encode())
+    return digest.digest()
+
+
+def sheet_map(plan, layout: Sequence[int], pages_per_sheet: int, sheet_layout: bool) -> List[Dict]:
+    """Output page range and source pages of every signature and press sheet.
+
+    A press sheet carries 2 x pages_per_sheet plan entries (a signature's
+    last sheet may carry fewer); it is two output pages when laid out N-up,
+    otherwise one output page per entry.
+    """
+    signatures = []
+    output_page = 0
+    start = 0
+    for size in layout:
+        sheets = []
+        for first in range(start, start + size, 2 * pages_per_sheet):
+            entries = [int(index) for index in plan[first:min(first + 2 * pages_per_sheet, start + size)]]
+            count = 2 if sheet_layout else len(entries)
+            sheets.append({
+                "output_pages": [output_page, output_page + count],
+                "source_pages": [index for index in entries if index >= 0],
+            })
+            output_page += count
+        signatures.append({
+            "output_pages": [sheets[0]["output_pages"][0], output_page],
+            "source_pages": sorted(index for sheet in sheets for index in sheet["source_pages"]),
+            "sheets": sheets,
+        })
+        start += size
+    return signatures
+
+
+def output_stamp(output_file: str) -> List[int]:
+    """Size and modification time of a booklet, to tell whether it changed since its manifest."""
+    stat = os.stat(output_file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build_manifest(settings: Dict, layout: Sequence[int], fingerprints: List[str], plan,
+                   output_file: str, output_pages: int) -> Dict:
+    """``output_pages`` is the page count actually written, checked against the sheet map on update."""
+    return {
+        "format": MANIFEST_FORMAT,
+        "settings": settings,
+        "output": output_stamp(output_file),
+        "output_pages": output_pages,
+        "layout": list(layout),
+        "source_pages": len(fingerprints),
+        "page_hashes": fingerprints,
+        "signatures": sheet_map(plan, layout, settings["pages_per_sheet"], settings["sheet_layout"]),
+    }
+
+
+def changed_signatures(manifest: Dict, fingerprints: List[str]) -> List[int]:
+    """Indices of the signatures holding a page whose hash differs from the manifest's."""
+    changed = {page for page, (old, new) in enumerate(zip(manifest["page_hashes"], fingerprints))
+               if old != new}
+    return [number for number, signature in enumerate(manifest["signatures"])
+            if changed.intersection(signature["source_pages"])]
+
+
+def load_manifest(path: str) -> Dict:
+    """Read a manifest; raises OSError or ValueError if it is missing or unusable."""
+    with open(path) as manifest_fp:
+        manifest = json.load(manifest_fp)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError(f"Unsupported manifest format in '{path}'")
+    return manifest
+
+
+def save_manifest(path: str, manifest: Dict):
+    """Write a manifest atomically, so a crash never leaves half of one."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as manifest_fp:
+            json.dump(manifest, manifest_fp)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+Local HTTP job service for booklet imposition.
+PDF uploads are streamed to disk and queued as jobs; each job runs the
+same work as one batch file in a process pool, so the event loop only
+moves bytes. Finished booklets are streamed back.
+
+    python booklet_service.py serve --port 8080 --workers 4
+    curl --data-binary @book.pdf 'http://127.0.0.1:8080/jobs?signature_size=16'
+    curl 'http://127.0.0.1:8080/jobs/<id>?wait=60'
+    curl -o booklet.pdf 'http://127.0.0.1:8080/jobs/<id>/booklet'
+    python booklet_service.py load http://127.0.0.1:8080 book.pdf --jobs 50 --concurrency 8
+
+Endpoints:
+    GET    /health              worker and queue counts
+    POST   /jobs                upload a PDF; query: signature_size (16, 32+32+8 or auto),
+                                pages_per_sheet, streaming, optimize; answers 202 with the job
+    GET    /jobs                every job the service still remembers
+    GET    /jobs/<id>[?wait=S]  job status, optionally waiting up to S seconds for it to finish
+    GET    /jobs/<id>/booklet   the finished booklet
+    DELETE /jobs/<id>           forget a finished job and delete its files
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from imposition_plan import SIGNATURE_SIZES, check_signature_size, parse_signature_size
+from improved_book_ordering import _process_batch_file
+from result_cache import ResultCache
+
+# Bytes moved per read/write when streaming uploads and booklets
+CHUNK_BYTES = 64 * 1024
+
+DEFAULT_MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+# Jobs queued or running before uploads are turned away with 429
+DEFAULT_MAX_PENDING = 64
+
+# Finished jobs remembered before the oldest are forgotten (and their files deleted)
+DEFAULT_RETAIN_JOBS = 1000
+
+# Longest ?wait= a status request may ask for
+MAX_WAIT_SECONDS = 300
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 411: "Length Required",
+           413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """One uploaded PDF and the state of its imposition."""
+
+    def __init__(self, job_id: str, input_file: str, output_file: str, settings: Dict):
+        self.id = job_id
+        self.input_file = input_file
+        self.output_file = output_file
+        self.settings = settings
+        self.status = "queued"
+        self.error = ""
+        self.result: Dict = {}
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "settings": self.settings,
+            "error": self.error,
+            "pages": self.result.get("pages", 0),
+            "blank_pages": self.result.get("blank_pages", 0),
+            "output_bytes": self.result.get("output_bytes", 0),
+            "queued_seconds": round((self.started or time.time()) - self.created, 3),
+            "run_seconds": round((self.finished or time.time()) - self.started, 3) if self.started else 0,
+        }
+
+
+class BookletService:
+    """Job queue plus HTTP front end; ``start`` binds it, ``close`` shuts it down.
+
+    At most ``max_running`` jobs occupy the process pool at once (default:
+    one per worker); up to ``max_pending`` jobs may be queued or running
+    before new uploads get 429.
+    """
+
+    def __init__(self, work_dir: Optional[str] = None, workers: Optional[int] = None,
+                 max_running: Optional[int] = None, max_pending: int = DEFAULT_MAX_PENDING,
+                 max_upload_bytes: int = DEFAULT_MAX_UPLOAD_BYTES, retain_jobs: int = DEFAULT_RETAIN_JOBS,
+                 cache: Optional[ResultCache] = None):
+        self._temp_dir = None
+        if work_dir is None:
+            self._temp_dir = tempfile.TemporaryDirectory(prefix="booklet-service-")
+            work_dir = self._temp_dir.name
+        os.makedirs(work_dir, exist_ok=True)
+        self.work_dir = work_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.max_running = max_running or self.workers
+        self.max_pending = max_pending
+        self.max_upload_bytes = max_upload_bytes
+        self.retain_jobs = retain_jobs
+        self.cache = cache
+        self.jobs: Dict[str, Job] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks = set()
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        """Start the worker pool and listen; returns the bound address."""
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._slots = asyncio.Semaphore(self.max_running)
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client or an error closes it."""
+        try:
+            while True:
+                try:
+                    method, target, headers = await read_request_head(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    keep_alive &= await self.route(method, target, headers, reader, writer)
+                except HttpError as e:
+                    # The request body may be unread, so don't reuse the connection
+                    await send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (asyncio.LimitOverrunError, ValueError) as e:
+            await send_json(writer, 400, {"error": f"Malformed request: {e}"}, keep_alive=False)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, target: str, headers: Dict[str, str],
+                    reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request; returns False when the connection must close."""
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts == ["health"] and method == "GET":
+            await send_json(writer, 200, {"status": "ok", "workers": self.workers,
+                                          "running": sum(j.status == "running" for j in self.jobs.values()),
+                                          "pending": self.pending})
+        elif parts == ["jobs"] and method == "POST":
+            job = await self.submit(query, headers, reader)
+            await send_json(writer, 202, job.to_dict())
+        elif parts == ["jobs"] and method == "GET":
+            await send_json(writer, 200, {"jobs": [job.to_dict() for job in self.jobs.values()]})
+        elif len(parts) == 2 and parts[0] == "jobs" and method == "GET":
+            job = self.get_job(parts[1])
+            if "wait" in query and not job.done.is_set():
+                try:
+                    await asyncio.wait_for(job.done.wait(), min(float(query["wait"]), MAX_WAIT_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+            await send_json(writer, 200, job.to_dict())
+        elif len(parts) == 2 and parts[0] == "jobs" and method == "DELETE":
+            job = self.get_job(parts[1])
+            if not job.done.is_set():
+                raise HttpError(409, f"Job {job.id} is still {job.status}")
+            self.forget(job)
+            await send_json(writer, 200, {"id": job.id, "status": "deleted"})
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "booklet" and method == "GET":
+            job = self.get_job(parts[1])
+            if job.status != "done":
+                raise HttpError(409, f"Job {job.id} is {job.status}")
+            await send_file(writer, job.output_file)
+        elif parts in (["health"], ["jobs"]) or (parts[:1] == ["jobs"] and len(parts) == 2) or \
+                (parts[:1] == ["jobs"] and parts[2:] == ["booklet"]):
+            raise HttpError(405, f"{method} not allowed on {url.path}")
+        else:
+            raise HttpError(404, f"No such resource: {url.path}")
+        return True
+
+    def get_job(self, job_id: str) -> Job:
+        if job_id not in self.jobs:
+            raise HttpError(404, f"No such job: {job_id}")
+        return self.jobs[job_id]
+
+    async def submit(self, query: Dict[str, str], headers: Dict[str, str],
+                     reader: asyncio.StreamReader) -> Job:
+        """Validate the settings, stream the upload to disk and queue the job."""
+        try:
+            settings = {
+                "signature_size": parse_signature_size(query.get("signature_size", "16")),
+                "pages_per_sheet": int(query.get("pages_per_sheet", 2)),
+                "streaming": query.get("streaming", "0").lower() in ("1", "true", "yes"),
+                "optimize": query.get("optimize", "0").lower() in ("1", "true", "yes"),
+            }
+            check_signature_size(settings["signature_size"], settings["pages_per_sheet"])
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        if self.pending >= self.max_pending:
+            # Read the upload anyway: closing on an unread body can reset
+            # the connection before the client sees the answer
+            async for _ in iter_body(reader, headers, self.max_upload_bytes):
+                pass
+            raise HttpError(429, f"{self.pending} jobs already pending, try again later")
+
+        job_id = uuid.uuid4().hex
+        input_file = os.path.join(self.work_dir, f"{job_id}.pdf")
+        job = Job(job_id, input_file, os.path.join(self.work_dir, f"{job_id}_booklet.pdf"), settings)
+        size = 0
+        try:
+            with open(input_file, "wb") as input_fp:
+                async for chunk in iter_body(reader, headers, self.max_upload_bytes):
+                    input_fp.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            remove_file(input_file)
+            raise
+        if size == 0:
+            remove_file(input_file)
+            raise HttpError(400, "Empty upload")
+
+        self.jobs[job_id] = job
+        task = asyncio.create_task(self.run_job(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def run_job(self, job: Job):
+        """Wait for a free slot, then impose the upload in the process pool."""
+        try:
+            async with self._slots:
+                job.status = "running"
+                job.started = time.time()
+                settings = job.settings
+                work = (job.input_file, job.output_file, settings["signature_size"],
+                        settings["pages_per_sheet"], settings["streaming"], settings["optimize"], self.cache,
+                        SIGNATURE_SIZES)
+                try:
+                    job.result = await asyncio.get_running_loop().run_in_executor(
+                        self._executor, _process_batch_file, work)
+                    job.status = "done" if job.result["success"] else "failed"
+                    job.error = job.result["error"]
+                except Exception as e:
+                    job.status = "failed"
+                    job.error = f"Error: {e}"
+        finally:
+            job.finished = time.time()
+            remove_file(job.input_file)
+            job.done.set()
+            self.forget_oldest()
+
+    def forget(self, job: Job):
+        self.jobs.pop(job.id, None)
+        remove_file(job.input_file)
+        remove_file(job.output_file)
+
+    def forget_oldest(self):
+        """Keep at most ``retain_jobs`` finished jobs."""
+        finished = [job for job in self.jobs.values() if job.done.is_set()]
+        for job in sorted(finished, key=lambda job: job.finished)[:max(0, len(finished) - self.retain_jobs)]:
+            self.forget(job)
+
+
+def remove_file(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def read_request_head(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str]]:
+    """Request line and headers (names lower-cased)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return method.upper(), target, headers
+
+
+async def iter_body(reader: asyncio.StreamReader, headers: Dict[str, str],
+                    max_bytes: int) -> AsyncIterator[bytes]:
+    """Yield a request body in chunks, fixed-length or chunked."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        total = 0
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                # Skip trailers
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                return
+            total += size
+            if total > max_bytes:
+                raise HttpError(413, f"Upload larger than {max_bytes} bytes")
+            while size:
+                chunk = await reader.read(min(size, CHUNK_BYTES))
+                if not chunk:
+                    raise ConnectionError("Client disconnected during upload")
+                size -= len(chunk)
+                yield chunk
+            await reader.readexactly(2)
+        return
+
+    if "content-length" not in headers:
+        raise HttpError(411, "Content-Length or chunked transfer encoding required")
+    remaining = int(headers["content-length"])
+    if remaining > max_bytes:
+        raise HttpError(413, f"Upload larger than {max_bytes} bytes")
+    while remaining:
+        chunk = await reader.read(min(remaining, CHUNK_BYTES))
+        if not chunk:
+            raise ConnectionError("Client disconnected during upload")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def response_head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool = True):
+    body = json.dumps(payload).encode()
+    writer.write(response_head(status, {
+        "Content-Type": "application/json",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+    }) + body)
+    await writer.drain()
+
+
+async def send_file(writer: asyncio.StreamWriter, path: str):
+    """Stream a PDF back without loading it into memory."""
+    with open(path, "rb") as file_fp:
+        writer.write(response_head(200, {
+            "Content-Type": "application/pdf",
+            "Content-Length": str(os.fstat(file_fp.fileno()).st_size),
+        }))
+        for chunk in iter(lambda: file_fp.read(CHUNK_BYTES), b""):
+            writer.write(chunk)
+            await writer.drain()
+
+
+async def http_request(host: str, port: int, method: str, path: str,
+                       upload: Optional[str] = None) -> Tuple[int, bytes]:
+    """Minimal HTTP/1.1 client for the load generator: one request per connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        headers = {"Host": f"{host}:{port}", "Connection": "close"}
+        if upload is not None:
+            headers["Content-Type"] = "application/pdf"
+            headers["Content-Length"] = str(os.path.getsize(upload))
+        elif method == "POST":
+            headers["Content-Length"] = "0"
+        head = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n")
+        if upload is not None:
+            with open(upload, "rb") as upload_fp:
+                for chunk in iter(lambda: upload_fp.read(CHUNK_BYTES), b""):
+                    writer.write(chunk)
+                    await writer.drain()
+        await writer.drain()
+
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+            name, value = line.decode("latin-1").split(":", 1)
+            response_headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(response_headers.get("content-length", 0)))
+        return status, body
+    finally:
+        writer.close()
+
+
+async def run_load(url: str, input_file: str, jobs: int = 20, concurrency: int = 4,
+                   signature_size: int = 16, pages_per_sheet: int = 2) -> Dict:
+    """Push ``jobs`` uploads through the service, ``concurrency`` at a time.
+
+    Each job is upload, wait for completion, download. Uploads turned away
+    with 429 are retried after a short pause and counted as rejections.
+    """
+    address = urlsplit(url)
+    host, port = address.hostname, address.port or 80
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    counts = {"failed": 0, "rejected": 0, "pages": 0, "bytes": 0}
+
+    async def one_job():
+        async with slots:
+            start = time.perf_counter()
+            while True:
+                status, body = await http_request(
+                    host, port, "POST", f"/jobs?signature_size={signature_size}"
+                                        f"&pages_per_sheet={pages_per_sheet}", upload=input_file)
+                if status != 429:
+                    break
+                counts["rejected"] += 1
+                await asyncio.sleep(0.05)
+            if status != 202:
+                counts["failed"] += 1
+                return
+            job_id = json.loads(body)["id"]
+
+            job = {"status": "queued"}
+            while job["status"] in ("queued", "running"):
+                status, body = await http_request(host, port, "GET", f"/jobs/{job_id}?wait=30")
+                job = json.loads(body)
+            if job["status"] != "done":
+                counts["failed"] += 1
+                return
+
+            status, booklet = await http_request(host, port, "GET", f"/jobs/{job_id}/booklet")
+            await http_request(host, port, "DELETE", f"/jobs/{job_id}")
+            if status != 200 or not booklet.startswith(b"%PDF"):
+                counts["failed"] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            counts["pages"] += job["pages"]
+            counts["bytes"] += len(booklet)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_job() for _ in range(jobs)))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(fraction: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 3) if latencies else 0
+
+    return {
+        "jobs": jobs,
+        "completed": len(latencies),
+        "failed": counts["failed"],
+        "rejected": counts["rejected"],
+        "seconds": round(seconds, 3),
+        "jobs_per_sec": round(len(latencies) / seconds, 2),
+        "pages_per_sec": round(counts["pages"] / seconds, 1),
+        "latency_p50": percentile(0.5),
+        "latency_p95": percentile(0.95),
+        "latency_max": round(latencies[-1], 3) if latencies else 0,
+    }
+
+
+async def serve(args: argparse.Namespace):
+    cache = ResultCache(args.cache_dir) if args.cache_dir else None
+    service = BookletService(args.work_dir, args.workers, args.max_running, args.max_pending,
+                             int(args.max_upload_mib * 1024 * 1024), cache=cache)
+    host, port = await service.start(args.host, args.port)
+    print(f" Serving on http://{host}:{port} with {service.workers} worker(s)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="HTTP job service for booklet imposition.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the job service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--work-dir", help="uploads and booklets (default: a temporary directory)")
+    serve_parser.add_argument("-w", "--workers", type=int, help="worker processes (default: CPU count)")
+    serve_parser.add_argument("--max-running", type=int, help="jobs imposed at once (default: workers)")
+    serve_parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                              help="queued plus running jobs before uploads get 429")
+    serve_parser.add_argument("--max-upload-mib", type=float, default=DEFAULT_MAX_UPLOAD_BYTES / (1024 * 1024))
+    serve_parser.add_argument("--cache-dir", help="reuse booklets already imposed with the same input and settings")
+
+    load_parser = commands.add_parser("load", help="measure throughput of a running service")
+    load_parser.add_argument("url", help="service address, e.g. http://127.0.0.1:8080")
+    load_parser.add_argument("input", help="PDF uploaded by every job")
+    load_parser.add_argument("--jobs", type=int, default=20)
+    load_parser.add_argument("--concurrency", type=int, default=4)
+    load_parser.add_argument("-s", "--signature-size", type=int, default=16)
+    load_parser.add_argument("-p", "--pages-per-sheet", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            print("\n Service stopped.")
+        return 0
+
+    report = asyncio.run(run_load(args.url, args.input, args.jobs, args.concurrency,
+                                  args.signature_size, args.pages_per_sheet))
+    for name, value in report.items():
+        print(f" {name}: {value}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
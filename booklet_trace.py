@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Stage-level tracing for the booklet pipeline.
+A StageTracer records wall time, CPU time, page counts and (optionally)
+allocations for each pipeline stage, calls any registered callbacks as
+stages finish, and exports the records as JSON or Chrome trace events
+(load the latter in chrome://tracing or Perfetto).
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, so stages carry no RSS figure
+    resource = None
+
+
+def peak_rss_kib() -> Optional[int]:
+    """The process's peak resident set size, or None where it can't be read."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class StageTracer:
+    """Collects one record per pipeline stage.
+
+    Stages may nest (a signature inside the impose stage); each record keeps
+    its depth. Allocation tracking uses tracemalloc, which slows the
+    pipeline down noticeably, so it is off unless asked for.
+    """
+
+    def __init__(self, track_allocations: bool = False):
+        self.track_allocations = track_allocations
+        self.records: List[Dict] = []
+        self.callbacks: List[Callable[[Dict], None]] = []
+        self._origin = time.perf_counter()
+        self._depth = 0
+
+    def add_callback(self, callback: Callable[[Dict], None]):
+        """Call ``callback(record)`` whenever a stage finishes."""
+        self.callbacks.append(callback)
+
+    @contextmanager
+    def stage(self, name: str, pages: int = 0):
+        """Time the enclosed block; the yielded record's "pages" may be updated."""
+        record = {"name": name, "pages": pages, "depth": self._depth}
+        if self.track_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            allocated_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        self._depth += 1
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record["start"] = wall_start - self._origin
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = time.process_time() - cpu_start
+            record["peak_rss_kib"] = peak_rss_kib()
+            if self.track_allocations:
+                current, peak = tracemalloc.get_traced_memory()
+                record["allocated_bytes"] = current - allocated_before
+                record["peak_allocated_bytes"] = peak - allocated_before
+            self.records.append(record)
+            for callback in self.callbacks:
+                callback(record)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Top-level stages by name, with pages/sec."""
+        stages = {}
+        for record in self.records:
+            if record["depth"] == 0:
+                seconds = record["wall_seconds"]
+                stages[record["name"]] = dict(
+                    record, pages_per_sec=record["pages"] / seconds if seconds > 0 and record["pages"] else None)
+        return stages
+
+    def to_json(self) -> Dict:
+        return {"stages": self.records}
+
+    def to_chrome_trace(self) -> Dict:
+        """Records as complete ("X") events in the Chrome trace event format."""
+        pid, tid = os.getpid(), threading.get_ident()
+        events = []
+        for record in self.records:
+            args = {key: value for key, value in record.items()
+                    if key not in ("name", "start", "wall_seconds", "depth")}
+            events.append({
+                "name": record["name"],
+                "cat": "booklet",
+                "ph": "X",
+                "ts": round(record["start"] * 1e6, 3),
+                "dur": round(record["wall_seconds"] * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, filename: str, trace_format: str = "json"):
+        """Write the trace as plain JSON records or as a Chrome trace."""
+        data = self.to_chrome_trace() if trace_format == "chrome" else self.to_json()
+        with open(filename, "w") as trace_fp:
+            json.dump(data, trace_fp, indent=1)
@@ -0,0 +1,87 @@
+"""
+PDF fixtures shared by the test modules
+Plain functions rather than pytest fixtures, so each test module still
+runs on its own with ``python test_<name>.py``.
+"""
+import io
+import re
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from PyPDF2.generic import ArrayObject
+
+
+def create_numbered_pdf(filename, page_count):
+    """Create a PDF with one clearly marked page per page number"""
+    c = canvas.Canvas(filename, pagesize=letter)
+    width, height = letter
+
+    for page_num in range(1, page_count + 1):
+        c.setFont("Helvetica-Bold", 72)
+        c.drawCentredString(width/2, height/2, str(page_num))
+        c.showPage()
+
+    c.save()
+    return filename
+
+
+def create_pdf(filename, page_count, size):
+    """Create a PDF of ``page_count`` pages of ``size``, each labelled "Page n" """
+    c = canvas.Canvas(filename, pagesize=size)
+    for i in range(page_count):
+        c.drawString(50, 50, f"Page {i + 1}")
+        c.showPage()
+    c.save()
+
+
+def create_chapter(filename, chapter, page_count, logo):
+    """A chapter whose every page carries the same embedded logo."""
+    c = canvas.Canvas(filename, pagesize=(420, 595))
+    for i in range(page_count):
+        c.drawString(72, 500, f"Chapter {chapter} page {i + 1}")
+        c.drawImage(logo, 72, 72, width=100, height=100)
+        c.showPage()
+    c.save()
+
+
+def write_nested_pdf(filename):
+    """Five pages in a two-level page tree; MediaBox and Resources are inherited."""
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 5 /MediaBox [0 0 300 400] /Resources << >> >>",
+        3: b"<< /Type /Pages /Parent 2 0 R /Kids [5 0 R 6 0 R] /Count 2 /MediaBox [0 0 200 250] >>",
+        4: b"<< /Type /Pages /Parent 2 0 R /Kids [7 0 R 8 0 R 9 0 R] /Count 3 >>",
+    }
+    for page in range(5):
+        objects[5 + page] = b"<< /Type /Page /Parent %d 0 R /Contents %d 0 R >>" % (3 if page < 2 else 4, 10 + page)
+        content = b"BT /F1 12 Tf 20 20 Td (page %d) Tj ET" % (page + 1)
+        objects[10 + page] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content)
+    objects[7] = b"<< /Type /Page /Parent 4 0 R /Contents 12 0 R /MediaBox [0 0 100 100] >>"
+
+    data = io.BytesIO()
+    data.write(b"%PDF-1.4\n")
+    offsets = {}
+    for idnum in sorted(objects):
+        offsets[idnum] = data.tell()
+        data.write(b"%d 0 obj\n%s\nendobj\n" % (idnum, objects[idnum]))
+    xref = data.tell()
+    data.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for idnum in sorted(objects):
+        data.write(b"%010d 00000 n \n" % offsets[idnum])
+    data.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    with open(filename, "wb") as pdf_fp:
+        pdf_fp.write(data.getvalue())
+
+
+def page_fingerprints(pages):
+    """Content stream bytes and media box of every page"""
+    # merge_page renames clashing resources with a random UUID suffix
+    uuid_suffix = re.compile(rb"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+    fingerprints = []
+    for page in pages:
+        contents = page.get_contents()
+        if isinstance(contents, ArrayObject):
+            data = b"\n".join(part.get_object().get_data() for part in contents)
+        else:
+            data = contents.get_data() if contents is not None else b""
+        fingerprints.append((uuid_suffix.sub(b"", data), [float(v) for v in page.mediabox]))
+    return fingerprints
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Open-once access to an input PDF.
+A DocumentSession memory-maps the file, parses its cross-reference table
+and page tree once and keeps a flat page-index table, so every stage of a
+job (page count, planning, imposing) shares one parse and any page can be
+fetched in O(1) without building PdfReader's list of page objects.
+"""
+
+import mmap
+import os
+from array import array
+from typing import Dict, List
+
+from PyPDF2 import PdfReader, PageObject
+from PyPDF2.generic import IndirectObject, NameObject
+
+
+# Page attributes a page inherits from its parent /Pages nodes
+INHERITABLE_PAGE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+class PageIndex:
+    """Sequence view of a session's pages (what ``reader.pages`` offers)."""
+
+    def __init__(self, session: "DocumentSession"):
+        self._session = session
+
+    def __len__(self) -> int:
+        return len(self._session._page_ids)
+
+    def __getitem__(self, index: int) -> PageObject:
+        return self._session.page(index)
+
+    def __iter__(self):
+        return (self._session.page(index) for index in range(len(self)))
+
+
+class DocumentSession:
+    """An input PDF parsed once per job.
+
+    ``pages`` and ``pdf_header`` stand in for a PdfReader's, so the
+    pipeline takes either. Pages are built on demand and not kept, so the
+    streaming path can still drop ``reader.resolved_objects`` between
+    signatures. Close the session once the output is written: pages still
+    read from the memory map until then.
+    """
+
+    def __init__(self, path: str, strict: bool = False):
+        self.path = path
+        self._stat = self._file_stat()
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.reader = PdfReader(self._map, strict=strict)
+        except BaseException:
+            self.close()
+            raise
+
+        # Object number of every page, and which inherited-attribute set it uses
+        self._page_ids = array('q')
+        self._page_generations = array('l')
+        self._page_inherited = array('l')
+        self._inherited: List[Dict] = []
+        self._index_pages()
+        self.pages = PageIndex(self)
+
+    @property
+    def pdf_header(self) -> str:
+        return self.reader.pdf_header
+
+    def _file_stat(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def is_current(self) -> bool:
+        """False once the file on disk has changed since it was opened."""
+        try:
+            return self._file_stat() == self._stat
+        except OSError:
+            return False
+
+    def _index_pages(self):
+        """Walk the page tree once, recording page references in document order."""
+        inherited_ids: Dict[tuple, int] = {}
+        stack = [(self.reader.trailer["/Root"].raw_get("/Pages"), {})]
+
+        while stack:
+            node_ref, inherited = stack.pop()
+            node = node_ref.get_object()
+
+            if node.get("/Type", "/Pages") == "/Pages":
+                inherited = dict(inherited)
+                for attr in INHERITABLE_PAGE_ATTRIBUTES:
+                    if attr in node:
+                        inherited[attr] = node.raw_get(attr)
+                for kid in reversed(node["/Kids"]):
+                    stack.append((kid, inherited))
+                continue
+
+            if not isinstance(node_ref, IndirectObject):
+                # Page dictionaries inlined in /Kids can't be fetched by number
+                raise ValueError("Page tree with direct page objects is not supported")
+            key = tuple(sorted((attr, id(value)) for attr, value in inherited.items()))
+            if key not in inherited_ids:
+                inherited_ids[key] = len(self._inherited)
+                self._inherited.append(inherited)
+            self._page_ids.append(node_ref.idnum)
+            self._page_generations.append(node_ref.generation)
+            self._page_inherited.append(inherited_ids[key])
+
+    def page(self, index: int) -> PageObject:
+        """Page ``index`` (negative counts from the end) with inherited attributes applied."""
+        if index < 0:
+            index += len(self._page_ids)
+        reference = IndirectObject(self._page_ids[index], self._page_generations[index], self.reader)
+        page = PageObject(self.reader, reference)
+        page.update(reference.get_object())
+        for attr, value in self._inherited[self._page_inherited[index]].items():
+            if attr not in page:
+                page[NameObject(attr)] = value
+        return page
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+EPUB cover replacement without repacking the book.
+The browser version unpacks every entry and recompresses the whole EPUB
+to add one image. Here each untouched entry (local header, compressed
+data and data descriptor) is copied byte for byte from the input; only
+content.opf and the cover image are written anew. The work is
+proportional to the size of those two entries, not the archive.
+The output can be any writable stream. An unseekable input is spooled
+to a temporary file first, since its central directory is at the end.
+"""
+
+import copy
+import posixpath
+import shutil
+import tempfile
+import zipfile
+from typing import BinaryIO, Dict
+from xml.dom import minidom
+
+# Cover extensions and their media types; anything else is treated as a
+# JPEG, as getCoverExtension does
+COVER_MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+COVER_ID = "cover-image"
+
+# Raw entries are copied in pieces this big
+COPY_CHUNK_BYTES = 1024 * 1024
+
+# ZipFile internals the raw copy relies on. Without any of them, entries
+# are decompressed and recompressed through ZipFile's public calls
+RAW_COPY_ATTRIBUTES = ("_lock", "_seekable", "_didModify", "start_dir")
+
+
+def cover_media_type(cover_name: str) -> str:
+    """Media type of a cover image from its file name."""
+    return COVER_MEDIA_TYPES.get(posixpath.splitext(cover_name.lower())[1], "image/jpeg")
+
+
+def opf_path(epub: zipfile.ZipFile) -> str:
+    """Path of the package document, from META-INF/container.xml."""
+    container = minidom.parseString(epub.read("META-INF/container.xml"))
+    rootfiles = container.getElementsByTagNameNS("*", "rootfile")
+    if not rootfiles or not rootfiles[0].getAttribute("full-path"):
+        raise ValueError("META-INF/container.xml names no package document")
+    return rootfiles[0].getAttribute("full-path")
+
+
+def update_content_opf(opf: bytes, cover_href: str, media_type: str) -> bytes:
+    """Point the OPF's cover at ``cover_href``, as updateContentOPF does."""
+    document = minidom.parseString(opf)
+    package = document.documentElement
+    namespace = package.namespaceURI
+    manifest = _first(package, "manifest")
+    metadata = _first(package, "metadata")
+    if manifest is None or metadata is None:
+        raise ValueError("Package document has no manifest or metadata")
+
+    items = manifest.getElementsByTagNameNS("*", "item")
+    cover = next((item for item in items if item.getAttribute("id") == COVER_ID), None) \
+        or next((item for item in items if COVER_ID in item.getAttribute("properties").split()), None)
+    if cover is None:
+        cover = document.createElementNS(namespace, "item")
+        cover.setAttribute("id", COVER_ID)
+        cover.setAttribute("properties", COVER_ID)
+        manifest.appendChild(cover)
+    cover.setAttribute("href", cover_href)
+    cover.setAttribute("media-type", media_type)
+
+    cover_id = cover.getAttribute("id")
+    meta = next((meta for meta in metadata.getElementsByTagNameNS("*", "meta")
+                 if meta.getAttribute("name") == "cover"), None)
+    if meta is None:
+        meta = document.createElementNS(namespace, "meta")
+        meta.setAttribute("name", "cover")
+        metadata.appendChild(meta)
+    meta.setAttribute("content", cover_id)
+    return document.toxml(encoding="utf-8")
+
+
+def _first(parent, local_name: str):
+    elements = parent.getElementsByTagNameNS("*", local_name)
+    return elements[0] if elements else None
+
+
+def replace_cover(input_fp: BinaryIO, output_fp: BinaryIO, cover_data: bytes, cover_name: str) -> Dict:
+    """Write ``input_fp`` to ``output_fp`` with ``cover_data`` as the book's cover.
+
+    The cover is stored next to the OPF as ``Images/cover<ext>``. Every
+    other entry is copied in its original order (raw, when ZipFile has
+    the internals for it), the old cover image included: pages such as a title page may still show it, and the
+    browser version keeps it too. Returns the OPF and cover paths, what
+    was copied and rewritten, and whether entries were copied raw.
+    """
+    if not _seekable(input_fp):
+        with tempfile.TemporaryFile() as spooled:
+            shutil.copyfileobj(input_fp, spooled, COPY_CHUNK_BYTES)
+            spooled.seek(0)
+            return replace_cover(spooled, output_fp, cover_data, cover_name)
+
+    extension = posixpath.splitext(cover_name.lower())[1]
+    if extension not in COVER_MEDIA_TYPES:
+        extension = ".jpg"
+    cover_href = f"Images/cover{extension}"
+
+    with zipfile.ZipFile(input_fp) as epub:
+        package_path = opf_path(epub)
+        package_dir = posixpath.dirname(package_path)
+        cover_path = posixpath.join(package_dir, cover_href)
+        cover_written = False
+        opf = update_content_opf(epub.read(package_path), cover_href, cover_media_type(cover_name))
+
+        copied = copied_bytes = 0
+        with zipfile.ZipFile(output_fp, "w") as output:
+            raw = all(hasattr(zip_file, name) for zip_file in (epub, output) for name in RAW_COPY_ATTRIBUTES)
+            if raw:
+                # An entry runs from its local header to the next entry's, or
+                # to the central directory
+                entries = sorted(epub.infolist(), key=lambda info: info.header_offset)
+                ends = [info.header_offset for info in entries[1:]] + [epub.start_dir]
+                spans = {info.filename: end - info.header_offset for info, end in zip(entries, ends)}
+
+            for info in epub.infolist():
+                if info.filename == package_path:
+                    output.writestr(copy.copy(info), opf, compress_type=zipfile.ZIP_DEFLATED)
+                elif info.filename == cover_path:
+                    # Images are compressed already
+                    output.writestr(copy.copy(info), cover_data, compress_type=zipfile.ZIP_STORED)
+                    cover_written = True
+                elif raw:
+                    _copy_raw_entry(epub, info, spans[info.filename], output)
+                    copied += 1
+                    copied_bytes += spans[info.filename]
+                else:
+                    _copy_entry(epub, info, output)
+                    copied += 1
+                    copied_bytes += info.compress_size
+            if not cover_written:
+                output.writestr(zipfile.ZipInfo(cover_path, epub.getinfo(package_path).date_time), cover_data,
+                                compress_type=zipfile.ZIP_STORED)
+
+    return {
+        "opf": package_path,
+        "cover": cover_path,
+        "entries_copied": copied,
+        "bytes_copied": copied_bytes,
+        "bytes_rewritten": len(opf) + len(cover_data),
+        "raw_copy": raw,
+    }
+
+
+def _seekable(fp: BinaryIO) -> bool:
+    seekable = getattr(fp, "seekable", None)
+    return seekable is not None and seekable()
+
+
+def _copy_raw_entry(source: zipfile.ZipFile, info: zipfile.ZipInfo, span: int, output: zipfile.ZipFile):
+    """Append ``span`` raw bytes of ``info`` from ``source`` to ``output``.
+
+    ZipFile has no public raw copy; this registers the entry the way
+    ZipFile.mkdir does, so close() lists it in the central directory.
+    """
+    info = copy.copy(info)
+    with output._lock:
+        if output._seekable:
+            output.fp.seek(output.start_dir)
+        source.fp.seek(info.header_offset)
+        info.header_offset = output.fp.tell()
+        remaining = span
+        while remaining:
+            chunk = source.fp.read(min(remaining, COPY_CHUNK_BYTES))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated entry '{info.filename}'")
+            output.fp.write(chunk)
+            remaining -= len(chunk)
+        output._didModify = True
+        output.filelist.append(info)
+        output.NameToInfo[info.filename] = info
+        output.start_dir = output.fp.tell()
+
+
+def _copy_entry(source: zipfile.ZipFile, info: zipfile.ZipInfo, output: zipfile.ZipFile):
+    """Copy ``info`` from ``source`` to ``output`` with its compression, the slow way."""
+    if info.is_dir():
+        output.writestr(copy.copy(info), b"")
+        return
+    with source.open(info) as entry, output.open(copy.copy(info), "w") as target:
+        shutil.copyfileobj(entry, target, COPY_CHUNK_BYTES)
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Imposition planning without PDF libraries.
+Signature patterns, mixed signature layouts, N-up sheet grids and the
+option values the command line offers. Nothing here touches a PDF, so
+planning (and the command line) starts without importing PyPDF2 or
+ReportLab.
+"""
+
+import io
+from array import array
+from functools import lru_cache
+from itertools import groupby
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+
+# Signature sizes offered to the user (any multiple of 4 works)
+SIGNATURE_SIZES = (4, 8, 12, 16, 20, 24, 32, 48, 64)
+
+# Pages-per-sheet configurations offered to the user
+PAGES_PER_SHEET = (2, 4)
+
+# A signature size, or an explicit mix of sizes such as (32, 32, 8)
+SignatureSize = Union[int, Sequence[int]]
+
+# Where numbers go; "outside" is the right of odd and the left of even pages
+NUMBER_POSITIONS = tuple(f"{edge}-{place}" for edge in ("bottom", "top")
+                         for place in ("center", "outside", "inside", "left", "right"))
+
+# Cutting line modes, as in the browser version
+CUTTING_LINE_MODES = ("none", "horizontal", "both")
+
+# Grid (rows, columns) of one sheet side for each pages-per-sheet setting.
+# Every row is one folded 2-up sheet; rows are cut apart after printing.
+SHEET_GRIDS = {
+    2: (1, 2),
+    4: (2, 2),
+    8: (4, 2),
+    16: (8, 2),
+}
+
+
+def sheet_grid(pages_per_sheet: int) -> Tuple[int, int]:
+    """Rows and columns of a sheet side, or ValueError for unsupported layouts."""
+    if pages_per_sheet not in SHEET_GRIDS:
+        raise ValueError(f"Sheet layout supports {sorted(SHEET_GRIDS)} pages per sheet, "
+                         f"got {pages_per_sheet}")
+    return SHEET_GRIDS[pages_per_sheet]
+
+
+@lru_cache(maxsize=None)
+def signature_pattern(signature_size: int, pages_per_sheet: int) -> Tuple[int, ...]:
+    """Compute the page order for one signature.
+
+    A signature of N pages is folded from N/4 sheets; sheet k carries pages
+    (N-1-2k, 2k) on its front and (2k+1, N-2-2k) on its back. With more than
+    2 pages per sheet, pages_per_sheet/2 consecutive sheets are printed on one
+    press sheet and cut apart afterwards, so their fronts come first, then
+    their backs.
+    """
+    if signature_size < 4 or signature_size % 4:
+        raise ValueError(f"Signature size must be a multiple of 4, got {signature_size}")
+    if pages_per_sheet < 2 or pages_per_sheet & (pages_per_sheet - 1):
+        raise ValueError(f"Pages per sheet must be a power of 2, got {pages_per_sheet}")
+    
+    last = signature_size - 1
+    sheets = signature_size // 4
+    sheets_per_print = pages_per_sheet // 2
+    pattern = []
+    
+    for first in range(0, sheets, sheets_per_print):
+        group = range(first, min(first + sheets_per_print, sheets))
+        for k in group:
+            pattern += [last - 2 * k, 2 * k]
+        for k in group:
+            pattern += [2 * k + 1, last - 1 - 2 * k]
+    
+    return tuple(pattern)
+
+
+def press_sheets(signature_size: int, pages_per_sheet: int) -> int:
+    """Press sheets one signature is printed on (its last one may be part-used)."""
+    return -(-(signature_size // 4) // (pages_per_sheet // 2))
+
+
+def plan_signatures(total_pages: int, pages_per_sheet: int = 2,
+                    sizes: Sequence[int] = SIGNATURE_SIZES) -> Tuple[int, ...]:
+    """Mix of signature sizes for a book, largest first (70 pages: 64+8, or 32+32+8 up to 32).
+    
+    Among the sizes the bindery accepts, picks the layout with the fewest
+    blank pages, then the fewest press sheets, then the fewest signatures.
+    """
+    if not sizes:
+        raise ValueError("No signature sizes to plan with")
+    for size in sizes:
+        signature_pattern(size, pages_per_sheet)
+    
+    # Work in folded sheets (4 pages); cost is press sheets per signature
+    units = sorted({size // 4 for size in sizes})
+    cost = {unit: press_sheets(unit * 4, pages_per_sheet) for unit in units}
+    largest = units[-1]
+    needed = -(-total_pages // 4)
+    
+    # Any `largest` smaller signatures include a group whose sheets add up to a
+    # multiple of `largest`; largest signatures can replace that group with
+    # fewer signatures and, if they waste no more of a press sheet, no more
+    # sheets. So a best layout has fewer than `largest` smaller signatures and
+    # only the last largest**2 sheets or so need searching.
+    bulk = 0
+    if all(cost[largest] * unit <= cost[unit] * largest for unit in units):
+        bulk = max(0, needed - largest * largest) // largest
+    remainder = needed - bulk * largest
+    
+    # Best (press sheets, signatures) for every sheet count up to one
+    # largest signature past the remainder, which always reaches a multiple of it
+    limit = remainder + largest
+    best: List[Optional[Tuple[int, int]]] = [None] * (limit + 1)
+    best[0] = (0, 0)
+    last_unit = [0] * (limit + 1)
+    for count in range(1, limit + 1):
+        for unit in units:
+            if unit > count:
+                break
+            previous = best[count - unit]
+            if previous is None:
+                continue
+            candidate = (previous[0] + cost[unit], previous[1] + 1)
+            if best[count] is None or candidate < best[count]:
+                best[count] = candidate
+                last_unit[count] = unit
+    
+    count = next(count for count in range(remainder, limit + 1) if best[count] is not None)
+    mixed = []
+    while count:
+        mixed.append(last_unit[count] * 4)
+        count -= last_unit[count]
+    return (largest * 4,) * bulk + tuple(sorted(mixed, reverse=True))
+
+
+def signature_layout(total_pages: int, signature_size: SignatureSize) -> Tuple[int, ...]:
+    """Size of every signature of a book: one size repeated, or an explicit mix.
+    
+    A mix such as (32, 32, 8) must hold every page, and its last signature
+    must hold at least one (padding never fills a whole signature).
+    """
+    if isinstance(signature_size, int):
+        return (signature_size,) * -(-total_pages // signature_size)
+    
+    layout = tuple(int(size) for size in signature_size)
+    if not sum(layout[:-1]) < total_pages <= sum(layout):
+        raise ValueError(f"Signatures {describe_layout(layout)} don't fit a {total_pages}-page book")
+    return layout
+
+
+def signature_bounds(layout: Sequence[int]):
+    """(start, end) plan offsets of each signature of ``layout``."""
+    start = 0
+    for size in layout:
+        yield start, start + size
+        start += size
+
+
+def sheet_bounds(layout: Sequence[int], pages_per_sheet: int):
+    """(sheet, signature, start, end) of every press sheet, numbered from 1 as in the sheet map.
+    
+    ``start`` and ``end`` are plan offsets: a press sheet is a run of
+    2 * pages_per_sheet plan entries (fewer on a signature's last sheet).
+    """
+    sheet = 1
+    for signature, (start, end) in enumerate(signature_bounds(layout), 1):
+        for first in range(start, end, 2 * pages_per_sheet):
+            yield sheet, signature, first, min(first + 2 * pages_per_sheet, end)
+            sheet += 1
+
+
+def signature_sheets(layout: Sequence[int], pages_per_sheet: int, first_signature: int,
+                     last_signature: int) -> Tuple[int, int]:
+    """First and last press sheet of signatures ``first_signature`` to ``last_signature`` (from 1)."""
+    if not 1 <= first_signature <= last_signature <= len(layout):
+        raise ValueError(f"Signatures {first_signature}-{last_signature} are outside the job's 1-{len(layout)}")
+    sheets = [press_sheets(size, pages_per_sheet) for size in layout]
+    first_sheet = sum(sheets[:first_signature - 1]) + 1
+    return first_sheet, first_sheet + sum(sheets[first_signature - 1:last_signature]) - 1
+
+
+def reprint_plan(total_pages: int, layout: Sequence[int], pages_per_sheet: int, first_sheet: int,
+                 last_sheet: int) -> List[Tuple[int, int, List[int]]]:
+    """Plan entries of press sheets ``first_sheet`` to ``last_sheet`` (from 1), by signature.
+    
+    One (signature, signature start, entries) per signature the range
+    touches; entries are source page indices, -1 for blanks, exactly as
+    imposition_indices has them for those sheets. Only the signatures in
+    the range are expanded, so the cost follows the range, not the book.
+    """
+    total_sheets = sum(press_sheets(size, pages_per_sheet) for size in layout)
+    if not 1 <= first_sheet <= last_sheet <= total_sheets:
+        raise ValueError(f"Sheets {first_sheet}-{last_sheet} are outside the job's 1-{total_sheets}")
+    parts, sheet = [], 1
+    for signature, (start, end) in enumerate(signature_bounds(layout), 1):
+        count = press_sheets(end - start, pages_per_sheet)
+        if sheet + count > first_sheet:
+            pattern = signature_pattern(end - start, pages_per_sheet)
+            first = max(first_sheet - sheet, 0) * 2 * pages_per_sheet
+            last = (min(last_sheet - sheet, count - 1) + 1) * 2 * pages_per_sheet
+            parts.append((signature, start, [start + offset if start + offset < total_pages else -1
+                                             for offset in pattern[first:last]]))
+        sheet += count
+        if sheet > last_sheet:
+            break
+    return parts
+
+
+def gang_sheets(layouts: Sequence[Sequence[int]], pages_per_sheet: int) -> List[List[Tuple[int, int, int]]]:
+    """Pack the folded sheets of several jobs onto shared press sheets.
+    
+    ``layouts`` holds each job's signature sizes. A press sheet carries
+    pages_per_sheet / 2 folded sheets, cut apart after printing. Every
+    signature's full press sheets are kept as they are; the part-used
+    ones left over are packed together best fit decreasing, keeping each
+    signature's folds on one sheet. Should that miss the fewest sheets
+    possible, the leftovers are packed in order and split where needed.
+    Returns the press sheets as lists of (job, signature, fold) pieces,
+    numbered from 0; fold 0 is a signature's outermost folded sheet.
+    """
+    capacity = pages_per_sheet // 2
+    sheets, leftovers = [], []
+    for job, layout in enumerate(layouts):
+        for signature, size in enumerate(layout):
+            folds = len(signature_pattern(size, pages_per_sheet)) // 4
+            whole = folds - folds % capacity
+            sheets += [[(job, signature, fold) for fold in range(first, first + capacity)]
+                       for first in range(0, whole, capacity)]
+            if whole < folds:
+                leftovers.append((job, signature, whole, folds - whole))
+    
+    # Bins by free space, so each fit is found in at most capacity steps
+    leftovers.sort(key=lambda leftover: -leftover[3])
+    shared: List[List[Tuple[int, int, int]]] = []
+    by_free: List[List[int]] = [[] for _ in range(capacity)]
+    for job, signature, first, count in leftovers:
+        free = next((free for free in range(count, capacity) if by_free[free]), None)
+        if free is None:
+            index, free = len(shared), capacity
+            shared.append([])
+        else:
+            index = by_free[free].pop()
+        shared[index] += [(job, signature, fold) for fold in range(first, first + count)]
+        by_free[free - count].append(index)
+    
+    folds = sum(count for _, _, _, count in leftovers)
+    if len(shared) > -(-folds // capacity):
+        pieces = [(job, signature, fold) for job, signature, first, count in leftovers
+                  for fold in range(first, first + count)]
+        shared = [pieces[first:first + capacity] for first in range(0, folds, capacity)]
+    return sheets + shared
+
+
+def fold_pages(total_pages: int, layout: Sequence[int], signature: int, fold: int) -> Tuple[List[int], List[int]]:
+    """Source page indices on the front and back of one folded sheet (-1 for blanks).
+    
+    The same pages signature_pattern puts on that sheet.
+    """
+    start = sum(layout[:signature])
+    last = start + layout[signature] - 1
+    front = [last - 2 * fold, start + 2 * fold]
+    back = [start + 2 * fold + 1, last - 1 - 2 * fold]
+    return ([index if index < total_pages else -1 for index in front],
+            [index if index < total_pages else -1 for index in back])
+
+
+def gang_manifest(jobs: Sequence[Tuple[str, int, Sequence[int]]], sheets: Sequence[Sequence[Tuple[int, int, int]]],
+                  pages_per_sheet: int) -> Dict:
+    """Cut and collate instructions for a gang run.
+    
+    ``jobs`` holds each job's name, page count and layout; ``sheets`` comes
+    from gang_sheets. Every piece (a folded sheet, cut from its press sheet
+    at ``position``) is listed under its sheet and again under its job, in
+    collating order: signature by signature, outermost fold first. Page
+    numbers count from 1; None is a blank.
+    """
+    placed = [[] for _ in jobs]
+    sheet_records = []
+    for number, pieces in enumerate(sheets, 1):
+        records = []
+        for position, (job, signature, fold) in enumerate(pieces):
+            name, total_pages, layout = jobs[job]
+            front, back = fold_pages(total_pages, layout, signature, fold)
+            records.append({"position": position, "job": name, "signature": signature + 1, "fold": fold + 1,
+                            "front": [index + 1 if index >= 0 else None for index in front],
+                            "back": [index + 1 if index >= 0 else None for index in back]})
+            placed[job].append({"signature": signature + 1, "fold": fold + 1, "sheet": number, "position": position})
+        sheet_records.append({"sheet": number, "pieces": records})
+    
+    separate = sum(press_sheets(size, pages_per_sheet) for _, _, layout in jobs for size in layout)
+    return {
+        "pages_per_sheet": pages_per_sheet,
+        "press_sheets": len(sheets),
+        "separate_press_sheets": separate,
+        "jobs": [{"job": name, "pages": total_pages, "layout": list(layout),
+                  "blank_pages": sum(layout) - total_pages,
+                  "pieces": sorted(pieces, key=lambda piece: (piece["signature"], piece["fold"]))}
+                 for (name, total_pages, layout), pieces in zip(jobs, placed)],
+        "sheets": sheet_records,
+    }
+
+
+def parse_range(value: str) -> Tuple[int, int]:
+    """A range as typed, numbered from 1: '212-218', or '5' for one."""
+    first, _, last = value.strip().partition("-")
+    try:
+        first, last = int(first), int(last or first)
+    except ValueError:
+        raise ValueError(f"Range must be a number or two joined by '-', such as 212-218, got '{value}'")
+    if not 1 <= first <= last:
+        raise ValueError(f"Range must run upwards from 1, got '{value}'")
+    return first, last
+
+
+def describe_layout(layout: Sequence[int]) -> str:
+    """'16 pages each' for a uniform layout, '32+32+8 pages' for a mixed one."""
+    if len(set(layout)) == 1:
+        return f"{layout[0]} pages each"
+    return "+".join(map(str, layout)) + " pages"
+
+
+def imposition_indices(total_pages: int, signature_size: SignatureSize, pages_per_sheet: int):
+    """Source page index for every output page of the whole document.
+    
+    ``signature_size`` is a size or a mixed layout (see signature_layout).
+    Blank padding pages are -1. Returns a NumPy array when NumPy is
+    installed, otherwise a compact ``array('q')``.
+    """
+    layout = signature_layout(total_pages, signature_size)
+    
+    try:
+        import numpy as np
+    except ImportError:
+        return array('q', (index if index < total_pages else -1
+                           for start, end in signature_bounds(layout)
+                           for index in (start + offset
+                                         for offset in signature_pattern(end - start, pages_per_sheet))))
+    
+    # One vectorised block per run of equal-sized signatures
+    blocks, start = [], 0
+    for size, run in groupby(layout):
+        count = len(list(run))
+        bases = np.arange(start, start + count * size, size, dtype=np.int64)
+        pattern = np.asarray(signature_pattern(size, pages_per_sheet), dtype=np.int64)
+        blocks.append((bases[:, None] + pattern).ravel())
+        start += count * size
+    indices = np.concatenate(blocks) if blocks else np.empty(0, dtype=np.int64)
+    indices[indices >= total_pages] = -1
+    return indices
+
+
+def plan_summary(total_pages: int, layout: Sequence[int], pages_per_sheet: int) -> Dict:
+    """Page count, layout, blank pages and press sheets of a job."""
+    return {
+        "pages": total_pages,
+        "pages_per_sheet": pages_per_sheet,
+        "layout": list(layout),
+        "blank_pages": sum(layout) - total_pages,
+        "press_sheets": sum(press_sheets(size, pages_per_sheet) for size in layout),
+    }
+
+
+def plan_job(total_pages: int, signature_size: SignatureSize, pages_per_sheet: int,
+             signature_sizes: Sequence[int] = SIGNATURE_SIZES, map_fp=None) -> Dict:
+    """Plan a job without imposing it, for quoting and scheduling.
+
+    ``signature_size`` "auto" plans the mix with the fewest blanks from
+    ``signature_sizes``. With ``map_fp`` the full sheet map is written
+    there (see write_sheet_map). Returns the plan summary.
+    """
+    if signature_size == "auto":
+        layout = plan_signatures(total_pages, pages_per_sheet, tuple(signature_sizes))
+    else:
+        layout = signature_layout(total_pages, signature_size)
+    if map_fp is not None:
+        return write_sheet_map(map_fp, total_pages, layout, pages_per_sheet)
+    return plan_summary(total_pages, layout, pages_per_sheet)
+
+
+def sheet_map(total_pages: int, layout: Sequence[int], pages_per_sheet: int) -> Dict:
+    """Every press sheet of a job: side, slot and source page of each printed page.
+
+    Pages are numbered from 1; a slot holding padding has ``page`` None
+    and ``blank`` True. Slot numbers count along a side, row by row
+    (slot // 2 is the row on N-up sheets). A signature's last press sheet
+    may carry fewer folded sheets. See write_sheet_map for the JSON.
+    """
+    import json
+    buffer = io.StringIO()
+    write_sheet_map(buffer, total_pages, layout, pages_per_sheet)
+    return json.loads(buffer.getvalue())
+
+
+def write_sheet_map(output_fp, total_pages: int, layout: Sequence[int], pages_per_sheet: int) -> Dict:
+    """Write the sheet map of a job as JSON; returns its summary (no sheets).
+
+    Built from the signature patterns alone, so a 100k-page book is mapped
+    in milliseconds without opening it: each signature's JSON is a cached
+    template filled with its page numbers. Only signatures holding blank
+    padding are built as dictionaries.
+    """
+    # Only map writing needs json; probing and planning start without it
+    import json
+    summary = plan_summary(total_pages, layout, pages_per_sheet)
+    output_fp.write(json.dumps(summary)[:-1] + ', "sheets": [')
+    sheet = 1
+    for signature, (start, end) in enumerate(signature_bounds(layout), 1):
+        template, ranges = _sheet_template(end - start, pages_per_sheet)
+        pages = [start + index + 1 for index in signature_pattern(end - start, pages_per_sheet)]
+        if end <= total_pages:
+            values = []
+            for number, (first, last) in enumerate(ranges, sheet):
+                values += (number, signature)
+                values += pages[first:last]
+            text = template % tuple(values)
+        else:
+            text = ", ".join(json.dumps(_sheet_record(number, signature, pages[first:last], total_pages))
+                             for number, (first, last) in enumerate(ranges, sheet))
+        output_fp.write((", " if sheet > 1 else "") + text)
+        sheet += len(ranges)
+    output_fp.write("]}")
+    return summary
+
+
+@lru_cache(maxsize=None)
+def _sheet_template(signature_size: int, pages_per_sheet: int):
+    """JSON of one signature's press sheets, with %d for sheet, signature and page numbers."""
+    ranges, sheets = [], []
+    for first in range(0, signature_size, 2 * pages_per_sheet):
+        last = min(first + 2 * pages_per_sheet, signature_size)
+        ranges.append((first, last))
+        sides = [", ".join(f'{{"slot": {slot}, "page": %d, "blank": false}}' for slot in range((last - first) // 2))
+                 ] * 2
+        sheets.append(f'{{"sheet": %d, "signature": %d, "front": [{sides[0]}], "back": [{sides[1]}]}}')
+    return ", ".join(sheets), tuple(ranges)
+
+
+def _sheet_record(number: int, signature: int, pages: Sequence[int], total_pages: int) -> Dict:
+    half = len(pages) // 2
+    record = {"sheet": number, "signature": signature}
+    for side, side_pages in (("front", pages[:half]), ("back", pages[half:])):
+        record[side] = [{"slot": slot, "page": page, "blank": False} if page <= total_pages
+                        else {"slot": slot, "page": None, "blank": True}
+                        for slot, page in enumerate(side_pages)]
+    return record
+
+
+def parse_signature_size(value: str):
+    """A signature size as typed: '16', a mix such as '32+32+8', or 'auto'."""
+    value = value.strip().lower()
+    if value == "auto":
+        return value
+    try:
+        # A '+' in a URL query arrives as a space
+        sizes = tuple(int(size) for size in value.replace("+", " ").split())
+    except ValueError:
+        raise ValueError(f"Signature size must be a number, a mix such as 32+32+8 or 'auto', got '{value}'")
+    if not sizes:
+        raise ValueError("Signature size must not be empty")
+    return sizes[0] if len(sizes) == 1 else sizes
+
+
+def check_signature_size(signature_size, pages_per_sheet: int, signature_sizes: Sequence[int] = SIGNATURE_SIZES):
+    """Raise ValueError unless every signature ``signature_size`` can use is valid."""
+    if signature_size == "auto":
+        if not signature_sizes:
+            raise ValueError("No signature sizes to plan with")
+        sizes = signature_sizes
+    elif isinstance(signature_size, int):
+        sizes = (signature_size,)
+    else:
+        sizes = signature_size
+    for size in sizes:
+        signature_pattern(size, pages_per_sheet)
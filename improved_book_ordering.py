@@ -5,39 +5,129 @@ Combines PDF preparation and page reordering for booklet printing.
 Supports multiple signature sizes and includes comprehensive error handling.
 """
 
+import csv
+import json
 import os
+import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+from itertools import accumulate
 from pathlib import Path
-from typing import List, Optional, Tuple
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.units import mm
+from typing import List, Optional, Sequence, Tuple
+from PyPDF2 import PdfReader, PdfWriter, PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject, RectangleObject
+from reportlab.lib.pagesizes import A4
 import io
+from booklet_manifest import (build_manifest, changed_signatures, load_manifest, manifest_path,
+                              output_stamp, page_fingerprints, save_manifest)
+from pdf_merge import merge_pdfs, pdf_version
+from pdf_probe import probe_pdf
+from imposition_plan import (PAGES_PER_SHEET, SIGNATURE_SIZES, SignatureSize, check_signature_size,
+                             describe_layout, fold_pages, gang_manifest, gang_sheets, imposition_indices,
+                             plan_signatures, reprint_plan, signature_bounds, signature_layout, signature_pattern,
+                             signature_sheets)
+from result_cache import ResultCache
+from document_session import DocumentSession
+from page_numbers import PageNumberStamps
+from pdf_stream_writer import StreamingPdfWriter
+from sheet_imposition import MarkStamps, NUpImposer, sheet_grid
+
+
+# Signature chunks handed to each worker by process_pdf_parallel
+PARALLEL_CHUNKS_PER_WORKER = 4
 
 
 class BookletProcessor:
     def __init__(self):
+        # Page counts of the last successful process_pdf call, and the
+        # exception behind the last failure (see report_error)
+        self.last_result = None
+        self.last_error = None
+        
+        # Lay pages out N-up on press sheets instead of one page per PDF page
+        self.sheet_layout = False
+        # Turn every second row of a sheet 180 degrees (head-to-head)
+        self.head_to_head = False
+        
+        # Sewing-hole marks per fold (0 = none) and cutting lines
+        # ("none", "horizontal" or "both"), as in the browser version
+        self.sewing_marks = 0
+        self.cutting_lines = "none"
+        self._mark_stamps = None
+        
+        # Page number text ("{n}" is the number), position and font size
+        self.number_format = "{n}"
+        self.number_position = "bottom-center"
+        self.number_size = 12
+        self._number_stamps = None
+        
+        # Blank page template of the writer being filled (see add_blank_page)
+        self._blank_page = None
+        # Input opened by open_document, shared by every stage of a job
+        self._session = None
+        
+        # Optional StageTracer timing each pipeline stage, and whether to skip
+        # the per-signature progress lines (console I/O slows large jobs)
+        self.tracer = None
+        self.quiet = False
+        
+        # Compact the output: shared objects written once, object streams
+        # and a compressed cross-reference stream
+        self.optimize = False
+        
+        # Optional ResultCache of finished booklets
+        self.cache = None
+        
+        # Sizes the bindery accepts when the signature size is "auto"
+        self.signature_sizes = SIGNATURE_SIZES
+        
+        # Write a manifest next to the booklet so update_pdf can re-impose
+        # only the signatures a revised input changes
+        self.manifest = False
+        
         # Patterns for different pages-per-sheet configurations
+        #   2 = standard duplex, 4 = print 4 pages per sheet, then cut horizontally
         self.signature_patterns = {
-            # For 2 pages per sheet (standard duplex)
-            2: {
-                4: [3, 0, 1, 2],
-                8: [7, 0, 1, 6, 5, 2, 3, 4],
-                16: [15, 0, 1, 14, 13, 2, 3, 12, 11, 4, 5, 10, 9, 6, 7, 8],
-                32: [31, 0, 1, 30, 29, 2, 3, 28, 27, 4, 5, 26, 25, 6, 7, 24,
-                     23, 8, 9, 22, 21, 10, 11, 20, 19, 12, 13, 18, 17, 14, 15, 16]
-            },
-            # For 4 pages per sheet (with horizontal cutting)
-            4: {
-                4: [3, 0, 1, 2],
-                8: [7, 0, 5, 2, 1, 6, 3, 4],
-                16: [15, 0, 13, 2, 1, 14, 3, 12, 11, 4, 9, 6, 5, 10, 7, 8],
-                32: [31, 0, 29, 2, 1, 30, 3, 28, 27, 4, 25, 6, 5, 26, 7, 24, 
-                     23, 8, 21, 10, 9, 22, 11, 20, 19, 12, 17, 14, 13, 18, 15, 16]
+            pages_per_sheet: {
+                size: list(signature_pattern(size, pages_per_sheet))
+                for size in SIGNATURE_SIZES
             }
+            for pages_per_sheet in PAGES_PER_SHEET
         }
     
+    def __getstate__(self):
+        # Mark stamps live in this process's writer; worker processes make their own
+        state = self.__dict__.copy()
+        state["_mark_stamps"] = None
+        state["_number_stamps"] = None
+        state["_blank_page"] = None
+        state["_session"] = None
+        state["tracer"] = None
+        return state
+    
+    def open_document(self, input_file: str) -> DocumentSession:
+        """Session for ``input_file``, reusing the open one while the file is unchanged."""
+        session = self._session
+        if session is not None and session.path == input_file and session.is_current():
+            return session
+        self.close_document()
+        self._session = DocumentSession(input_file)
+        return self._session
+    
+    def close_document(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+    
+    def stage(self, name: str, pages: int = 0):
+        """Trace a pipeline stage when a tracer is attached."""
+        if self.tracer is None:
+            return nullcontext({"name": name, "pages": pages})
+        return self.tracer.stage(name, pages)
+    
     def get_pages_per_sheet(self) -> int:
         """Get user's choice for pages per sheet."""
         available_configs = sorted(self.signature_patterns.keys())
@@ -68,7 +158,7 @@ class BookletProcessor:
         print("4. Supporting multiple printing configurations:")
         print("   - 2 pages per sheet (standard duplex)")
         print("   - 4 pages per sheet (with horizontal cutting)")
-        print("5. Supporting signature sizes: 4, 8, 16, and 32 pages")
+        print("5. Supporting signature sizes: " + ", ".join(map(str, SIGNATURE_SIZES)) + " pages")
         print("=" * 60)
     
     def validate_file_input(self, filename: str) -> Optional[str]:
@@ -107,7 +197,7 @@ class BookletProcessor:
             except ValueError:
                 print("Please enter a valid number.")
     
-    def get_signature_size(self, total_pages: int, pages_per_sheet: int) -> int:
+    def get_signature_size(self, total_pages: int, pages_per_sheet: int) -> SignatureSize:
         """Get signature size from user or suggest optimal size."""
         available_sizes = sorted(self.signature_patterns[pages_per_sheet].keys())
         
@@ -124,9 +214,18 @@ class BookletProcessor:
         if optimal_size:
             print(f"Suggested signature size: {optimal_size} pages")
         
+        # A mix of sizes can need fewer blanks than any single size
+        mixed = plan_signatures(total_pages, pages_per_sheet, available_sizes)
+        if len(set(mixed)) > 1:
+            print(f"Mixed signatures: {'+'.join(map(str, mixed))} pages "
+                  f"({sum(mixed) - total_pages} blank) - enter 'auto' to use them")
+        
         while True:
             try:
-                size = int(input("Enter signature size: "))
+                answer = input("Enter signature size: ").strip()
+                if answer.lower() == "auto":
+                    return mixed
+                size = int(answer)
                 if size in available_sizes:
                     return size
                 else:
@@ -134,48 +233,32 @@ class BookletProcessor:
             except ValueError:
                 print("Please enter a valid number.")
     
+    def number_page(self, page, page_num: int, writer: PdfWriter):
+        """Return a copy of ``page`` with ``page_num`` stamped on it, for ``writer``.
+        
+        The number is a few text operators added to the page's content, in a
+        font shared by every page of the writer, or of the whole file when
+        the writer is a streamed batch (see PageNumberStamps).
+        """
+        if isinstance(writer, NUpImposer):
+            writer = writer.writer
+        if self._number_stamps is None or self._number_stamps.writer is not writer:
+            self._number_stamps = PageNumberStamps(writer, self.number_format, self.number_position,
+                                                   self.number_size)
+        return self._number_stamps.number_page(page, page_num)
+
     def add_page_numbers(self, reader: PdfReader) -> PdfWriter:
         """Add page numbers to all pages of the PDF."""
         writer = PdfWriter()
         
         for i, page in enumerate(reader.pages):
-            page_num = i + 1
-            
-            # Create overlay PDF with ReportLab
-            packet = io.BytesIO()
-            
-            # Get page dimensions
-            page_box = page.mediabox
-            page_width = float(page_box.width)
-            page_height = float(page_box.height)
-            
-            # Create the overlay
-            can = canvas.Canvas(packet)
-            can.setPageSize((page_width, page_height))
-            
-            # Make page number visible but professional
-            can.setFont("Helvetica", 12)
-            can.setFillColorRGB(0, 0, 0)  # Black
-            
-            # Position page number at bottom center
-            y_position = 30  # From bottom
-            can.drawCentredString(page_width/2, y_position, str(page_num))
-            
-            can.save()
-            packet.seek(0)
-            
-            # Read the overlay
-            overlay_pdf = PdfReader(packet)
-            overlay_page = overlay_pdf.pages[0]
-            
-            # Try merging overlay on TOP of the original page
-            overlay_page.merge_page(page)
-            writer.add_page(overlay_page)
+            writer.add_page(self.number_page(page, i + 1, writer))
             
         return writer
 
-    def add_blank_pages(self, numbered_writer: PdfWriter, signature_size: int) -> Tuple[PdfWriter, int]:
-        """Add blank pages to make total pages divisible by signature size."""
+    def add_blank_pages(self, numbered_writer: PdfWriter,
+                        signature_size: SignatureSize) -> Tuple[PdfWriter, int]:
+        """Add blank pages to fill the last signature (of one size or a mix)."""
         writer = PdfWriter()
         
         # Copy all pages from the numbered writer
@@ -184,42 +267,169 @@ class BookletProcessor:
         
         # Calculate how many blank pages needed
         current_pages = len(numbered_writer.pages)
-        pages_needed = signature_size - (current_pages % signature_size)
+        pages_needed = sum(signature_layout(current_pages, signature_size)) - current_pages
         
-        if pages_needed == signature_size:
-            pages_needed = 0
-        
-        # Add blank pages (A4 size: 210x297mm)
+        # Blank pages match the book's first page (A4 for an empty book)
+        width, height = A4
+        if current_pages:
+            mediabox = numbered_writer.pages[0].mediabox
+            width, height = float(mediabox.width), float(mediabox.height)
         for _ in range(pages_needed):
-            writer.add_blank_page(210, 297)
+            self.add_blank_page(writer, width, height)
         
         return writer, pages_needed
     
-    def reorder_pages(self, writer: PdfWriter, signature_size: int, pages_per_sheet: int) -> PdfWriter:
+    def reorder_pages(self, writer: PdfWriter, signature_size: SignatureSize, pages_per_sheet: int) -> PdfWriter:
         """Reorder pages according to signature pattern."""
         pages = writer.pages
         total_pages = len(pages)
         reordered_writer = PdfWriter()
         
-        pattern = self.signature_patterns[pages_per_sheet][signature_size]
-        signatures_count = total_pages // signature_size
+        layout = signature_layout(total_pages, signature_size)
+        signatures_count = len(layout)
         
-        print(f"\n Processing {signatures_count} signature(s) of {signature_size} pages each...")
+        print(f"\n Processing {signatures_count} signature(s) of {describe_layout(layout)}...")
         
-        for sig_num in range(signatures_count):
-            print(f"   Processing signature {sig_num + 1}/{signatures_count}...", end=" ")
-            
-            base_page = sig_num * signature_size
+        for sig_num, (base_page, end_page) in enumerate(signature_bounds(layout)):
+            if not self.quiet:
+                print(f"   Processing signature {sig_num + 1}/{signatures_count}...", end=" ")
             
-            for page_offset in pattern:
+            for page_offset in signature_pattern(end_page - base_page, pages_per_sheet):
                 page_index = base_page + page_offset
                 if page_index < total_pages:
                     reordered_writer.add_page(pages[page_index])
             
-            print("OK")
+            if not self.quiet:
+                print("OK")
         
         return reordered_writer
     
+    def resolve_layout(self, total_pages: int, signature_size, pages_per_sheet: int) -> Tuple[int, ...]:
+        """Size of every signature; "auto" plans a mix from ``signature_sizes``."""
+        if signature_size == "auto":
+            return plan_signatures(total_pages, pages_per_sheet, self.signature_sizes)
+        return signature_layout(total_pages, signature_size)
+    
+    def print_layout(self, layout: Tuple[int, ...]):
+        if len(set(layout)) > 1:
+            print(f" Signatures: {describe_layout(layout)}")
+    
+    def plan_imposition(self, total_pages: int, signature_size: SignatureSize, pages_per_sheet: int):
+        """Compute the final output order without touching any page content.
+        
+        Returns the plan, one entry per output page holding the source page
+        index (or -1 for a blank), and the number of blank pages it adds.
+        """
+        plan = imposition_indices(total_pages, signature_size, pages_per_sheet)
+        return plan, len(plan) - total_pages
+    
+    def add_blank_page(self, writer: PdfWriter, width: float, height: float):
+        """Append a blank page that shares its content and resources with every other blank.
+        
+        Each blank still needs its own small page dictionary (a page can only
+        sit in the page tree once), but the empty content stream and the
+        resource dictionary are written once per writer.
+        """
+        if self._blank_page is None or self._blank_page[0] is not writer:
+            content = DecodedStreamObject()
+            content.set_data(b"")
+            template = PageObject.create_blank_page(None, width, height)
+            template[NameObject("/Contents")] = writer._add_object(content)
+            template[NameObject("/Resources")] = writer._add_object(DictionaryObject())
+            self._blank_page = (writer, template)
+        
+        template = self._blank_page[1]
+        template[NameObject("/MediaBox")] = RectangleObject([0, 0, width, height])
+        # add_page copies the page dictionary but keeps the shared references
+        writer.add_page(template)
+    
+    def add_planned_page(self, writer: PdfWriter, page_index: int, page=None, blank_size=A4):
+        """Append one plan entry: the numbered source page, or a blank for -1."""
+        if page_index < 0:
+            if isinstance(writer, NUpImposer):
+                writer.add_blank_page(*blank_size)
+            else:
+                self.add_blank_page(writer, *blank_size)
+        else:
+            writer.add_page(self.number_page(page, page_index + 1, writer))
+    
+    def add_signature(self, writer: PdfWriter, signature_plan, get_page, pages_per_sheet: int = 2,
+                      blank_size: Optional[Tuple[float, float]] = None):
+        """Place one signature's plan entries on ``writer``.
+        
+        ``get_page`` maps a source page index to its page. With sheet_layout
+        on, the pages go N-up onto press sheets instead. ``signature_plan``
+        may be some of a signature's press sheets; ``blank_size`` then gives
+        the whole signature's blank size.
+        """
+        first_page = len(writer.pages)
+        target = writer
+        if self.sheet_layout:
+            target = NUpImposer(writer, pages_per_sheet, self.head_to_head)
+        
+        if blank_size is None:
+            blank_size = self.blank_size(signature_plan, get_page)
+        
+        for page_index in signature_plan:
+            page_index = int(page_index)
+            page = get_page(page_index) if page_index >= 0 else None
+            self.add_planned_page(target, page_index, page, blank_size)
+        
+        if self.sheet_layout:
+            target.finish()
+        
+        self.add_marks(writer, first_page, pages_per_sheet)
+    
+    def blank_size(self, signature_plan, get_page) -> Tuple[float, float]:
+        """Blanks take the size of the signature's first source page.
+        
+        Padding never fills a whole signature, so there always is one.
+        """
+        first_source = min(int(page_index) for page_index in signature_plan if page_index >= 0)
+        mediabox = get_page(first_source).mediabox
+        return float(mediabox.width), float(mediabox.height)
+    
+    def add_marks(self, writer: PdfWriter, first_page: int, pages_per_sheet: int):
+        """Add sewing marks and cutting lines to the pages of one signature.
+        
+        The marks are shared stamps, one per distinct sheet geometry in the
+        writer, so each page only gains a reference to them.
+        """
+        if not self.sewing_marks and self.cutting_lines == "none":
+            return
+        
+        if self._mark_stamps is None or self._mark_stamps.writer is not writer:
+            self._mark_stamps = MarkStamps(writer, self.sewing_marks, self.cutting_lines)
+        
+        rows = sheet_grid(pages_per_sheet)[0] if self.sheet_layout else 0
+        for position, page in enumerate(writer.pages[first_page:]):
+            # The first two pages of every four are the outer side of a sheet
+            fold_side = position % 4 in (0, 1)
+            if rows or fold_side or self.cutting_lines != "none":
+                self._mark_stamps.stamp_page(page, rows, fold_side and not rows)
+    
+    def write_plan(self, reader: PdfReader, plan, signature_size: SignatureSize,
+                   pages_per_sheet: int = 2) -> PdfWriter:
+        """Build the booklet in one writer pass, numbering pages as they are placed."""
+        writer = PdfWriter()
+        layout = signature_layout(len(plan), signature_size)
+        signatures_count = len(layout)
+        
+        print(f"\n Processing {signatures_count} signature(s) of {describe_layout(layout)}...")
+        
+        for sig_num, (start, end) in enumerate(signature_bounds(layout)):
+            if not self.quiet:
+                print(f"   Processing signature {sig_num + 1}/{signatures_count}...", end=" ")
+            
+            signature_plan = plan[start:end]
+            with self.stage("signature", end - start):
+                self.add_signature(writer, signature_plan, reader.pages.__getitem__, pages_per_sheet)
+            
+            if not self.quiet:
+                print("OK")
+        
+        return writer
+    
     def get_output_filename(self, input_filename: str) -> str:
         """Generate output filename with user input validation."""
         input_path = Path(input_filename)
@@ -247,43 +457,638 @@ class BookletProcessor:
             
             return filename
     
-    def process_pdf(self, input_file: str, signature_size: int, pages_per_sheet: int, output_file: str) -> bool:
-        """Main processing function."""
+    def stream_plan(self, session: DocumentSession, plan, signature_size: SignatureSize, output_fp,
+                    pages_per_sheet: int = 2) -> int:
+        """Number, impose and write the booklet one signature at a time.
+        
+        Only the signature being assembled is kept in memory: source pages are
+        fetched from the session's page index as they are placed and the
+        reader's object cache is dropped after every signature. Returns the
+        number of pages written.
+        """
+        output = StreamingPdfWriter(output_fp, session.pdf_header, deduplicate=self.optimize,
+                                    compress=self.optimize)
+        layout = signature_layout(len(plan), signature_size)
+        
+        print(f"\n Streaming {len(layout)} signature(s) of {describe_layout(layout)}...")
+        
+        for start, end in signature_bounds(layout):
+            with self.stage("signature", end - start):
+                batch = output.new_batch()
+                self.add_signature(batch, plan[start:end], session.page, pages_per_sheet)
+                
+                output.write_batch(batch)
+                session.reader.resolved_objects.clear()
+        
+        output.close()
+        self.report_optimization(output)
+        return output.pages_written
+    
+    def process_pdf_streaming(self, input_file: str, signature_size, pages_per_sheet: int,
+                              output_file: str) -> bool:
+        """Processing function for very large books with bounded memory."""
+        try:
+            print(f"\n Streaming PDF: {input_file}")
+            with self.stage("read") as stage:
+                session = self.open_document(input_file)
+                original_pages = stage["pages"] = len(session.pages)
+            print(f" Original pages: {original_pages}")
+            
+            with open(output_file, "wb") as output_fp:
+                
+                with self.stage("plan", original_pages):
+                    layout = self.resolve_layout(original_pages, signature_size, pages_per_sheet)
+                    plan, blank_pages_added = self.plan_imposition(original_pages, layout, pages_per_sheet)
+                
+                self.print_layout(layout)
+                if blank_pages_added > 0:
+                    print(f" Adding {blank_pages_added} blank page(s)")
+                else:
+                    print("OK No blank pages needed")
+                
+                with self.stage("number_impose_and_serialize", len(plan)):
+                    output_pages = self.stream_plan(session, plan, layout, output_fp, pages_per_sheet)
+            
+            print(f"OK Success! Booklet saved as '{output_file}'")
+            print(f" Total pages in booklet: {output_pages}")
+            
+            self.last_result = {
+                "original_pages": original_pages,
+                "blank_pages": blank_pages_added,
+                "output_pages": output_pages,
+            }
+            return True
+            
+        except Exception as e:
+            self.report_error(e)
+            return False
+    
+    def write_optimized(self, writer: PdfWriter, output_fp, pdf_header) -> StreamingPdfWriter:
+        """Write ``writer`` with duplicate objects merged, object streams and a compressed xref."""
+        output = StreamingPdfWriter(output_fp, pdf_header, deduplicate=True, compress=True)
+        batch = output.new_batch()
+        for page in writer.pages:
+            batch.add_page(page)
+        output.write_batch(batch)
+        output.close()
+        return output
+    
+    def report_optimization(self, output: StreamingPdfWriter):
+        """Print what optimizing saved compared with a plain write."""
+        if not self.optimize:
+            return
+        percent = 100 * output.bytes_saved / output.plain_bytes if output.plain_bytes else 0
+        print(f" Optimized output: saved {output.bytes_saved} bytes ({percent:.0f}%), "
+              f"{output.duplicates_dropped} duplicate object(s) merged")
+    
+    def report_error(self, error: Exception, context: Optional[str] = "Error processing PDF"):
+        """Print why a run failed and keep ``error`` as ``last_error``, for callers that aren't reading."""
+        self.last_error = error
+        print(f"Error: {context}: {error}" if context else f"Error: {error}")
+    
+    def join_chunks(self, chunk_files: List[str], output_fp, pdf_header) -> StreamingPdfWriter:
+        """Concatenate imposed chunk PDFs, writing shared resources only once."""
+        output = StreamingPdfWriter(output_fp, pdf_header, deduplicate=True, compress=self.optimize)
+        
+        for chunk_file in chunk_files:
+            batch = output.new_batch()
+            for page in PdfReader(chunk_file).pages:
+                batch.add_page(page)
+            output.write_batch(batch)
+        
+        output.close()
+        return output
+    
+    def process_pdf_parallel(self, input_file: str, signature_size, pages_per_sheet: int,
+                             output_file: str, workers: Optional[int] = None) -> bool:
+        """Processing function that numbers and imposes signatures in worker processes."""
         try:
+            workers = workers or os.cpu_count() or 1
             print(f"\n Reading PDF: {input_file}")
-            reader = PdfReader(input_file)
+            with self.stage("read") as stage:
+                reader = self.open_document(input_file)
+                original_pages = stage["pages"] = len(reader.pages)
+            print(f" Original pages: {original_pages}")
+            
+            with self.stage("plan", original_pages):
+                layout = self.resolve_layout(original_pages, signature_size, pages_per_sheet)
+                plan, blank_pages_added = self.plan_imposition(original_pages, layout, pages_per_sheet)
+            
+            self.print_layout(layout)
+            if blank_pages_added > 0:
+                print(f" Adding {blank_pages_added} blank page(s)")
+            else:
+                print("OK No blank pages needed")
+            
+            # A few chunks per worker evens out signatures that take longer
+            signatures_count = len(layout)
+            if not signatures_count:
+                raise ValueError(f"'{input_file}' has no pages to impose")
+            chunk_count = min(signatures_count, workers * PARALLEL_CHUNKS_PER_WORKER)
+            chunk_bounds = [signatures_count * i // chunk_count for i in range(chunk_count + 1)]
+            signature_starts = list(accumulate(layout, initial=0))
             
-            original_pages = len(reader.pages)
+            print(f"\n Imposing {signatures_count} signature(s) in {chunk_count} chunk(s) "
+                  f"on {workers} worker(s)...")
+            
+            with tempfile.TemporaryDirectory() as chunk_dir:
+                jobs = [(self, plan[signature_starts[first]:signature_starts[last]], layout[first:last],
+                         pages_per_sheet, os.path.join(chunk_dir, f"chunk_{i:05d}.pdf"))
+                        for i, (first, last) in enumerate(zip(chunk_bounds, chunk_bounds[1:]))]
+                
+                with self.stage("number_and_impose", len(plan)), \
+                        ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker,
+                                            initargs=(input_file,)) as executor:
+                    chunk_files = list(executor.map(_impose_chunk, jobs))
+                
+                print(f"\n Saving to: {output_file}")
+                with self.stage("serialize", len(plan)), open(output_file, "wb") as output_fp:
+                    output = self.join_chunks(chunk_files, output_fp, reader.pdf_header)
+            
+            print(f" Shared {output.duplicates_dropped} duplicate object(s) between chunks")
+            self.report_optimization(output)
+            print(f"OK Success! Booklet saved as '{output_file}'")
+            print(f" Total pages in booklet: {output.pages_written}")
+            
+            self.last_result = {
+                "original_pages": original_pages,
+                "blank_pages": blank_pages_added,
+                "output_pages": output.pages_written,
+            }
+            return True
+            
+        except Exception as e:
+            self.report_error(e)
+            return False
+    
+    def cache_settings(self, signature_size, pages_per_sheet: int) -> dict:
+        """Every setting that changes the booklet, for the result cache key."""
+        settings = {
+            "signature_size": signature_size if isinstance(signature_size, (int, str)) else list(signature_size),
+            "pages_per_sheet": pages_per_sheet,
+            "sheet_layout": self.sheet_layout,
+            "head_to_head": self.head_to_head,
+            "sewing_marks": self.sewing_marks,
+            "cutting_lines": self.cutting_lines,
+            "optimize": self.optimize,
+            "number_format": self.number_format,
+            "number_position": self.number_position,
+            "number_size": self.number_size,
+        }
+        if signature_size == "auto":
+            settings["signature_sizes"] = sorted(self.signature_sizes)
+        return settings
+    
+    def process_pdf(self, input_file: str, signature_size, pages_per_sheet: int, output_file: str,
+                    streaming: bool = False, workers: int = 1) -> bool:
+        """Main processing function.
+        
+        ``signature_size`` is a size, a mix such as (32, 32, 8), or "auto" to
+        plan the mix with the fewest blanks from ``signature_sizes``.
+        ``workers`` above 1 (or None, for one per CPU) imposes signature
+        chunks in worker processes; streaming runs use one process.
+        """
+        self.last_error = None
+        if workers is not None and workers < 1:
+            self.report_error(ValueError(f"Workers must be at least 1, got {workers}"), None)
+            return False
+        if streaming and workers != 1:
+            self.report_error(ValueError("Streaming runs impose in one process; use streaming or workers, not both"),
+                              None)
+            return False
+        
+        key = None
+        if self.cache is not None:
+            try:
+                with self.stage("cache_lookup"):
+                    key = self.cache.key(input_file, self.cache_settings(signature_size, pages_per_sheet))
+                    result = self.cache.get(key, output_file)
+            except OSError as e:
+                self.report_error(e)
+                return False
+            if result is not None:
+                print(f"\n OK Cached booklet for '{input_file}' saved as '{output_file}'")
+                print(f" Total pages in booklet: {result['output_pages']}")
+                self.last_result = result
+                if self.manifest:
+                    try:
+                        self.write_manifest(input_file, signature_size, pages_per_sheet, output_file)
+                    finally:
+                        self.close_document()
+                return True
+        
+        # Streaming and parallel runs write equivalent booklets, so they share entries
+        try:
+            if workers != 1:
+                success = self.process_pdf_parallel(input_file, signature_size, pages_per_sheet, output_file, workers)
+            elif streaming:
+                success = self.process_pdf_streaming(input_file, signature_size, pages_per_sheet, output_file)
+            else:
+                success = self.process_pdf_in_memory(input_file, signature_size, pages_per_sheet, output_file)
+            if success and self.manifest:
+                self.write_manifest(input_file, signature_size, pages_per_sheet, output_file)
+        finally:
+            # The booklet is written; release the input's memory map
+            self.close_document()
+        
+        if success and key is not None:
+            try:
+                self.cache.put(key, output_file, self.last_result)
+            except OSError as e:
+                # The booklet itself is fine; it just won't be cached
+                print(f"Warning: Could not cache the booklet: {str(e)}")
+        return success
+    
+    def reprint_sheets(self, input_file: str, signature_size, pages_per_sheet: int, output_file: str,
+                       sheets: Optional[Tuple[int, int]] = None,
+                       signatures: Optional[Tuple[int, int]] = None) -> bool:
+        """Impose only some press sheets of a job, e.g. to reprint after a jam.
+        
+        ``sheets`` is the first and last press sheet, numbered from 1 as in
+        the sheet map; ``signatures`` selects whole signatures instead. The
+        settings must be the ones the job was imposed with. Only the source
+        pages on those sheets are read, numbered and written, so the cost
+        follows the range, not the book.
+        """
+        try:
+            print(f"\n Reading PDF: {input_file}")
+            with self.stage("read") as stage:
+                session = self.open_document(input_file)
+                original_pages = stage["pages"] = len(session.pages)
+            print(f" Original pages: {original_pages}")
+            
+            with self.stage("plan", original_pages):
+                layout = self.resolve_layout(original_pages, signature_size, pages_per_sheet)
+                if signatures is not None:
+                    sheets = signature_sheets(layout, pages_per_sheet, *signatures)
+                parts = reprint_plan(original_pages, layout, pages_per_sheet, *sheets)
+            
+            self.print_layout(layout)
+            entries = sum(len(signature_plan) for _, _, signature_plan in parts)
+            print(f"\n Reprinting press sheet(s) {sheets[0]}-{sheets[1]} "
+                  f"from {len(parts)} signature(s)...")
+            
+            with self.stage("number_impose_and_serialize", entries), open(output_file, "wb") as output_fp:
+                output = StreamingPdfWriter(output_fp, session.pdf_header, deduplicate=self.optimize,
+                                            compress=self.optimize)
+                for signature, start, signature_plan in parts:
+                    if not self.quiet:
+                        print(f"   Processing signature {signature}...", end=" ")
+                    with self.stage("signature", len(signature_plan)):
+                        batch = output.new_batch()
+                        # Blanks are sized as in the full booklet, from the signature's first page
+                        self.add_signature(batch, signature_plan, session.page, pages_per_sheet,
+                                           self.blank_size([start], session.page))
+                        output.write_batch(batch)
+                        session.reader.resolved_objects.clear()
+                    if not self.quiet:
+                        print("OK")
+                output.close()
+            
+            self.report_optimization(output)
+            print(f"OK Success! Sheets saved as '{output_file}'")
+            print(f" Total pages: {output.pages_written}")
+            
+            self.last_result = {
+                "original_pages": original_pages,
+                "sheets": list(sheets),
+                "signatures": [signature for signature, _, _ in parts],
+                "source_pages": sum(page_index >= 0 for _, _, signature_plan in parts
+                                    for page_index in signature_plan),
+                "output_pages": output.pages_written,
+            }
+            return True
+        
+        except Exception as e:
+            self.report_error(e)
+            return False
+        finally:
+            self.close_document()
+    
+    def gang_run(self, input_files: List[str], signature_size, pages_per_sheet: int, output_file: str,
+                 manifest_file: str) -> bool:
+        """Impose several short jobs together, packing their folded sheets onto shared press sheets.
+        
+        Each job gets its own signatures and page numbers, as if imposed
+        alone; gang_sheets then packs the folded sheets onto the fewest
+        press sheets. The output is always laid out N-up (sheet_layout is
+        on for the run, then restored). ``manifest_file`` receives the cut and collate manifest
+        (see gang_manifest).
+        """
+        if not input_files:
+            print("Error: No PDF files to gang")
+            return False
+        sheet_layout, self.sheet_layout = self.sheet_layout, True
+        # A job's document is opened for its first piece and closed after its last
+        sessions = {}
+        try:
+            with self.stage("plan") as stage:
+                jobs = []
+                for input_file in input_files:
+                    total_pages = probe_pdf(input_file)["pages"]
+                    if total_pages is None:
+                        raise ValueError(f"'{input_file}' is encrypted and needs a password")
+                    jobs.append((input_file, total_pages, self.resolve_layout(total_pages, signature_size,
+                                                                              pages_per_sheet)))
+                total_pages = stage["pages"] = sum(job[1] for job in jobs)
+                sheets = gang_sheets([layout for _, _, layout in jobs], pages_per_sheet)
+                manifest = gang_manifest(jobs, sheets, pages_per_sheet)
+            
+            print(f"\n Ganging {len(jobs)} job(s) onto {manifest['press_sheets']} press sheet(s) "
+                  f"instead of {manifest['separate_press_sheets']}...")
+            
+            pieces_left = [0] * len(jobs)
+            for pieces in sheets:
+                for job, _, _ in pieces:
+                    pieces_left[job] += 1
+            
+            version = max(pdf_version(input_file) for input_file in input_files)
+            with self.stage("number_impose_and_serialize", total_pages), open(output_file, "wb") as output_fp:
+                output = StreamingPdfWriter(output_fp, b"%PDF-" + version, deduplicate=self.optimize,
+                                            compress=self.optimize)
+                cell_size = None
+                for number, pieces in enumerate(sheets, 1):
+                    # Each folded sheet's front pages, then every back, as signature_pattern lists them
+                    fronts, backs = [], []
+                    for job, signature, fold in pieces:
+                        front, back = fold_pages(jobs[job][1], jobs[job][2], signature, fold)
+                        fronts += [(job, page_index) for page_index in front]
+                        backs += [(job, page_index) for page_index in back]
+                    
+                    with self.stage("sheet", len(fronts) + len(backs)):
+                        batch = output.new_batch()
+                        # A sheet of blank folds takes the previous sheet's cells
+                        blank = all(page_index < 0 for _, page_index in fronts + backs)
+                        imposer = NUpImposer(batch, pages_per_sheet, self.head_to_head,
+                                             cell_size if blank else None)
+                        for job, page_index in fronts + backs:
+                            if page_index < 0:
+                                self.add_planned_page(imposer, page_index)
+                                continue
+                            if job not in sessions:
+                                sessions[job] = DocumentSession(jobs[job][0])
+                            # Numbered within its own job
+                            self.add_planned_page(imposer, page_index, sessions[job].page(page_index))
+                        imposer.finish()
+                        cell_size = imposer.cell_size
+                        self.add_marks(batch, 0, pages_per_sheet)
+                        output.write_batch(batch)
+                    
+                    for job, _, _ in pieces:
+                        pieces_left[job] -= 1
+                        if not pieces_left[job] and job in sessions:
+                            sessions.pop(job).close()
+                    if not self.quiet:
+                        print(f"   Sheet {number}: " + ", ".join(
+                            f"{os.path.basename(jobs[job][0])} {signature + 1}.{fold + 1}"
+                            for job, signature, fold in pieces))
+                output.close()
+            
+            with open(manifest_file, "w") as manifest_fp:
+                json.dump(manifest, manifest_fp, indent=1)
+        except Exception as e:
+            self.report_error(e)
+            return False
+        finally:
+            self.sheet_layout = sheet_layout
+            for session in sessions.values():
+                session.close()
+        
+        self.report_optimization(output)
+        print(f"OK Success! Press sheets saved as '{output_file}'")
+        print(f" Cut and collate manifest saved as '{manifest_file}'")
+        self.last_result = {key: manifest[key] for key in ("press_sheets", "separate_press_sheets")}
+        self.last_result["output_pages"] = output.pages_written
+        return True
+    
+    def merge_pdfs(self, input_files: List[str], output_file: str) -> bool:
+        """Merge chapter PDFs, in order, into one book ready for process_pdf.
+        
+        Chapters are streamed into the output one at a time, so memory is
+        bounded by the largest chapter; fonts and images shared between
+        chapters are written once. With ``optimize`` the output is compressed.
+        """
+        if not input_files:
+            print("Error: No PDF files to merge")
+            return False
+        try:
+            print(f"\n Merging {len(input_files)} file(s)...")
+            with self.stage("merge") as stage, open(output_file, "wb") as output_fp:
+                result = merge_pdfs(input_files, output_fp, compress=self.optimize)
+                stage["pages"] = result["pages"]
+        except Exception as e:
+            self.report_error(e, "Error merging PDFs")
+            return False
+        
+        if not self.quiet:
+            for chapter in result["files"]:
+                print(f"   {chapter['path']}: {chapter['pages']} pages from page {chapter['first_page']}")
+        print(f"OK Success! Merged PDF saved as '{output_file}'")
+        print(f" Total pages: {result['pages']}")
+        if result["duplicates_dropped"]:
+            print(f" Shared objects written once: {result['duplicates_dropped']} duplicate(s), "
+                  f"{result['bytes_saved'] / 1024:.1f} KiB saved")
+        self.last_result = result
+        return True
+    
+    def write_manifest(self, input_file: str, signature_size, pages_per_sheet: int, output_file: str):
+        """Record the settings, page hashes and sheet map of a finished booklet."""
+        try:
+            with self.stage("manifest") as stage:
+                session = self.open_document(input_file)
+                original_pages = stage["pages"] = len(session.pages)
+                layout = self.resolve_layout(original_pages, signature_size, pages_per_sheet)
+                plan, _ = self.plan_imposition(original_pages, layout, pages_per_sheet)
+                manifest = build_manifest(self.cache_settings(signature_size, pages_per_sheet), layout,
+                                          page_fingerprints(session.pages), plan, output_file,
+                                          self.last_result["output_pages"])
+                save_manifest(manifest_path(output_file), manifest)
+        except (OSError, ValueError) as e:
+            # The booklet itself is fine; it just can't be updated incrementally
+            print(f"Warning: Could not write the manifest: {str(e)}")
+            return
+        print(f" Manifest saved as '{manifest_path(output_file)}'")
+    
+    def apply_settings(self, settings: dict):
+        """Take over the settings recorded by cache_settings (e.g. from a manifest)."""
+        for name in ("sheet_layout", "head_to_head", "sewing_marks", "cutting_lines", "optimize",
+                     "number_format", "number_position", "number_size"):
+            setattr(self, name, settings[name])
+        if "signature_sizes" in settings:
+            self.signature_sizes = tuple(settings["signature_sizes"])
+    
+    def update_pdf(self, input_file: str, previous_output: str, output_file: Optional[str] = None) -> bool:
+        """Re-impose a revised input, rebuilding only the signatures whose pages changed.
+        
+        ``previous_output`` needs the manifest written with ``manifest`` on;
+        its settings are reused and the other signatures are copied from it.
+        When the page count or the previous booklet itself changed, the whole
+        book is imposed again. The output (by default the previous booklet,
+        replaced in place) gets a fresh manifest.
+        """
+        output_file = output_file or previous_output
+        try:
+            manifest = load_manifest(manifest_path(previous_output))
+        except (OSError, ValueError) as e:
+            self.report_error(e, f"No usable manifest for '{previous_output}'")
+            return False
+        settings = manifest["settings"]
+        self.apply_settings(settings)
+        self.manifest = True
+        
+        try:
+            print(f"\n Reading PDF: {input_file}")
+            with self.stage("read") as stage:
+                session = self.open_document(input_file)
+                original_pages = stage["pages"] = len(session.pages)
             print(f" Original pages: {original_pages}")
             
-            # Add page numbers first
-            print(" Adding page numbers...")
-            numbered_writer = self.add_page_numbers(reader)
-            print("OK Page numbers added")
+            try:
+                unchanged_output = output_stamp(previous_output) == manifest["output"]
+                previous_pages = probe_pdf(previous_output)["pages"]
+            except (OSError, ValueError):
+                unchanged_output, previous_pages = False, None
+            # The sheet map must describe the pages the previous booklet really has
+            mapped_pages = manifest["signatures"][-1]["output_pages"][1]
+            consistent = previous_pages == mapped_pages == manifest.get("output_pages", mapped_pages)
+            if original_pages != manifest["source_pages"] or not unchanged_output or not consistent:
+                if original_pages != manifest["source_pages"]:
+                    print(f"Warning: Page count changed from {manifest['source_pages']}; imposing the whole book")
+                elif not unchanged_output:
+                    print(f"Warning: '{previous_output}' changed since its manifest was written; "
+                          f"imposing the whole book")
+                else:
+                    print(f"Warning: '{previous_output}' has {previous_pages} pages but its manifest maps "
+                          f"{mapped_pages}; imposing the whole book")
+                self.close_document()
+                return self.process_pdf(input_file, settings["signature_size"], settings["pages_per_sheet"],
+                                        output_file)
+            
+            with self.stage("fingerprint", original_pages):
+                fingerprints = page_fingerprints(session.pages)
+            changed = changed_signatures(manifest, fingerprints)
+            layout = tuple(manifest["layout"])
+            print(f" {len(changed)} of {len(layout)} signature(s) changed")
+            
+            # Write beside the output and rename, so the previous booklet can be the output
+            output_dir = os.path.dirname(os.path.abspath(output_file))
+            fd, temp_file = tempfile.mkstemp(dir=output_dir, prefix=".tmp-", suffix=".pdf")
+            try:
+                with self.stage("splice", original_pages), os.fdopen(fd, "wb") as output_fp, \
+                        DocumentSession(previous_output) as previous:
+                    plan, blank_pages_added = self.plan_imposition(original_pages, layout, settings["pages_per_sheet"])
+                    output = self.splice_signatures(session, previous, manifest, plan, changed, output_fp)
+                # mkstemp files are private; keep the previous booklet's permissions
+                shutil.copymode(previous_output, temp_file)
+                os.replace(temp_file, output_file)
+            except BaseException:
+                if os.path.exists(temp_file):
+                    os.unlink(temp_file)
+                raise
+            
+            manifest.update(output=output_stamp(output_file), output_pages=output.pages_written,
+                            page_hashes=fingerprints)
+            save_manifest(manifest_path(output_file), manifest)
+            
+            self.report_optimization(output)
+            print(f"OK Success! Booklet saved as '{output_file}'")
+            print(f" Total pages in booklet: {output.pages_written}")
+            
+            self.last_result = {
+                "original_pages": original_pages,
+                "blank_pages": blank_pages_added,
+                "output_pages": output.pages_written,
+                "changed_signatures": len(changed),
+            }
+            return True
+        
+        except Exception as e:
+            self.report_error(e)
+            return False
+        finally:
+            self.close_document()
+    
+    def splice_signatures(self, session: DocumentSession, previous: DocumentSession, manifest: dict,
+                          plan, changed: List[int], output_fp) -> StreamingPdfWriter:
+        """Impose the ``changed`` signatures anew and copy the rest from the previous booklet.
+        
+        Runs of unchanged signatures go into one batch, so their shared fonts
+        are copied once; deduplication merges them with the rebuilt ones.
+        """
+        pages_per_sheet = manifest["settings"]["pages_per_sheet"]
+        output = StreamingPdfWriter(output_fp, session.pdf_header, deduplicate=True, compress=self.optimize)
+        changed = set(changed)
+        batch = None
+        
+        bounds = signature_bounds(manifest["layout"])
+        for number, ((start, end), signature) in enumerate(zip(bounds, manifest["signatures"])):
+            if number in changed:
+                if batch is not None:
+                    output.write_batch(batch)
+                with self.stage("signature", end - start):
+                    batch = output.new_batch()
+                    self.add_signature(batch, plan[start:end], session.page, pages_per_sheet)
+                    output.write_batch(batch)
+                batch = None
+                session.reader.resolved_objects.clear()
+                continue
+            
+            batch = batch or output.new_batch()
+            first_page, end_page = signature["output_pages"]
+            for page_index in range(first_page, end_page):
+                batch.add_page(previous.page(page_index))
+        
+        if batch is not None:
+            output.write_batch(batch)
+        output.close()
+        return output
+    
+    def process_pdf_in_memory(self, input_file: str, signature_size, pages_per_sheet: int,
+                              output_file: str) -> bool:
+        """Processing function that builds the whole booklet in one writer."""
+        try:
+            print(f"\n Reading PDF: {input_file}")
+            with self.stage("read") as stage:
+                reader = self.open_document(input_file)
+                original_pages = stage["pages"] = len(reader.pages)
+            print(f" Original pages: {original_pages}")
             
-            # Add blank pages if needed
-            writer, blank_pages_added = self.add_blank_pages(numbered_writer, signature_size)
+            # Work out the final page order up front
+            with self.stage("plan", original_pages):
+                layout = self.resolve_layout(original_pages, signature_size, pages_per_sheet)
+                plan, blank_pages_added = self.plan_imposition(original_pages, layout, pages_per_sheet)
             
+            self.print_layout(layout)
             if blank_pages_added > 0:
-                print(f" Added {blank_pages_added} blank page(s)")
+                print(f" Adding {blank_pages_added} blank page(s)")
             else:
                 print("OK No blank pages needed")
             
-            # Reorder pages
-            final_writer = self.reorder_pages(writer, signature_size, pages_per_sheet)
+            # Number and reorder pages in a single writer pass
+            print(" Adding page numbers and reordering pages...")
+            with self.stage("number_and_impose", len(plan)):
+                final_writer = self.write_plan(reader, plan, layout, pages_per_sheet)
             
             # Save the result
             print(f"\n Saving to: {output_file}")
-            with open(output_file, "wb") as output_fp:
-                final_writer.write(output_fp)
+            with self.stage("serialize", len(plan)), open(output_file, "wb") as output_fp:
+                if self.optimize:
+                    self.report_optimization(self.write_optimized(final_writer, output_fp, reader.pdf_header))
+                else:
+                    final_writer.write(output_fp)
             
             print(f"OK Success! Booklet saved as '{output_file}'")
             print(f" Total pages in booklet: {len(final_writer.pages)}")
             
+            self.last_result = {
+                "original_pages": original_pages,
+                "blank_pages": blank_pages_added,
+                "output_pages": len(final_writer.pages),
+            }
             return True
             
         except Exception as e:
-            print(f"Error: Error processing PDF: {str(e)}")
+            self.report_error(e)
             return False
     
     def run(self):
@@ -304,10 +1109,9 @@ class BookletProcessor:
                 if not input_file:
                     continue
                 
-                # Read PDF to get page count
+                # Open the PDF to get page count; process_pdf reuses this parse
                 try:
-                    reader = PdfReader(input_file)
-                    total_pages = len(reader.pages)
+                    total_pages = len(self.open_document(input_file).pages)
                 except Exception as e:
                     print(f"Error: Error reading PDF: {str(e)}")
                     continue
@@ -344,11 +1148,106 @@ class BookletProcessor:
                 print("Please try again or contact support.")
 
 
-def main():
-    """Entry point of the program."""
+# Reader shared by the signature chunks a parallel worker process imposes
+_chunk_reader = None
+
+
+def _init_chunk_worker(input_file: str):
+    """Parse the input once per worker process.
+    
+    The session memory-maps the file, so all workers share the operating
+    system's page cache instead of each holding a private copy.
+    """
+    global _chunk_reader
+    _chunk_reader = DocumentSession(input_file)
+
+
+def _impose_chunk(job) -> str:
+    """Number and impose one signature-aligned slice of the plan."""
+    processor, plan_chunk, layout, pages_per_sheet, chunk_file = job
+    writer = PdfWriter()
+    
+    for start, end in signature_bounds(layout):
+        processor.add_signature(writer, plan_chunk[start:end], _chunk_reader.pages.__getitem__, pages_per_sheet)
+    
+    with open(chunk_file, "wb") as chunk_fp:
+        writer.write(chunk_fp)
+    return chunk_file
+
+
+BATCH_SUMMARY_FIELDS = ["input", "output", "success", "pages", "blank_pages",
+                        "seconds", "output_bytes", "error"]
+
+
+def _process_batch_file(job: Tuple) -> dict:
+    """Impose one file inside a batch worker process."""
+    input_file, output_file, signature_size, pages_per_sheet, streaming, optimize, cache, signature_sizes = job
     processor = BookletProcessor()
-    processor.run()
+    processor.quiet = True
+    processor.optimize = optimize
+    processor.cache = cache
+    processor.signature_sizes = signature_sizes
+    
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        success = processor.process_pdf(input_file, signature_size, pages_per_sheet, output_file, streaming)
+    seconds = time.perf_counter() - start
+    
+    result = processor.last_result or {}
+    error = ""
+    if not success:
+        error = str(processor.last_error or "unknown error")
+    
+    return {
+        "input": input_file,
+        "output": output_file,
+        "success": success,
+        "pages": result.get("original_pages", 0),
+        "blank_pages": result.get("blank_pages", 0),
+        "seconds": round(seconds, 3),
+        "output_bytes": os.path.getsize(output_file) if success else 0,
+        "error": error,
+    }
+
+
+def batch_process(input_files: List[str], signature_size, pages_per_sheet: int,
+                  output_dir: Optional[str] = None, workers: Optional[int] = None,
+                  streaming: bool = False, optimize: bool = False,
+                  cache: Optional[ResultCache] = None,
+                  signature_sizes: Sequence[int] = SIGNATURE_SIZES) -> List[dict]:
+    """Impose many PDFs in a process pool, one file per task.
+    
+    Outputs are named ``<name>_booklet.pdf`` and written next to each input
+    unless output_dir is given. With signature_size "auto" each file gets
+    its own mix of ``signature_sizes``. Returns one summary row per file,
+    in input order.
+    """
+    # Fail before starting any workers if the settings are unusable
+    check_signature_size(signature_size, pages_per_sheet, signature_sizes)
+    
+    jobs = []
+    for input_file in input_files:
+        target_dir = output_dir or os.path.dirname(input_file)
+        output_file = os.path.join(target_dir, f"{Path(input_file).stem}_booklet.pdf")
+        jobs.append((input_file, output_file, signature_size, pages_per_sheet, streaming, optimize, cache,
+                     tuple(signature_sizes)))
+    
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_process_batch_file, jobs))
+
+
+def write_batch_summary(results: List[dict], summary_file: str):
+    """Write the per-file batch summary as CSV."""
+    with open(summary_file, "w", newline="") as summary_fp:
+        summary_writer = csv.DictWriter(summary_fp, fieldnames=BATCH_SUMMARY_FIELDS)
+        summary_writer.writeheader()
+        summary_writer.writerows(results)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # The same commands as booklet_cli.py; without one, the interactive program
+    from booklet_cli import main
+    sys.exit(main())
@@ -1,4 +1,5 @@
 from PyPDF2 import PdfReader, PdfWriter
+from imposition_plan import signature_pattern
 
 file = input("Name of the file with BLANK PAGES and PAGE NUMBERS (program adds .pdf)\n> ")
 
@@ -6,17 +7,18 @@ file = input("Name of the file with BLANK PAGES and PAGE NUMBERS (program adds .
 reader = PdfReader(f"{file}.pdf")
 writer = PdfWriter()
 
-SIXTEEN = [15, 0, 13, 2, 1, 14, 3, 12, 11, 4, 9, 6, 5, 10, 7, 8]
 reorder = []
 meta = reader.metadata
 
-number_of_leaflets = int(input("How many leaflets?\n> "))
-
-if number_of_leaflets == 16:
-    reorder = SIXTEEN
-else:
-    print("You'll have to edit the code")
-length_of_pdf = int(len(reader.pages)/16)
+while not reorder:
+    try:
+        number_of_leaflets = int(input("How many leaflets?\n> "))
+        if number_of_leaflets <= 0:
+            raise ValueError
+        reorder = list(signature_pattern(number_of_leaflets, 4))
+    except ValueError:
+        print("The number of leaflets must be a positive multiple of 4")
+length_of_pdf = int(len(reader.pages)/number_of_leaflets)
 
 add = 0
 
@@ -25,7 +27,7 @@ for i in range(length_of_pdf):
     for p in range(len(reorder)):
         page = reorder[p] + add
         writer.add_page(reader.pages[page])
-    add += 16
+    add += number_of_leaflets
 
 
 # print(meta.author)
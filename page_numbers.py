@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Page numbers written straight into page content.
+Each number is a handful of text operators appended to the page's own
+content streams, drawn in the standard Helvetica font shared by every
+page, so numbering a page costs one tiny stream instead of rendering an
+overlay PDF, parsing it back and merging the page into it.
+"""
+
+from typing import Optional
+
+from PyPDF2 import PdfWriter, PageObject
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject
+
+from imposition_plan import NUMBER_POSITIONS
+from sheet_imposition import pdf_number
+
+
+# Helvetica glyph widths (1/1000 em) for characters 32-126, from its AFM metrics
+HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+
+# Resource name of the shared number font
+FONT_NAME = "/BookletPageNumber"
+
+
+def text_width(text: str, font_size: float) -> float:
+    """Width of ``text`` set in Helvetica at ``font_size``."""
+    return sum(HELVETICA_WIDTHS[ord(char) - 32] if 32 <= ord(char) <= 126 else 556
+               for char in text) * font_size / 1000
+
+
+def _pdf_string(text: str) -> bytes:
+    encoded = text.encode("cp1252", errors="replace")
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _stream(data: bytes) -> DecodedStreamObject:
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+def _helvetica() -> DictionaryObject:
+    return DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    })
+
+
+class PageNumberStamps:
+    """Numbers pages bound for one writer.
+
+    ``number_page`` returns a numbered copy of a source page: its content
+    streams are wrapped in a shared ``q`` stream and followed by the
+    page's own number stream, and its resources gain the shared font.
+    Source pages (and their resources) are never modified, so the same
+    reader can be numbered twice. Batches of one StreamingPdfWriter share
+    a single font and ``q`` stream, written with the first batch.
+    """
+
+    def __init__(self, writer: PdfWriter, number_format: str = "{n}", position: str = "bottom-center",
+                 font_size: float = 12, margin: float = 30):
+        if position not in NUMBER_POSITIONS:
+            raise ValueError(f"Number position must be one of {NUMBER_POSITIONS}, got {position!r}")
+        # Fail now rather than on the first page
+        number_format.format(n=1)
+        self.writer = writer
+        self.number_format = number_format
+        self.position = position
+        self.font_size = font_size
+        self.margin = margin
+        self._font: Optional[IndirectObject] = None
+        self._save_state: Optional[IndirectObject] = None
+
+    def _add_stream(self, data: bytes) -> IndirectObject:
+        return self.writer._add_object(_stream(data))
+
+    def _shared_objects(self):
+        if self._font is None:
+            output = getattr(self.writer, "streaming_output", None)
+            if output is not None:
+                # A batch of a streamed file: one font and q stream for the whole file
+                self._font = output.shared_object(self.writer, "page-number-font", _helvetica)
+                self._save_state = output.shared_object(self.writer, "page-number-q", lambda: _stream(b"q"))
+            else:
+                self._font = self.writer._add_object(_helvetica())
+                self._save_state = self._add_stream(b"q")
+        return self._font, self._save_state
+
+    def text_origin(self, page: PageObject, number: int, width: float):
+        """Baseline start of a number ``width`` points wide on ``page``."""
+        x0, y0, x1, y1 = (float(v) for v in page.mediabox)
+        edge, place = self.position.split("-")
+        if place == "outside":
+            place = "right" if number % 2 else "left"
+        elif place == "inside":
+            place = "left" if number % 2 else "right"
+
+        if place == "center":
+            x = x0 + (x1 - x0 - width) / 2
+        elif place == "left":
+            x = x0 + self.margin
+        else:
+            x = x1 - self.margin - width
+        y = y0 + self.margin if edge == "bottom" else y1 - self.margin - self.font_size
+        return x, y
+
+    def number_page(self, page: PageObject, number: int) -> PageObject:
+        """Copy of ``page`` with ``number`` drawn on it."""
+        font, save_state = self._shared_objects()
+        text = self.number_format.format(n=number)
+        x, y = self.text_origin(page, number, text_width(text, self.font_size))
+
+        numbered = PageObject(page.pdf)
+        numbered.update(dict.items(page))
+
+        resources = page.get("/Resources")
+        resources = DictionaryObject(dict.items(resources.get_object())) if resources is not None \
+            else DictionaryObject()
+        fonts = resources.get("/Font")
+        fonts = DictionaryObject(dict.items(fonts.get_object())) if fonts is not None else DictionaryObject()
+        fonts[NameObject(FONT_NAME)] = font
+        resources[NameObject("/Font")] = fonts
+        numbered[NameObject("/Resources")] = resources
+
+        contents = page.raw_get("/Contents") if "/Contents" in page else None
+        if contents is None:
+            contents = []
+        elif isinstance(contents.get_object(), ArrayObject):
+            contents = list(contents.get_object())
+        else:
+            contents = [contents]
+        # The page's own graphics state is restored before the number is drawn
+        operations = f"Q q BT {FONT_NAME} {pdf_number(self.font_size)} Tf 0 g {pdf_number(x)} {pdf_number(y)} Td "
+        number_stream = self._add_stream(operations.encode() + _pdf_string(text) + b" Tj ET Q")
+        numbered[NameObject("/Contents")] = ArrayObject([save_state] + contents + [number_stream])
+        return numbered
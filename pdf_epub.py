@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+PDF to EPUB conversion.
+Page text and embedded images are extracted in worker processes, a few
+pages per task, and written into the EPUB as they arrive: the container
+is a ZIP streamed to disk (``mimetype`` stored first, as EPUB requires),
+so only the chapter being assembled is held in memory. Chapters follow
+the browser version's createChapterStructure.
+"""
+
+import html
+import io
+import os
+import re
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from PyPDF2.generic import DictionaryObject, IndirectObject
+
+from document_session import DocumentSession
+
+try:
+    # PyPDF2 has no public call that turns an image XObject into a file
+    from PyPDF2.filters import _xobj_to_image
+except ImportError:
+    _xobj_to_image = None
+
+# Pages extracted per worker task, and tasks kept in flight per worker
+EXTRACT_CHUNK_PAGES = 8
+TASKS_PER_WORKER = 2
+
+# Characters XML 1.0 doesn't allow
+INVALID_XML_PATTERN = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+# Media types of the image files written into the EPUB
+IMAGE_MEDIA_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".gif": "image/gif"}
+IMAGE_MODES = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}
+
+CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+    <rootfiles>
+        <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+    </rootfiles>
+</container>"""
+
+CHAPTER_STYLE = """        body { margin: 0 5%; }
+        .page { margin-bottom: 2em; }
+        img { max-width: 100%; height: auto; margin: 10px 0; }"""
+
+# Document opened by _init_extract_worker, one per worker process, and
+# the images that worker has already sent
+_extract_session = None
+_images_sent = set()
+
+
+def chapter_structure(total_pages: int, pages_per_chapter: Union[int, str]) -> List[Dict]:
+    """Chapters of a book: ``pages_per_chapter`` pages each, or "all" in one chapter.
+
+    Titles and 1-based page lists as in the browser version.
+    """
+    if pages_per_chapter == "all":
+        return [{"title": "Complete Document", "pages": list(range(1, total_pages + 1))}]
+    pages_per_chapter = int(pages_per_chapter)
+    if pages_per_chapter < 1:
+        raise ValueError(f"Pages per chapter must be at least 1, got {pages_per_chapter}")
+    return [{"title": f"Chapter {number}", "pages": list(range(start + 1, min(start + pages_per_chapter, total_pages) + 1))}
+            for number, start in enumerate(range(0, total_pages, pages_per_chapter), 1)]
+
+
+def _xml(text: str, quote: bool = False) -> str:
+    return html.escape(INVALID_XML_PATTERN.sub("", text), quote=quote)
+
+
+def text_paragraphs(text: str) -> List[str]:
+    """Extracted page text joined back into paragraphs.
+
+    Text extraction gives one line per printed line; a line that is empty,
+    or clearly shorter than the page's full lines, ends a paragraph.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    full_width = max((len(line) for line in lines), default=0)
+    paragraphs, current = [], []
+    for line in lines:
+        if line:
+            current.append(line)
+        if current and (not line or len(line) < full_width * 0.75):
+            paragraphs.append(" ".join(current))
+            current = []
+    if current:
+        paragraphs.append(" ".join(current))
+    return paragraphs
+
+
+def _init_extract_worker(input_file: str):
+    """Parse the input once per worker process (memory-mapped, see DocumentSession)."""
+    global _extract_session, _images_sent
+    _extract_session = DocumentSession(input_file)
+    _images_sent = set()
+
+
+def _extract_pages(page_range: Tuple[int, int]) -> List[Tuple[int, str, List[Tuple[str, Optional[bytes]]]]]:
+    """Text and images of pages ``start`` to ``end`` (0-based, end excluded).
+
+    Images are named after their object number, so one shared by many
+    pages gets one file. Each worker sends an image's bytes only once;
+    later uses carry the bare name and None.
+    """
+    session = _extract_session
+    pages = []
+    for index in range(*page_range):
+        page = session.pages[index]
+        try:
+            text = page.extract_text()
+        except Exception:
+            # Unreadable text; keep the page's images
+            text = ""
+        images = []
+        for name, image in _page_images(page):
+            if name in _images_sent:
+                images.append((name, None))
+                continue
+            _images_sent.add(name)
+            try:
+                extension, data = _image_file(image)
+            except ImportError:
+                raise
+            except Exception:
+                # A filter or color space nothing here can decode
+                continue
+            images.append((name + extension, data))
+        pages.append((index + 1, text, images))
+    session.reader.resolved_objects.clear()
+    return pages
+
+
+def _page_images(page) -> List[Tuple[str, DictionaryObject]]:
+    """(name, image) of every image XObject on a page, form XObjects included."""
+    found, seen = [], set()
+    stack = [page.get("/Resources")]
+    while stack:
+        resources = stack.pop()
+        if resources is None:
+            continue
+        xobjects = resources.get_object().get("/XObject")
+        if xobjects is None:
+            continue
+        for reference in xobjects.get_object().values():
+            if not isinstance(reference, IndirectObject) or reference.idnum in seen:
+                continue
+            seen.add(reference.idnum)
+            xobject = reference.get_object()
+            if xobject.get("/Subtype") == "/Image":
+                found.append((f"image_{reference.idnum}", xobject))
+            elif xobject.get("/Subtype") == "/Form":
+                stack.append(xobject.get("/Resources"))
+    return found
+
+
+def _image_file(image) -> Tuple[str, bytes]:
+    """(extension, bytes) of an image XObject as a file an EPUB reader shows."""
+    filters = image.get("/Filter")
+    if isinstance(filters, list) and len(filters) == 1:
+        filters = filters[0]
+    if filters == "/DCTDecode":
+        # JPEG data is already a JPEG file
+        return ".jpg", image._data
+    if isinstance(filters, list) and image.get("/ColorSpace") in IMAGE_MODES \
+            and image.get("/BitsPerComponent") == 8:
+        # A filter chain (ReportLab writes ASCII85 over Flate) that
+        # _xobj_to_image does not follow: decode it here and save a PNG
+        Image = _pillow()
+
+        mode = IMAGE_MODES[image["/ColorSpace"]]
+        output = io.BytesIO()
+        Image.frombytes(mode, (image["/Width"], image["/Height"]), image.get_data()).save(output, "PNG")
+        return ".png", output.getvalue()
+    if _xobj_to_image is None:
+        raise ImportError("Converting images needs PyPDF2 3.x, which provides PyPDF2.filters._xobj_to_image")
+    # Every image but a JPEG is re-encoded with Pillow
+    _pillow()
+    extension, data = _xobj_to_image(image)[:2]
+    if extension not in IMAGE_MEDIA_TYPES:
+        raise ValueError(f"Unsupported image type {extension}")
+    return extension, data
+
+
+def _pillow():
+    """The PIL.Image module, or an ImportError that says what to install."""
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("Converting images needs Pillow: pip install Pillow") from None
+    return Image
+
+
+def _chapter_xhtml(title: str, pages: List[Tuple[int, str, List[str]]]) -> str:
+    parts = [f"""<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+    <title>{_xml(title)}</title>
+    <style>
+{CHAPTER_STYLE}
+    </style>
+</head>
+<body>
+    <h1>{_xml(title)}</h1>
+"""]
+    for page_number, text, image_names in pages:
+        parts.append(f'    <div class="page" id="page_{page_number}">\n')
+        parts.extend(f"        <p>{_xml(paragraph)}</p>\n" for paragraph in text_paragraphs(text))
+        parts.extend(f'        <img src="Images/{name}" alt="Page {page_number}"/>\n' for name in image_names)
+        parts.append("    </div>\n")
+    parts.append("</body>\n</html>\n")
+    return "".join(parts)
+
+
+def _nav_xhtml(title: str, chapters: List[Dict]) -> str:
+    items = "".join(f'            <li><a href="chapter_{number}.xhtml">{_xml(chapter["title"])}</a></li>\n'
+                    for number, chapter in enumerate(chapters, 1))
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>{_xml(title)}</title></head>
+<body>
+    <nav epub:type="toc" id="toc">
+        <h1>{_xml(title)}</h1>
+        <ol>
+{items}        </ol>
+    </nav>
+</body>
+</html>
+"""
+
+
+def _toc_ncx(identifier: str, title: str, chapters: List[Dict], total_pages: int) -> str:
+    nav_points = "".join(f"""        <navPoint id="chapter_{number}" playOrder="{number}">
+            <navLabel><text>{_xml(chapter["title"])}</text></navLabel>
+            <content src="chapter_{number}.xhtml"/>
+        </navPoint>
+""" for number, chapter in enumerate(chapters, 1))
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+    <head>
+        <meta name="dtb:uid" content="{identifier}"/>
+        <meta name="dtb:depth" content="1"/>
+        <meta name="dtb:totalPageCount" content="{total_pages}"/>
+        <meta name="dtb:maxPageNumber" content="{total_pages}"/>
+    </head>
+    <docTitle><text>{_xml(title)}</text></docTitle>
+    <navMap>
+{nav_points}    </navMap>
+</ncx>
+"""
+
+
+def _content_opf(identifier: str, metadata: Dict, manifest_items: List[str], chapter_count: int) -> str:
+    spine = "".join(f'        <itemref idref="chapter_{number}"/>\n' for number in range(1, chapter_count + 1))
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<package version="3.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="uid">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <dc:identifier id="uid">{identifier}</dc:identifier>
+        <dc:title>{_xml(metadata["title"])}</dc:title>
+        <dc:creator>{_xml(metadata["author"])}</dc:creator>
+        <dc:language>{_xml(metadata["language"])}</dc:language>
+        <dc:description>{_xml(metadata["description"] or "Converted from PDF")}</dc:description>
+        <meta property="dcterms:modified">{time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}</meta>
+    </metadata>
+    <manifest>
+        <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+        <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+{"".join(manifest_items)}    </manifest>
+    <spine toc="ncx">
+{spine}    </spine>
+</package>
+"""
+
+
+def extracted_pages(input_file: str, total_pages: int, workers: int = 1):
+    """Yield (page number, text, images) for every page, in order.
+
+    With more than one worker, pages are extracted in a process pool with
+    a bounded number of tasks in flight, so results never pile up faster
+    than the EPUB is written.
+    """
+    ranges = [(start, min(start + EXTRACT_CHUNK_PAGES, total_pages))
+              for start in range(0, total_pages, EXTRACT_CHUNK_PAGES)]
+    if workers == 1:
+        _init_extract_worker(input_file)
+        try:
+            for page_range in ranges:
+                yield from _extract_pages(page_range)
+        finally:
+            _extract_session.close()
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_extract_worker,
+                             initargs=(input_file,)) as executor:
+        pending = deque()
+        remaining = iter(ranges)
+        for page_range in remaining:
+            pending.append(executor.submit(_extract_pages, page_range))
+            if len(pending) >= workers * TASKS_PER_WORKER:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            next_range = next(remaining, None)
+            if next_range is not None:
+                pending.append(executor.submit(_extract_pages, next_range))
+            yield from pages
+
+
+def convert_pdf_to_epub(input_file: str, output_file: str, title: str, author: str, language: str = "en",
+                        description: str = "", pages_per_chapter: Union[int, str] = 10,
+                        workers: int = 1) -> Dict:
+    """Write an EPUB 3 book (with an EPUB 2 toc.ncx) of the text and images of a PDF.
+
+    Returns pages, chapters and images written. Raises on unreadable input.
+    """
+    if workers < 1:
+        raise ValueError(f"Workers must be at least 1, got {workers}")
+    with DocumentSession(input_file) as session:
+        total_pages = len(session.pages)
+    chapters = chapter_structure(total_pages, pages_per_chapter)
+    chapter_ends = {chapter["pages"][-1]: number for number, chapter in enumerate(chapters, 1) if chapter["pages"]}
+    identifier = f"urn:uuid:{uuid.uuid4()}"
+
+    manifest_items, images_written = [], set()
+    current: List[Tuple[int, str, List[str]]] = []
+    with zipfile.ZipFile(output_file, "w", zipfile.ZIP_DEFLATED) as epub:
+        # Readers identify the file by this first, uncompressed entry
+        epub.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        epub.writestr("META-INF/container.xml", CONTAINER_XML)
+
+        for page_number, text, images in extracted_pages(input_file, total_pages, workers):
+            names = []
+            for name, data in images:
+                if data is not None and name not in images_written:
+                    images_written.add(name)
+                    # Images are compressed already
+                    epub.writestr(f"OEBPS/Images/{name}", data, compress_type=zipfile.ZIP_STORED)
+                    stem, extension = os.path.splitext(name)
+                    manifest_items.append(f'        <item id="{stem}" href="Images/{name}" '
+                                          f'media-type="{IMAGE_MEDIA_TYPES[extension]}"/>\n')
+                names.append(name if data is not None else _written_name(name, images_written))
+            current.append((page_number, text, [name for name in names if name]))
+
+            number = chapter_ends.get(page_number)
+            if number is not None:
+                epub.writestr(f"OEBPS/chapter_{number}.xhtml", _chapter_xhtml(chapters[number - 1]["title"], current))
+                manifest_items.append(f'        <item id="chapter_{number}" href="chapter_{number}.xhtml" '
+                                      f'media-type="application/xhtml+xml"/>\n')
+                current = []
+
+        metadata = {"title": title, "author": author, "language": language, "description": description}
+        epub.writestr("OEBPS/nav.xhtml", _nav_xhtml(title, chapters))
+        epub.writestr("OEBPS/toc.ncx", _toc_ncx(identifier, title, chapters, total_pages))
+        epub.writestr("OEBPS/content.opf", _content_opf(identifier, metadata, manifest_items, len(chapters)))
+
+    return {"pages": total_pages, "chapters": len(chapters), "images": len(images_written),
+            "output_bytes": os.path.getsize(output_file)}
+
+
+def _written_name(stem: str, images_written) -> Optional[str]:
+    """File name of an image another page already wrote, by its name without extension."""
+    for extension in IMAGE_MEDIA_TYPES:
+        if stem + extension in images_written:
+            return stem + extension
+    return None
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Streaming merge of chapter PDFs.
+Chapters are copied into the output one after another through a
+StreamingPdfWriter, so only the chapter being copied is held in memory,
+never the whole book. Fonts and images that several chapters embed
+identically are written once: the writer's deduplication spans batches.
+"""
+
+import json
+import os
+from typing import BinaryIO, Dict, List, Sequence
+
+from document_session import DocumentSession
+from pdf_probe import HEAD_BYTES, HEADER_PATTERN
+from pdf_stream_writer import StreamingPdfWriter
+
+
+def read_merge_list(path: str) -> List[str]:
+    """Chapter files, in order, from a merge list.
+
+    A ``.json`` list is an array of paths or ``{"files": [...]}``; any
+    other file has one path per line, with blank lines and ``#`` comments
+    skipped. Relative paths are relative to the list's directory.
+    Raises OSError or ValueError.
+    """
+    with open(path) as list_fp:
+        if path.lower().endswith(".json"):
+            entries = json.load(list_fp)
+            if isinstance(entries, dict):
+                entries = entries.get("files")
+            if not isinstance(entries, list) or not all(isinstance(entry, str) for entry in entries):
+                raise ValueError(f"Merge list '{path}' must be an array of paths or {{\"files\": [...]}}")
+        else:
+            entries = [line.strip() for line in list_fp]
+            entries = [entry for entry in entries if entry and not entry.startswith("#")]
+    base = os.path.dirname(os.path.abspath(path))
+    return [os.path.join(base, entry) for entry in entries]
+
+
+def pdf_version(path: str) -> bytes:
+    """Version from a file's header, e.g. b"1.4"."""
+    with open(path, "rb") as pdf_fp:
+        header = HEADER_PATTERN.search(pdf_fp.read(HEAD_BYTES))
+    if header is None:
+        raise ValueError(f"'{path}' is not a PDF")
+    return header.group(1)
+
+
+def merge_pdfs(input_files: Sequence[str], output_fp: BinaryIO, compress: bool = False) -> Dict:
+    """Copy every page of ``input_files``, in order, into ``output_fp``.
+
+    Each chapter is one writer batch; its session is closed before the
+    next chapter is opened. Returns the merged page count, where each
+    chapter starts and how many duplicate objects were dropped.
+    """
+    version = max(pdf_version(path) for path in input_files)
+    output = StreamingPdfWriter(output_fp, b"%PDF-" + version, deduplicate=True, compress=compress)
+    chapters = []
+    for path in input_files:
+        session = DocumentSession(path)
+        try:
+            first_page = output.pages_written + 1
+            batch = output.new_batch()
+            for page in session.pages:
+                batch.add_page(page)
+            output.write_batch(batch)
+        finally:
+            session.close()
+        chapters.append({"path": path, "first_page": first_page, "pages": output.pages_written - first_page + 1})
+    output.close()
+    return {
+        "files": chapters,
+        "pages": output.pages_written,
+        "duplicates_dropped": output.duplicates_dropped,
+        "bytes_saved": output.bytes_saved,
+    }
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Fast PDF probe for order intake and directory scans.
+Reads only the trailer, cross-reference table, catalog and page tree of a
+memory-mapped file (no page contents, fonts or images) to report the page
+count, every page's media box and whether the file is encrypted. The fast
+path parses those few objects itself, so probing doesn't pay for importing
+PyPDF2. Encryption covers only strings and streams, so an encrypted file's
+page tree is read the same way. Damaged files, and anything else it doesn't
+follow, get PyPDF2's full, forgiving parse.
+"""
+
+import mmap
+import re
+import time
+import zlib
+from typing import Dict, List, NamedTuple
+
+# Tokens of the PDF object syntax
+WHITESPACE_PATTERN = re.compile(rb"(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*")
+REFERENCE_PATTERN = re.compile(rb"(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![A-Za-z])")
+NUMBER_PATTERN = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+NAME_PATTERN = re.compile(rb"/[^\x00\t\n\x0c\r ()<>\[\]{}/%]*")
+KEYWORD_PATTERN = re.compile(rb"[A-Za-z]+")
+HEX_STRING_PATTERN = re.compile(rb"<([0-9A-Fa-f\x00\t\n\x0c\r ]*)>")
+OBJECT_PATTERN = re.compile(rb"[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj")
+STREAM_PATTERN = re.compile(rb"[\x00\t\n\x0c\r ]*stream\r?\n")
+HEADER_PATTERN = re.compile(rb"%PDF-(\d\.\d)")
+STARTXREF_PATTERN = re.compile(rb"startxref[\x00\t\n\x0c\r ]+(\d+)")
+XREF_SECTION_PATTERN = re.compile(rb"(\d+)[\t ]+(\d+)[\t ]*\r?\n?")
+XREF_ENTRY_PATTERN = re.compile(rb"(\d{10})[\t ](\d{5})[\t ]([nf])")
+
+# Page tree keys, read straight from a plain object's bytes
+PAGE_TYPE_PATTERN = re.compile(rb"/Type\s*/(Pages?)(?![A-Za-z])")
+KIDS_PATTERN = re.compile(rb"/Kids\s*\[([^\]]*)\]")
+MEDIABOX_PATTERN = re.compile(rb"/MediaBox\s*(\[[^\]]*\]|\d+\s+\d+\s+R)")
+
+# Where to look for ``startxref`` and the header
+TAIL_BYTES = 1024
+HEAD_BYTES = 1024
+
+
+class Reference(NamedTuple):
+    idnum: int
+    generation: int
+
+
+class Stream(dict):
+    """A stream's dictionary, with its still-encoded data."""
+    data = b""
+
+
+def probe_pdf(path: str) -> Dict:
+    """Page count, media boxes and encryption status of ``path``.
+
+    ``method`` is "fast" when the structure parsed cleanly, "full" when
+    the file needed PyPDF2's parse (damaged files, unusual filters, or
+    encrypted files whose page tree sits in object streams). Only then is
+    the empty user password tried: an encrypted file it doesn't open
+    reports ``pages`` as None.
+    Raises PdfReadError (or OSError) when even the full parse fails.
+    """
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as pdf_fp, mmap.mmap(pdf_fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            result = RawPdf(data).describe()
+            result["method"] = "fast"
+    except Exception:
+        result = _describe_full(path)
+        result["method"] = "full"
+    result["path"] = path
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def _describe_full(path: str) -> Dict:
+    # Only files the fast path can't read pay for importing PyPDF2
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path, strict=False)
+    encrypted = "/Encrypt" in reader.trailer
+    result = {"version": reader.pdf_header[len("%PDF-"):], "encrypted": encrypted}
+    if encrypted and reader._encryption is not None and not reader._encryption.is_decrypted():
+        # The empty user password didn't open it; the page tree can't be read
+        result.update(pages=None, media_boxes=[])
+        return result
+    boxes = [[float(v) for v in page.mediabox] for page in reader.pages]
+    result.update(pages=len(boxes), media_boxes=boxes)
+    return result
+
+
+class RawPdf:
+    """Just enough of a PDF parser to walk the page tree.
+
+    Follows classic cross-reference tables and xref streams (with their
+    /Prev chain and hybrid /XRefStm sections) and reads objects packed in
+    object streams. Anything unexpected raises ValueError, so the caller
+    can fall back to a full parse. In an encrypted file, so does any
+    object packed in an object stream, whose data would need decrypting
+    (cross-reference streams never are encrypted).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        header = HEADER_PATTERN.search(data[:HEAD_BYTES])
+        if header is None:
+            raise ValueError("No PDF header")
+        self.version = header.group(1).decode()
+        # idnum -> file offset, or (object stream number, index) for packed objects
+        self.xref: Dict[int, object] = {}
+        self.trailer: Dict = {}
+        self._object_streams: Dict[int, tuple] = {}
+        self._read_xref_chain()
+        self.encrypted = "/Encrypt" in self.trailer
+
+    def describe(self) -> Dict:
+        boxes = self.media_boxes()
+        return {"version": self.version, "encrypted": self.encrypted, "pages": len(boxes), "media_boxes": boxes}
+
+    # Cross-reference sections
+
+    def _read_xref_chain(self):
+        tail = self.data[max(0, len(self.data) - TAIL_BYTES):]
+        starts = STARTXREF_PATTERN.findall(tail)
+        if not starts:
+            raise ValueError("No startxref")
+        offset, seen = int(starts[-1]), set()
+        # Newest section first; older sections never override an entry
+        while offset is not None:
+            if offset in seen:
+                raise ValueError("Cross-reference sections loop")
+            seen.add(offset)
+            trailer = self._read_xref_section(offset)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            if "/XRefStm" in trailer:
+                self._read_xref_stream(int(trailer["/XRefStm"]))
+            offset = int(trailer["/Prev"]) if "/Prev" in trailer else None
+
+    def _read_xref_section(self, offset: int) -> Dict:
+        if offset >= len(self.data):
+            raise ValueError(f"startxref {offset} is past the end of the file")
+        pos = WHITESPACE_PATTERN.match(self.data, offset).end()
+        if self.data[pos:pos + 4] != b"xref":
+            return self._read_xref_stream(offset)
+
+        pos = WHITESPACE_PATTERN.match(self.data, pos + 4).end()
+        while True:
+            section = XREF_SECTION_PATTERN.match(self.data, pos)
+            if section is None:
+                break
+            first, count = int(section.group(1)), int(section.group(2))
+            # Entries are 20 bytes each; writers that cut corners get the full parse
+            end = section.end() + 20 * count
+            entries = XREF_ENTRY_PATTERN.findall(self.data[section.end():end])
+            if len(entries) != count:
+                raise ValueError(f"Bad cross-reference section at {section.start()}")
+            for idnum, (location, _, kind) in enumerate(entries, first):
+                if kind == b"n":
+                    self.xref.setdefault(idnum, int(location))
+            pos = WHITESPACE_PATTERN.match(self.data, end).end()
+        if self.data[pos:pos + 7] != b"trailer":
+            raise ValueError(f"No trailer after the cross-reference table at {offset}")
+        trailer, _ = self._parse(pos + 7)
+        if not isinstance(trailer, dict):
+            raise ValueError("Trailer is not a dictionary")
+        return trailer
+
+    def _read_xref_stream(self, offset: int) -> Dict:
+        stream = self._object_at(offset)
+        if not isinstance(stream, Stream) or stream.get("/Type") != "/XRef":
+            raise ValueError(f"No cross-reference section at {offset}")
+        widths = [int(width) for width in stream["/W"]]
+        index = [int(value) for value in stream.get("/Index", [0, int(stream["/Size"])])]
+        table = self.stream_data(stream)
+        entry_size, pos = sum(widths), 0
+        for first, count in zip(index[::2], index[1::2]):
+            for idnum in range(first, first + count):
+                fields, field_pos = [], pos
+                for width in widths:
+                    fields.append(int.from_bytes(table[field_pos:field_pos + width], "big"))
+                    field_pos += width
+                pos += entry_size
+                kind = fields[0] if widths[0] else 1
+                if kind == 1:
+                    self.xref.setdefault(idnum, fields[1])
+                elif kind == 2:
+                    self.xref.setdefault(idnum, (fields[1], fields[2]))
+        if pos > len(table):
+            raise ValueError("Cross-reference stream is shorter than its /Index")
+        return dict(stream)
+
+    # Objects
+
+    def get(self, value):
+        """``value`` itself, or the object it refers to."""
+        if not isinstance(value, Reference):
+            return value
+        location = self.xref.get(value.idnum)
+        if location is None:
+            # A missing object is null
+            return None
+        if isinstance(location, tuple):
+            return self._packed_object(*location)
+        return self._object_at(location, value.idnum)
+
+    def _object_at(self, offset: int, idnum: int = None):
+        header = OBJECT_PATTERN.match(self.data, offset)
+        if header is None or (idnum is not None and int(header.group(1)) != idnum):
+            raise ValueError(f"Object {idnum} is not at offset {offset}")
+        value, pos = self._parse(header.end())
+        if isinstance(value, dict):
+            stream = STREAM_PATTERN.match(self.data, pos)
+            if stream is not None:
+                value = Stream(value)
+                length = int(self.get(value["/Length"]))
+                value.data = self.data[stream.end():stream.end() + length]
+                end = WHITESPACE_PATTERN.match(self.data, stream.end() + length).end()
+                if self.data[end:end + 9] != b"endstream":
+                    raise ValueError(f"Stream /Length of object {header.group(1).decode()} is wrong")
+        return value
+
+    def _packed_object(self, stream_number: int, index: int):
+        if self.encrypted:
+            raise ValueError(f"Object stream {stream_number} is encrypted")
+        if stream_number not in self._object_streams:
+            stream = self.get(Reference(stream_number, 0))
+            if not isinstance(stream, Stream) or stream.get("/Type") != "/ObjStm":
+                raise ValueError(f"Object {stream_number} is not an object stream")
+            content = self.stream_data(stream)
+            numbers = [int(number) for number in
+                       content[:int(stream["/First"])].split()]
+            self._object_streams[stream_number] = (content, int(stream["/First"]), numbers[1::2])
+        content, first, offsets = self._object_streams[stream_number]
+        value, _ = _Parser(content).parse(first + offsets[index])
+        return value
+
+    def stream_data(self, stream: Stream) -> bytes:
+        """Decoded data of a stream filtered with nothing but FlateDecode."""
+        filters = stream.get("/Filter", [])
+        params = self.get(stream.get("/DecodeParms"))
+        if not isinstance(filters, list):
+            filters, params = [filters], [params]
+        data = bytes(stream.data)
+        for name, param in zip(filters, params or [None] * len(filters)):
+            if name != "/FlateDecode":
+                raise ValueError(f"Unsupported filter {name}")
+            data = zlib.decompress(data)
+            param = self.get(param) or {}
+            predictor = int(param.get("/Predictor", 1))
+            if predictor >= 10:
+                data = _png_unpredict(data, int(param.get("/Columns", 1)),
+                                      int(param.get("/Colors", 1)) * int(param.get("/BitsPerComponent", 8)) // 8)
+            elif predictor != 1:
+                raise ValueError(f"Unsupported predictor {predictor}")
+        return data
+
+    def _parse(self, pos: int):
+        return _Parser(self.data).parse(pos)
+
+    # Page tree
+
+    def media_boxes(self) -> List[List[float]]:
+        """Media box of every page in order, inherited boxes included."""
+        pages_ref = self.get(self.trailer["/Root"])["/Pages"]
+        expected = int(self.get(self.get(pages_ref)["/Count"]))
+        boxes: List[List[float]] = []
+        seen = {pages_ref}
+        stack = [(pages_ref, None)]
+        while stack:
+            node_ref, inherited = stack.pop()
+            kids, box = self._page_node(node_ref)
+            box = box or inherited
+            if kids is None:
+                if box is None:
+                    raise ValueError("Page without a media box")
+                boxes.append(box)
+                continue
+            for kid in reversed(kids):
+                if kid in seen:
+                    raise ValueError("Page tree loops")
+                seen.add(kid)
+                stack.append((kid, box))
+        if len(boxes) != expected:
+            raise ValueError(f"Page tree holds {len(boxes)} pages, /Count says {expected}")
+        return boxes
+
+    def _page_node(self, reference):
+        """(kids, media box) of a page tree node; kids is None for a page.
+
+        Parsing a whole page dictionary (resources, annotations...) to read
+        two keys is most of the work, so plain objects whose keys are
+        unambiguous are scanned with regular expressions instead. If a
+        scan is ever fooled, the page count won't match /Count.
+        """
+        location = self.xref.get(reference.idnum) if isinstance(reference, Reference) else None
+        if isinstance(location, int):
+            header = OBJECT_PATTERN.match(self.data, location)
+            end = self.data.find(b"endobj", location)
+            if header is not None and int(header.group(1)) == reference.idnum and end >= 0:
+                raw = self.data[header.end():end]
+                types = PAGE_TYPE_PATTERN.findall(raw)
+                kids = KIDS_PATTERN.findall(raw)
+                found = MEDIABOX_PATTERN.findall(raw)
+                if len(types) == 1 and len(kids) == (types[0] == b"Pages") and len(found) <= 1 \
+                        and not (found and found[0].endswith(b"R")) and b"stream" not in raw:
+                    kids = [Reference(int(idnum), int(generation))
+                            for idnum, generation in REFERENCE_PATTERN.findall(kids[0])] if kids else None
+                    box = [float(value) for value in found[0][1:-1].split()] if found else None
+                    return kids, box
+
+        node = self.get(reference)
+        box = self.get(node.get("/MediaBox"))
+        box = [float(self.get(value)) for value in box] if box is not None else None
+        if node.get("/Type") == "/Pages" or ("/Kids" in node and node.get("/Type") != "/Page"):
+            return list(self.get(node["/Kids"])), box
+        return None, box
+
+
+class _Parser:
+    """Recursive-descent reader of one PDF object."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def parse(self, pos: int):
+        data = self.data
+        pos = WHITESPACE_PATTERN.match(data, pos).end()
+        char = data[pos:pos + 1]
+        if char == b"/":
+            name = NAME_PATTERN.match(data, pos)
+            return name.group().decode("latin-1"), name.end()
+        if char == b"<":
+            if data[pos + 1:pos + 2] == b"<":
+                return self._dictionary(pos + 2)
+            hex_string = HEX_STRING_PATTERN.match(data, pos)
+            if hex_string is None:
+                raise ValueError(f"Bad hex string at {pos}")
+            return hex_string.group(1), hex_string.end()
+        if char == b"[":
+            items, pos = [], pos + 1
+            while True:
+                pos = WHITESPACE_PATTERN.match(data, pos).end()
+                if data[pos:pos + 1] == b"]":
+                    return items, pos + 1
+                item, pos = self.parse(pos)
+                items.append(item)
+        if char == b"(":
+            return self._literal_string(pos)
+        reference = REFERENCE_PATTERN.match(data, pos)
+        if reference is not None:
+            return Reference(int(reference.group(1)), int(reference.group(2))), reference.end()
+        number = NUMBER_PATTERN.match(data, pos)
+        if number is not None:
+            text = number.group()
+            return (float(text) if b"." in text else int(text)), number.end()
+        keyword = KEYWORD_PATTERN.match(data, pos)
+        if keyword is not None and keyword.group() in (b"true", b"false", b"null"):
+            return {b"true": True, b"false": False, b"null": None}[keyword.group()], keyword.end()
+        raise ValueError(f"Unexpected {bytes(data[pos:pos + 10])!r} at {pos}")
+
+    def _dictionary(self, pos: int):
+        data, entries = self.data, {}
+        while True:
+            pos = WHITESPACE_PATTERN.match(data, pos).end()
+            if data[pos:pos + 2] == b">>":
+                return entries, pos + 2
+            key, pos = self.parse(pos)
+            if not isinstance(key, str):
+                raise ValueError(f"Dictionary key is not a name at {pos}")
+            entries[key], pos = self.parse(pos)
+
+    def _literal_string(self, pos: int):
+        data, depth, start = self.data, 0, pos + 1
+        while pos < len(data):
+            char = data[pos]
+            if char == 0x5C:  # backslash: skip the escaped character
+                pos += 2
+                continue
+            if char == 0x28:
+                depth += 1
+            elif char == 0x29:
+                depth -= 1
+                if depth == 0:
+                    return bytes(data[start:pos]), pos + 1
+            pos += 1
+        raise ValueError("Unterminated string")
+
+
+def _png_unpredict(data: bytes, columns: int, bytes_per_pixel: int) -> bytes:
+    """Undo PNG row filters (None, Sub, Up, Average, Paeth)."""
+    row_size = columns * bytes_per_pixel
+    rows, previous = [], bytearray(row_size)
+    for start in range(0, len(data), row_size + 1):
+        kind, row = data[start], bytearray(data[start + 1:start + 1 + row_size])
+        for i in range(len(row)):
+            left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            up = previous[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                up_left = previous[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                estimate = left + up - up_left
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - up_left))
+                row[i] = (row[i] + (left, up, up_left)[distances.index(min(distances))]) & 0xFF
+            elif kind != 0:
+                raise ValueError(f"Unknown PNG filter {kind}")
+        rows.append(bytes(row))
+        previous = row
+    return b"".join(rows)
+
+
+def describe_sizes(media_boxes: List[List[float]]) -> str:
+    """Distinct page sizes with their counts, e.g. '612x792 (10), 595x842 (2)'."""
+    counts: Dict[str, int] = {}
+    for x0, y0, x1, y1 in media_boxes:
+        size = f"{x1 - x0:g}x{y1 - y0:g}"
+        counts[size] = counts.get(size, 0) + 1
+    return ", ".join(f"{size} ({count})" for size, count in counts.items())
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Incremental PDF output for very large books.
+Pages are written to the output file one batch (signature) at a time, so
+only the batch being assembled has to be held in memory. Optionally the
+output is compacted: duplicate objects dropped, streams flate-encoded and
+small objects packed into object streams with a compressed xref stream.
+"""
+
+import hashlib
+import io
+from array import array
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+import PyPDF2
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject,
+                            IndirectObject, NameObject, NumberObject, PdfObject, StreamObject)
+
+
+# Objects packed into one object stream
+OBJECTS_PER_STREAM = 100
+
+# Offset placeholder for an object waiting to go into an object stream
+IN_OBJECT_STREAM = -2
+
+# Size of one entry in a classic cross-reference table
+XREF_ENTRY_BYTES = 20
+
+# PdfWriter has no public way to number objects ahead or to empty itself;
+# these private attributes (PyPDF2 3.0) are only used through the helpers
+# at the end of this module
+PDF_WRITER_INTERNALS = ("_objects", "_id_translated", "_sweep_indirect_references", "_add_object", "_root")
+
+
+class StreamingPdfWriter:
+    """Write a PDF to ``stream`` as a sequence of independent page batches.
+
+    Each batch is an ordinary ``PdfWriter`` obtained from ``new_batch``; once
+    its pages are added, ``write_batch`` serializes its objects straight to
+    the output and the batch can be discarded. Objects 1-3 are reserved for
+    the shared page tree, info and catalog, which ``close`` writes last.
+
+    With ``deduplicate`` set, any non-page object whose serialized form
+    (after its own references are deduplicated) matches one already
+    written is dropped and references to it point at the earlier copy, so
+    fonts and images shared between batches are written once.
+
+    With ``compress`` set, unfiltered streams are flate-encoded, all other
+    objects of a batch are packed into object streams and the
+    cross-reference table becomes a compressed xref stream (PDF 1.5).
+    ``bytes_saved`` compares the output with a plain write of the same
+    objects.
+    """
+
+    PAGES_ID = 1
+    INFO_ID = 2
+    ROOT_ID = 3
+
+    def __init__(self, stream: BinaryIO, pdf_header: Union[str, bytes] = b"%PDF-1.4",
+                 deduplicate: bool = False, compress: bool = False):
+        if isinstance(pdf_header, str):
+            pdf_header = pdf_header.encode()
+        if compress and pdf_header < b"%PDF-1.5":
+            # Object and xref streams need PDF 1.5
+            pdf_header = b"%PDF-1.5"
+        self.stream = stream
+        self.deduplicate = deduplicate
+        self.compress = compress
+        self.pages_written = 0
+        self.duplicates_dropped = 0
+        self.bytes_written = 0
+        # Size the same objects would take written plainly, one by one
+        self.plain_bytes = 0
+        self._digests: Dict[bytes, int] = {}
+        self._offsets = array('q', [0, 0, 0])
+        self._kids = array('q')
+        self._info = None
+        self._pending: List[Tuple[int, bytes]] = []
+        # Objects handed out by shared_object, with their ids, by key
+        self._shared: Dict[str, Tuple[int, PdfObject]] = {}
+        self._object_streams = 0
+        check_pdf_writer_internals()
+        self._start = stream.tell()
+
+        stream.write(pdf_header + b"\n")
+        stream.write(b"%\xE2\xE3\xCF\xD3\n")
+        self.plain_bytes += stream.tell() - self._start
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.plain_bytes - self.bytes_written
+
+    @property
+    def _next_id(self) -> int:
+        return len(self._offsets) + 1
+
+    def new_batch(self) -> PdfWriter:
+        """A writer whose new objects are numbered after everything written so far."""
+        batch = PdfWriter()
+        # PdfWriter numbers objects by list position; pad past the ids already
+        # used so its pages and their resources get their final numbers.
+        objects = _batch_objects(batch)
+        objects.extend([None] * (self._next_id - 1 - len(objects)))
+        if self._info is None:
+            self._info = objects[self.INFO_ID - 1]
+        # Lets code filling the batch reach objects shared across batches
+        batch.streaming_output = self
+        return batch
+
+    def shared_object(self, batch: PdfWriter, key: str, make: Callable[[], PdfObject]) -> IndirectObject:
+        """Reference from ``batch`` to an object every batch of the output can share.
+
+        The first batch to ask for ``key`` gets ``make()`` added to it; later
+        batches refer to the copy already written rather than each adding
+        their own. The object still resolves in those batches (it sits in
+        their padding, below the ids write_batch writes). If deduplication
+        dropped the first copy for an identical one written earlier, the
+        object is added again.
+        """
+        idnum, obj = self._shared.get(key, (None, None))
+        if idnum is not None and idnum <= len(self._offsets) and self._offsets[idnum - 1] == -1:
+            idnum = None
+        if idnum is None:
+            obj = make()
+            idnum = batch._add_object(obj).idnum
+            self._shared[key] = (idnum, obj)
+        else:
+            _batch_objects(batch)[idnum - 1] = obj
+        return IndirectObject(idnum, 0, batch)
+
+    def write_batch(self, batch: PdfWriter):
+        """Serialize the pages of ``batch`` and everything they reference.
+
+        The batch is emptied afterwards: its objects reference the writer
+        cyclically, and waiting for the garbage collector would keep several
+        batches (and their padded object lists) alive at once.
+        """
+        first_id = self._next_id
+        objects = _resolve_batch(batch)
+        canonical: Dict[int, Optional[int]] = {}
+
+        for idnum in range(first_id, len(objects) + 1):
+            obj = objects[idnum - 1]
+            if not self.deduplicate or obj is None:
+                self._write_object(idnum, obj)
+            elif self._canonical_id(batch, idnum, first_id, canonical) == idnum:
+                self._write_object(idnum, obj)
+            else:
+                self._offsets.append(-1)
+                self.duplicates_dropped += 1
+                self.plain_bytes += _indirect_size(idnum, _serialize(obj))
+
+        self._flush_object_streams()
+
+        for kid in objects[self.PAGES_ID - 1]["/Kids"]:
+            self._kids.append(kid.idnum)
+        self.pages_written += len(batch.pages)
+
+        _empty_batch(batch)
+
+    def _canonical_id(self, batch: PdfWriter, idnum: int, first_id: int,
+                      canonical: Dict[int, Optional[int]]) -> int:
+        """Id under which object ``idnum`` of the batch ends up in the output.
+
+        Children are resolved first (depth first) so that two copies of a
+        font that point at two copies of the same font file serialize
+        identically. Objects on a reference cycle and pages keep their own id.
+        """
+        if idnum < first_id:
+            return idnum
+        if idnum in canonical:
+            # None means "still being resolved": a cycle, leave it alone
+            return canonical[idnum] or idnum
+
+        canonical[idnum] = None
+        obj = _batch_objects(batch)[idnum - 1]
+        stable = self._remap_references(obj, batch, first_id, canonical)
+
+        if not stable or (isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Page"):
+            canonical[idnum] = idnum
+            return idnum
+
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer, None)
+        digest = hashlib.sha1(buffer.getvalue()).digest()
+        canonical[idnum] = self._digests.setdefault(digest, idnum)
+        return canonical[idnum]
+
+    def _remap_references(self, obj, batch: PdfWriter, first_id: int,
+                          canonical: Dict[int, Optional[int]]) -> bool:
+        """Point the references inside ``obj`` at their canonical ids.
+
+        Returns False when a reference leads back to an object that is still
+        being resolved.
+        """
+        if isinstance(obj, DictionaryObject):
+            items = list(obj.items())
+        elif isinstance(obj, ArrayObject):
+            items = list(enumerate(obj))
+        else:
+            return True
+
+        stable = True
+        for key, value in items:
+            if isinstance(value, IndirectObject):
+                if value.idnum >= first_id and canonical.get(value.idnum, 0) is None:
+                    stable = False
+                    continue
+                target = self._canonical_id(batch, value.idnum, first_id, canonical)
+                if target != value.idnum:
+                    obj[key] = IndirectObject(target, 0, batch)
+            elif not self._remap_references(value, batch, first_id, canonical):
+                stable = False
+        return stable
+
+    def _write_object(self, idnum: int, obj):
+        if obj is None:
+            # Never referenced; keep the xref dense with a free entry
+            self._offsets.append(-1)
+            return
+
+        if self.compress:
+            data = _serialize(obj)
+            self.plain_bytes += _indirect_size(idnum, data)
+            if not isinstance(obj, StreamObject):
+                # Packed into an object stream when the batch is done
+                self._offsets.append(IN_OBJECT_STREAM)
+                self._pending.append((idnum, data))
+                return
+            if "/Filter" not in obj:
+                obj = _flate_encode(obj)
+            self._offsets.append(self.stream.tell())
+            self._write_indirect(idnum, obj)
+            return
+
+        self._offsets.append(self.stream.tell())
+        self.plain_bytes += self._write_indirect(idnum, obj)
+
+    def _write_indirect(self, idnum: int, obj) -> int:
+        """Write ``obj`` as indirect object ``idnum``; returns the bytes written."""
+        start = self.stream.tell()
+        self.stream.write(f"{idnum} 0 obj\n".encode())
+        obj.write_to_stream(self.stream, None)
+        self.stream.write(b"\nendobj\n")
+        return self.stream.tell() - start
+
+    def _flush_object_streams(self):
+        """Write the objects of the last batch as object streams.
+
+        The streams get ids after the batch's own objects, so they never
+        collide with ids a batch writer already handed out.
+        """
+        for first in range(0, len(self._pending), OBJECTS_PER_STREAM):
+            members = self._pending[first:first + OBJECTS_PER_STREAM]
+            stream_id = self._next_id
+
+            offsets, body, position = [], [], 0
+            for index, (idnum, data) in enumerate(members):
+                offsets.append(f"{idnum} {position}")
+                body.append(data)
+                position += len(data) + 1
+                self._offsets[idnum - 1] = _compressed_entry(stream_id, index)
+            index_table = " ".join(offsets).encode() + b"\n"
+
+            object_stream = DecodedStreamObject()
+            object_stream.set_data(index_table + b"\n".join(body) + b"\n")
+            object_stream = _flate_encode(object_stream)
+            object_stream.update({
+                NameObject("/Type"): NameObject("/ObjStm"),
+                NameObject("/N"): NumberObject(len(members)),
+                NameObject("/First"): NumberObject(len(index_table)),
+            })
+            self._offsets.append(self.stream.tell())
+            self._write_indirect(stream_id, object_stream)
+            self._object_streams += 1
+        self._pending = []
+
+    def close(self):
+        """Write the page tree, catalog, cross-reference table and trailer."""
+        pages = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Count"): NumberObject(self.pages_written),
+            NameObject("/Kids"): ArrayObject(IndirectObject(idnum, 0, None) for idnum in self._kids),
+        })
+        root = DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(self.PAGES_ID, 0, None),
+        })
+        info = self._info if self._info is not None else DictionaryObject()
+
+        for idnum, obj in ((self.PAGES_ID, pages), (self.INFO_ID, info), (self.ROOT_ID, root)):
+            self._offsets[idnum - 1] = self.stream.tell()
+            self.plain_bytes += self._write_indirect(idnum, obj)
+
+        xref_location = self.stream.tell()
+        if self.compress:
+            # A plain table would not list the object streams
+            plain_entries = len(self._offsets) + 1 - self._object_streams
+            self.plain_bytes += (len(f"xref\n0 {plain_entries}\n") + XREF_ENTRY_BYTES * plain_entries
+                                 + len(f"trailer\n<<\n/Size {plain_entries}\n/Root {self.ROOT_ID} 0 R\n"
+                                       f"/Info {self.INFO_ID} 0 R\n>>\nstartxref\n{xref_location}\n%%EOF\n"))
+            self._write_xref_stream()
+        else:
+            self._write_xref_table()
+            self.plain_bytes += self.stream.tell() - xref_location
+        self.bytes_written = self.stream.tell() - self._start
+
+    def _write_xref_table(self):
+        xref_location = self.stream.tell()
+        self.stream.write(f"xref\n0 {len(self._offsets) + 1}\n".encode())
+        self.stream.write(b"0000000000 65535 f \n")
+        for offset in self._offsets:
+            if offset < 0:
+                self.stream.write(b"0000000000 65535 f \n")
+            else:
+                self.stream.write(f"{offset:0>10} 00000 n \n".encode())
+
+        trailer = DictionaryObject({
+            NameObject("/Size"): NumberObject(len(self._offsets) + 1),
+            NameObject("/Root"): IndirectObject(self.ROOT_ID, 0, None),
+            NameObject("/Info"): IndirectObject(self.INFO_ID, 0, None),
+        })
+        self.stream.write(b"trailer\n")
+        trailer.write_to_stream(self.stream, None)
+        self.stream.write(f"\nstartxref\n{xref_location}\n%%EOF\n".encode())
+
+    def _write_xref_stream(self):
+        """Cross-reference stream: binary (type, field 2, field 3) rows, flate-encoded."""
+        xref_id = self._next_id
+        xref_location = self.stream.tell()
+        self._offsets.append(xref_location)
+
+        rows = [(0, 0, 65535)]
+        for offset in self._offsets:
+            if offset == -1:
+                rows.append((0, 0, 0))
+            elif offset <= IN_OBJECT_STREAM:
+                rows.append((2, *_object_stream_location(offset)))
+            else:
+                rows.append((1, offset, 0))
+        width = max(1, (max(row[1] for row in rows).bit_length() + 7) // 8)
+        table = b"".join(kind.to_bytes(1, "big") + field.to_bytes(width, "big") + extra.to_bytes(2, "big")
+                         for kind, field, extra in rows)
+
+        xref = DecodedStreamObject()
+        xref.set_data(table)
+        xref = _flate_encode(xref)
+        xref.update({
+            NameObject("/Type"): NameObject("/XRef"),
+            NameObject("/Size"): NumberObject(len(rows)),
+            NameObject("/W"): ArrayObject(NumberObject(w) for w in (1, width, 2)),
+            NameObject("/Root"): IndirectObject(self.ROOT_ID, 0, None),
+            NameObject("/Info"): IndirectObject(self.INFO_ID, 0, None),
+        })
+        self._write_indirect(xref_id, xref)
+        self.stream.write(f"startxref\n{xref_location}\n%%EOF\n".encode())
+
+
+def _serialize(obj) -> bytes:
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer, None)
+    return buffer.getvalue()
+
+
+def _indirect_size(idnum: int, data: bytes) -> int:
+    return len(f"{idnum} 0 obj\n") + len(data) + len(b"\nendobj\n")
+
+
+def _flate_encode(stream: StreamObject) -> StreamObject:
+    """Flate-encode a stream, keeping its dictionary (PyPDF2's flate_encode drops it)."""
+    encoded = stream.flate_encode()
+    for key, value in stream.items():
+        if key not in ("/Filter", "/Length"):
+            encoded[key] = value
+    return encoded
+
+
+def _compressed_entry(stream_id: int, index: int) -> int:
+    """Offset-table value for object ``index`` of object stream ``stream_id``."""
+    return IN_OBJECT_STREAM - (stream_id * OBJECTS_PER_STREAM + index)
+
+
+def _object_stream_location(entry: int) -> Tuple[int, int]:
+    """(stream id, index) back from an offset-table value."""
+    return divmod(IN_OBJECT_STREAM - entry, OBJECTS_PER_STREAM)
+
+
+def check_pdf_writer_internals():
+    """Raise RuntimeError unless PdfWriter still works the way the batches rely on.
+
+    Besides the private attributes, a new writer must number its page tree,
+    info and catalog 1, 2 and 3, the ids the output reserves for them.
+    """
+    writer = PdfWriter()
+    missing = [name for name in PDF_WRITER_INTERNALS if not hasattr(writer, name)]
+    if missing:
+        raise RuntimeError(f"PyPDF2 {PyPDF2.__version__} has no PdfWriter.{', PdfWriter.'.join(missing)}; "
+                           f"streaming output was written against PyPDF2 3.0")
+    objects = writer._objects
+    layout = (StreamingPdfWriter.PAGES_ID, StreamingPdfWriter.INFO_ID, StreamingPdfWriter.ROOT_ID)
+    if (len(objects) != 3 or writer._root.idnum != StreamingPdfWriter.ROOT_ID
+            or objects[StreamingPdfWriter.PAGES_ID - 1].get("/Type") != "/Pages"):
+        raise RuntimeError(f"PyPDF2 {PyPDF2.__version__} no longer numbers a new PdfWriter's page tree, "
+                           f"info and catalog {layout}; streaming output was written against PyPDF2 3.0")
+
+
+def _batch_objects(batch: PdfWriter) -> List[Optional[PdfObject]]:
+    """The batch's objects, object ``n`` at position ``n - 1``."""
+    return batch._objects
+
+
+def _resolve_batch(batch: PdfWriter) -> List[Optional[PdfObject]]:
+    """Copy everything the batch's pages reference into it; returns its objects."""
+    batch._sweep_indirect_references(batch._root)
+    return batch._objects
+
+
+def _empty_batch(batch: PdfWriter):
+    batch._objects.clear()
+    batch._id_translated.clear()
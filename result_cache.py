@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of finished booklets.
+Entries are keyed by a hash of the input PDF's bytes plus every setting
+that changes the output, so resubmitting the same job is a file copy.
+Writes are atomic (temporary file + rename) and the least recently used
+entries are evicted once the cache grows past its size limit.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional
+
+# Bump when the pipeline output changes, so old entries stop matching
+CACHE_FORMAT = 2
+
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+class ResultCache:
+    """Booklets stored as ``<key>.pdf`` with their page counts in ``<key>.json``.
+
+    The PDF is renamed into place last, so its presence marks a complete
+    entry; concurrent writers of the same key each rename a finished file
+    over the other and readers see one or the other, never a partial file.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, input_file: str, settings: Dict) -> str:
+        """Hash of the input bytes and the imposition settings."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({"format": CACHE_FORMAT, **settings}, sort_keys=True).encode())
+        with open(input_file, "rb") as input_fp:
+            for chunk in iter(lambda: input_fp.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get(self, key: str, output_file: str) -> Optional[Dict]:
+        """Copy a cached booklet to ``output_file``; returns its page counts, or None on a miss."""
+        try:
+            with open(self._path(key, "json")) as meta_fp:
+                result = json.load(meta_fp)
+            shutil.copyfile(self._path(key, "pdf"), output_file)
+            # Mark the entry as recently used for eviction
+            os.utime(self._path(key, "pdf"))
+        except (OSError, ValueError):
+            # Missing, half-evicted or unreadable: treat as a miss
+            return None
+        return result
+
+    def put(self, key: str, output_file: str, result: Dict):
+        """Store a finished booklet, then evict old entries past the size limit."""
+        self._write_atomic(self._path(key, "json"), json.dumps(result).encode())
+        with open(output_file, "rb") as output_fp:
+            self._write_atomic(self._path(key, "pdf"), output_fp)
+        self.evict()
+
+    def _write_atomic(self, path: str, data):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as temp_fp:
+                if isinstance(data, bytes):
+                    temp_fp.write(data)
+                else:
+                    shutil.copyfileobj(data, temp_fp)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def entries(self):
+        """(mtime, size, key) of every complete entry, least recently used first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".pdf"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.name[:-len(".pdf")]))
+        return sorted(entries)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            # PDF first: an entry without its PDF is already a miss
+            for extension in ("pdf", "json"):
+                try:
+                    os.unlink(self._path(key, extension))
+                except FileNotFoundError:
+                    pass
+            total -= size
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+N-up sheet imposition.
+Places booklet pages (already in signature order) onto press sheets: each
+page becomes a form XObject once and every slot on a sheet just draws it
+with a transformation matrix, so the work is linear in the page count.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from PyPDF2 import PdfWriter, PageObject
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject,
+                            FloatObject, IndirectObject, NameObject)
+
+from imposition_plan import CUTTING_LINE_MODES, SHEET_GRIDS, sheet_grid
+
+
+# Bezier control distance for drawing a circle with four curves
+CIRCLE_KAPPA = 0.5523
+
+
+class NUpImposer:
+    """Collects pages in output order and writes each press sheet as two sides.
+
+    Pages come from the signature pattern, which lists a press sheet's
+    front pages and then its back pages, left to right and top to bottom.
+    ``None`` leaves a slot empty. A signature's last press sheet may be
+    part used: finish() splits its pages into front and back and leaves
+    the remaining slots of each side empty. With ``head_to_head`` every
+    second row is turned 180 degrees, so facing rows meet at their heads.
+    ``cell_size`` fixes the cell size up front (otherwise the first page
+    sets it). Pages are placed as a viewer shows them: cut to their
+    CropBox and turned by their /Rotate.
+    """
+
+    def __init__(self, writer: PdfWriter, pages_per_sheet: int, head_to_head: bool = False,
+                 cell_size: Optional[Tuple[float, float]] = None):
+        self.writer = writer
+        self.rows, self.columns = sheet_grid(pages_per_sheet)
+        self.head_to_head = head_to_head
+        self.cell_size = cell_size
+        self.sides_written = 0
+        self._sheet: List[Optional[PageObject]] = []
+
+    @property
+    def slots_per_side(self) -> int:
+        return self.rows * self.columns
+
+    def add_page(self, page: Optional[PageObject]):
+        """Queue the next page (or None for an empty slot)."""
+        if page is not None and self.cell_size is None:
+            # Like the browser version, the first page sets the cell size
+            self.cell_size = _upright(page)[1:]
+        self._sheet.append(page)
+        if len(self._sheet) == 2 * self.slots_per_side:
+            self._write_sheet()
+
+    def add_blank_page(self, width: Optional[float] = None, height: Optional[float] = None):
+        """Leave the next slot empty (same call as ``PdfWriter.add_blank_page``)."""
+        self.add_page(None)
+
+    def finish(self):
+        """Write a trailing, part-used press sheet: half its pages on each side."""
+        if self._sheet:
+            self._write_sheet()
+
+    def _write_sheet(self):
+        half = len(self._sheet) // 2
+        empty = [None] * (self.slots_per_side - half)
+        self._write_side(self._sheet[:half] + empty)
+        self._write_side(self._sheet[half:] + empty)
+        self._sheet = []
+
+    def form_xobject(self, page: PageObject) -> IndirectObject:
+        """Turn a page into a form XObject in the writer."""
+        contents = page.get_contents()
+        if isinstance(contents, ArrayObject):
+            # Several content streams draw as one, separated by whitespace
+            data = b"\n".join(part.get_object().get_data() for part in contents)
+        else:
+            data = contents.get_data() if contents is not None else b""
+        form = DecodedStreamObject()
+        form.set_data(data)
+        form = form.flate_encode()
+        form.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject(FloatObject(v) for v in page.cropbox),
+        })
+        if "/Resources" in page:
+            form[NameObject("/Resources")] = page["/Resources"].clone(self.writer)
+        return self.writer._add_object(form)
+
+    def slot_matrix(self, page: PageObject, row: int, column: int) -> Tuple[float, ...]:
+        """Matrix that fits ``page`` into a grid cell, centred, rotated if needed."""
+        cell_width, cell_height = self.cell_size
+        upright, width, height = _upright(page)
+        scale = min(cell_width / width, cell_height / height, 1.0)
+        offset_x = (cell_width - width * scale) / 2
+        offset_y = (cell_height - height * scale) / 2
+
+        rotated = self.head_to_head and row % 2 == 1
+        if rotated:
+            # The whole row turns around, so its left page ends up on the right
+            column = self.columns - 1 - column
+        cell_x = column * cell_width + offset_x
+        cell_y = (self.rows - 1 - row) * cell_height + offset_y
+
+        if rotated:
+            return _multiply(upright, (-scale, 0, 0, -scale, cell_x + width * scale, cell_y + height * scale))
+        return _multiply(upright, (scale, 0, 0, scale, cell_x, cell_y))
+
+    def _write_side(self, side: List[Optional[PageObject]]):
+        cell_width, cell_height = self.cell_size or (612.0, 792.0)
+        sheet = PageObject.create_blank_page(None, cell_width * self.columns, cell_height * self.rows)
+        xobjects = DictionaryObject()
+        operations = []
+
+        for slot, page in enumerate(side):
+            if page is None:
+                continue
+            name = f"/P{slot}"
+            xobjects[NameObject(name)] = self.form_xobject(page)
+            matrix = " ".join(f"{v:.4f}".rstrip("0").rstrip(".") for v in
+                              self.slot_matrix(page, *divmod(slot, self.columns)))
+            operations.append(f"q {matrix} cm {name} Do Q")
+
+        content = DecodedStreamObject()
+        content.set_data("\n".join(operations).encode())
+        sheet[NameObject("/Contents")] = self.writer._add_object(content)
+        sheet[NameObject("/Resources")] = DictionaryObject({NameObject("/XObject"): xobjects})
+
+        self.writer.add_page(sheet)
+        self.sides_written += 1
+
+
+class MarkStamps:
+    """Sewing marks and cutting lines as shared stamps.
+
+    The marks for one sheet geometry are drawn once into a form XObject;
+    every page with that geometry only gets a reference to it plus two tiny
+    shared content streams around its own content, so a 1,000-sheet job
+    adds a few objects instead of one copy of the marks per page.
+    """
+
+    def __init__(self, writer: PdfWriter, sewing_holes: int = 0, cutting_lines: str = "none"):
+        if cutting_lines not in CUTTING_LINE_MODES:
+            raise ValueError(f"Cutting lines must be one of {CUTTING_LINE_MODES}, got {cutting_lines!r}")
+        self.writer = writer
+        self.sewing_holes = sewing_holes
+        self.cutting_lines = cutting_lines
+        self._stamps: Dict[tuple, Tuple[str, IndirectObject, IndirectObject]] = {}
+        self._save_state: Optional[IndirectObject] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sewing_holes > 0 or self.cutting_lines != "none"
+
+    def stamp_page(self, page: PageObject, rows: int = 0, fold_side: bool = False):
+        """Add the marks to a page already in the writer.
+
+        ``rows`` is the number of folded sheets stacked on a press sheet, or 0
+        for a single booklet page; single pages only get sewing marks on the
+        fold side.
+        """
+        width, height = float(page.mediabox.width), float(page.mediabox.height)
+        key = (round(width, 2), round(height, 2), rows, fold_side)
+        if key not in self._stamps:
+            self._stamps[key] = self._make_stamp(width, height, rows, fold_side)
+        name, call, stamp = self._stamps[key]
+
+        resources = page.get("/Resources")
+        if resources is None:
+            resources = DictionaryObject()
+            page[NameObject("/Resources")] = resources
+        resources = resources.get_object()
+        xobjects = resources.get("/XObject")
+        if xobjects is None:
+            xobjects = DictionaryObject()
+            resources[NameObject("/XObject")] = xobjects
+        xobjects.get_object()[NameObject(name)] = stamp
+
+        if self._save_state is None:
+            self._save_state = self._add_stream(b"q")
+        contents = page.raw_get("/Contents") if "/Contents" in page else None
+        if contents is None:
+            contents = ArrayObject()
+        elif not isinstance(contents.get_object(), ArrayObject):
+            contents = ArrayObject([contents if isinstance(contents, IndirectObject)
+                                    else self.writer._add_object(contents)])
+        else:
+            contents = ArrayObject(contents.get_object())
+        # Isolate the page's own graphics state from the marks
+        page[NameObject("/Contents")] = ArrayObject([self._save_state] + contents + [call])
+
+    def _add_stream(self, data: bytes) -> IndirectObject:
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        return self.writer._add_object(stream)
+
+    def _make_stamp(self, width: float, height: float, rows: int, fold_side: bool):
+        operations = []
+        if self.sewing_holes > 0:
+            operations += self._sewing_operations(width, height, rows, fold_side)
+        if self.cutting_lines != "none":
+            operations += self._cutting_operations(width, height, rows)
+
+        stamp = DecodedStreamObject()
+        stamp.set_data("\n".join(operations).encode())
+        stamp.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject(FloatObject(v) for v in (0, 0, width, height)),
+            NameObject("/Resources"): DictionaryObject({
+                NameObject("/Font"): DictionaryObject({
+                    NameObject("/F1"): DictionaryObject({
+                        NameObject("/Type"): NameObject("/Font"),
+                        NameObject("/Subtype"): NameObject("/Type1"),
+                        NameObject("/BaseFont"): NameObject("/Helvetica"),
+                    })
+                })
+            }),
+        })
+        name = f"/BookletMarks{len(self._stamps)}"
+        call = self._add_stream(f"Q q {name} Do Q".encode())
+        return name, call, self.writer._add_object(stamp)
+
+    def _sewing_operations(self, width: float, height: float, rows: int, fold_side: bool) -> List[str]:
+        holes = self.sewing_holes
+        if rows:
+            # Press sheet: holes along the central fold, repeated in every row
+            # at the same distance from the row edges so they line up after cutting
+            row_height = height / rows
+            margin = row_height * 0.1
+            spacing = (row_height - 2 * margin) / (holes - 1) if holes > 1 else 0
+            x = width / 2
+            centres = [(x, row * row_height + margin + hole * spacing)
+                       for row in range(rows) for hole in range(holes)]
+            operations = ["0.6 G", "1.5 w"] + [_circle(cx, cy, 3) for cx, cy in centres]
+            operations += ["0.8 w"] + [_line(cx - 8, cy, cx + 8, cy) for cx, cy in centres]
+            operations += ["1 w"] + [_line(cx, cy - 6, cx, cy + 6) for cx, cy in centres]
+            return operations
+
+        if not fold_side:
+            return []
+        # Single booklet page: holes along the left (fold) edge
+        margin_x, margin_y = 15, 50
+        spacing = (height - 2 * margin_y) / (holes - 1) if holes > 1 else 0
+        centres = [(margin_x, margin_y + hole * spacing) for hole in range(holes)]
+        operations = ["0.7 G", "1 w"] + [_circle(cx, cy, 3) for cx, cy in centres]
+        operations += ["0.5 w"] + [_line(cx - 8, cy, cx + 8, cy) for cx, cy in centres]
+        return operations
+
+    def _cutting_operations(self, width: float, height: float, rows: int) -> List[str]:
+        operations = ["0.7 G", "0.8 w", "[8 4] 0 d"]
+        if rows > 1:
+            # Cut between the stacked sheets
+            operations += [_line(20, height * row / rows, width - 20, height * row / rows)
+                           for row in range(1, rows)]
+            if self.cutting_lines == "both":
+                operations.append(_line(width / 2, 20, width / 2, height - 20))
+            return operations
+
+        operations.append(_line(20, height / 2, width - 20, height / 2))
+        operations += ["[] 0 d", "0.7 g", f"BT /F1 6 Tf 5 {pdf_number(height / 2 - 3)} Td (-- CUT --) Tj ET"]
+        return operations
+
+
+def _upright(page: PageObject) -> Tuple[Tuple[float, ...], float, float]:
+    """Matrix that turns ``page`` by its /Rotate with its CropBox at the origin.
+
+    Returns the matrix and the width and height the page then has.
+    """
+    x0, y0, x1, y1 = (float(v) for v in page.cropbox)
+    rotation = int(page.get("/Rotate", 0)) % 360
+    # /Rotate turns the page clockwise for display
+    if rotation == 90:
+        return (0, -1, 1, 0, -y0, x1), y1 - y0, x1 - x0
+    if rotation == 180:
+        return (-1, 0, 0, -1, x1, y1), x1 - x0, y1 - y0
+    if rotation == 270:
+        return (0, 1, -1, 0, y1, -x0), y1 - y0, x1 - x0
+    return (1, 0, 0, 1, -x0, -y0), x1 - x0, y1 - y0
+
+
+def _multiply(first: Tuple[float, ...], then: Tuple[float, ...]) -> Tuple[float, ...]:
+    """The matrix that applies ``first`` and then ``then``."""
+    a, b, c, d, e, f = first
+    A, B, C, D, E, F = then
+    return (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D,
+            e * A + f * C + E, e * B + f * D + F)
+
+
+def pdf_number(value: float) -> str:
+    """A number for a content stream: three decimals at most, no trailing zeros."""
+    return f"{value:.3f}".rstrip("0").rstrip(".")
+
+
+def _line(x1: float, y1: float, x2: float, y2: float) -> str:
+    return f"{pdf_number(x1)} {pdf_number(y1)} m {pdf_number(x2)} {pdf_number(y2)} l S"
+
+
+def _circle(cx: float, cy: float, r: float) -> str:
+    k = r * CIRCLE_KAPPA
+    points = [
+        (cx + r, cy + k, cx + k, cy + r, cx, cy + r),
+        (cx - k, cy + r, cx - r, cy + k, cx - r, cy),
+        (cx - r, cy - k, cx - k, cy - r, cx, cy - r),
+        (cx + k, cy - r, cx + r, cy - k, cx + r, cy),
+    ]
+    curves = " ".join(" ".join(pdf_number(v) for v in curve) + " c" for curve in points)
+    return f"{pdf_number(cx + r)} {pdf_number(cy)} m {curves} S"
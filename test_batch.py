@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test the non-interactive batch command
+"""
+import csv
+import os
+import tempfile
+from PyPDF2 import PdfReader
+from booklet_cli import collect_batch_inputs, main
+from improved_book_ordering import batch_process
+from conftest import create_numbered_pdf
+
+
+def test_batch_process():
+    """Every file in the directory is imposed and summarised"""
+    with tempfile.TemporaryDirectory() as tmp:
+        create_numbered_pdf(os.path.join(tmp, "a.pdf"), 5)
+        create_numbered_pdf(os.path.join(tmp, "b.pdf"), 8)
+        output_dir = os.path.join(tmp, "out")
+
+        results = batch_process(collect_batch_inputs(tmp), 8, 2, output_dir, workers=2)
+
+        for result in results:
+            print(f"  {result['input']}: {result['pages']} pages, {result['blank_pages']} blank")
+        assert [r["success"] for r in results] == [True, True]
+        assert [(r["pages"], r["blank_pages"]) for r in results] == [(5, 3), (8, 0)]
+        assert len(PdfReader(os.path.join(output_dir, "a_booklet.pdf")).pages) == 8
+        assert all(r["output_bytes"] > 0 for r in results)
+
+
+def test_batch_command():
+    """The CLI writes a CSV summary and reports failures in the exit code"""
+    with tempfile.TemporaryDirectory() as tmp:
+        create_numbered_pdf(os.path.join(tmp, "good.pdf"), 3)
+        with open(os.path.join(tmp, "broken.pdf"), "wb") as f:
+            f.write(b"not a pdf")
+        summary_file = os.path.join(tmp, "summary.csv")
+
+        exit_code = main(["batch", os.path.join(tmp, "*.pdf"), "-s", "4",
+                          "-w", "1", "--summary", summary_file])
+
+        with open(summary_file, newline="") as f:
+            rows = {os.path.basename(row["input"]): row for row in csv.DictReader(f)}
+        assert exit_code == 1
+        assert rows["good.pdf"]["success"] == "True"
+        assert rows["broken.pdf"]["success"] == "False"
+        assert rows["broken.pdf"]["error"] and not rows["broken.pdf"]["error"].startswith("Error")
+
+
+def test_batch_skips_earlier_booklets():
+    """Running again on the same directory doesn't impose the booklets it wrote"""
+    with tempfile.TemporaryDirectory() as tmp:
+        create_numbered_pdf(os.path.join(tmp, "a.pdf"), 5)
+        summary_file = os.path.join(tmp, "summary.csv")
+
+        for _ in range(2):
+            assert main(["batch", tmp, "-s", "4", "-w", "1", "--summary", summary_file]) == 0
+
+        with open(summary_file, newline="") as f:
+            assert [os.path.basename(row["input"]) for row in csv.DictReader(f)] == ["a.pdf"]
+        assert sorted(os.listdir(tmp)) == ["a.pdf", "a_booklet.pdf", "summary.csv"]
+
+
+def test_batch_rejects_bad_signature():
+    """Unusable settings are rejected before any work starts"""
+    assert main(["batch", ".", "-s", "6"]) == 2
+
+
+if __name__ == "__main__":
+    test_batch_process()
+    test_batch_command()
+    test_batch_skips_earlier_booklets()
+    test_batch_rejects_bad_signature()
+    print("OK Batch tests passed")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test the benchmark harness on tiny corpora
+"""
+import copy
+import os
+import tempfile
+from PyPDF2 import PdfReader
+from booklet_benchmark import (CORPUS_KINDS, compare_results, generate_corpus,
+                               measure_stages)
+
+
+def test_corpora_and_stage_numbers():
+    """Every corpus kind generates and reports all pipeline stages"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in CORPUS_KINDS:
+            path = os.path.join(tmp, f"{kind}.pdf")
+            generate_corpus(path, kind, 6)
+            assert len(PdfReader(path).pages) == 6
+
+            result = measure_stages(path, 4, 2)
+            print(f"  {kind}: {result['pages_per_sec']} pages/sec, {result['output_bytes']} bytes")
+            assert result["pages"] == 6 and result["blank_pages"] == 2
+            assert list(result["stages"]) == ["read", "plan", "number_and_impose", "serialize"]
+            assert result["output_bytes"] > 0
+
+        mixed = PdfReader(os.path.join(tmp, "mixed.pdf")).pages
+        assert len({(float(p.mediabox.width), float(p.mediabox.height)) for p in mixed}) == 4
+
+
+def test_compare_flags_regressions():
+    """A slower stage or a bigger output is reported against the baseline"""
+    stage = {"seconds": 1.0, "pages_per_sec": 100.0, "peak_rss_kib": 1000}
+    baseline = {"results": [{"corpus": "text_16", "output_bytes": 1000,
+                             "stages": {"serialize": dict(stage)}}]}
+    current = copy.deepcopy(baseline)
+    assert compare_results(current, baseline) == []
+
+    current["results"][0]["stages"]["serialize"]["pages_per_sec"] = 50.0
+    current["results"][0]["output_bytes"] = 2000
+    regressions = compare_results(current, baseline)
+    print(f"  {regressions}")
+    assert len(regressions) == 2
+
+
+if __name__ == "__main__":
+    test_corpora_and_stage_numbers()
+    test_compare_flags_regressions()
+    print("OK Benchmark tests passed")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test that padding blanks share one content stream and match the source size
+"""
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import StreamObject
+from improved_book_ordering import BookletProcessor
+from conftest import create_pdf
+
+
+def blank_pages(filename):
+    # Numbered pages carry several content streams; blanks a single empty one
+    return [page for page in PdfReader(filename).pages
+            if isinstance(page.get_contents(), StreamObject) and not page.get_contents().get_data()]
+
+
+def test_blanks_are_shared_and_sized():
+    """All blanks reuse one content stream and resource dictionary, in the source size"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 5, (420, 595))
+
+        for streaming in (False, True):
+            output_file = os.path.join(tmp, "out.pdf")
+            with redirect_stdout(io.StringIO()):
+                assert BookletProcessor().process_pdf(input_file, 16, 2, output_file, streaming=streaming)
+
+            blanks = blank_pages(output_file)
+            print(f"  streaming={streaming}: {len(blanks)} blanks")
+            assert len(blanks) == 11
+            assert {page.raw_get("/Contents").idnum for page in blanks} == {blanks[0].raw_get("/Contents").idnum}
+            assert len({page.raw_get("/Resources").idnum for page in blanks}) == 1
+            assert {(float(p.mediabox.width), float(p.mediabox.height)) for p in blanks} == {(420, 595)}
+
+
+def test_legacy_padding_matches_source():
+    """add_blank_pages sizes its blanks from the book's pages"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 3, (612, 792))
+
+        numbered = PdfWriter()
+        for page in PdfReader(input_file).pages:
+            numbered.add_page(page)
+        padded, added = BookletProcessor().add_blank_pages(numbered, 8)
+        assert added == 5
+        sizes = {(float(p.mediabox.width), float(p.mediabox.height)) for p in padded.pages}
+        assert sizes == {(612, 792)}
+
+
+if __name__ == "__main__":
+    test_blanks_are_shared_and_sized()
+    test_legacy_padding_matches_source()
+    print("OK Blank page tests passed")
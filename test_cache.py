@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed result cache
+"""
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from improved_book_ordering import BookletProcessor
+from result_cache import ResultCache
+from conftest import create_numbered_pdf
+
+
+def impose(cache, input_file, output_file, signature_size=8):
+    processor = BookletProcessor()
+    processor.cache = cache
+    log = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(log):
+        assert processor.process_pdf(input_file, signature_size, 2, output_file)
+    return time.perf_counter() - start, log.getvalue(), processor.last_result
+
+
+def test_cache_hit_and_miss():
+    """The same input and settings come from the cache; anything else misses"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, "cache"))
+        input_file = os.path.join(tmp, "book.pdf")
+        create_numbered_pdf(input_file, 30)
+
+        first_time, first_log, first_result = impose(cache, input_file, os.path.join(tmp, "first.pdf"))
+        hit_time, hit_log, hit_result = impose(cache, input_file, os.path.join(tmp, "second.pdf"))
+        print(f"  miss {first_time * 1000:.0f} ms, hit {hit_time * 1000:.1f} ms")
+        assert "Cached booklet" not in first_log and "Cached booklet" in hit_log
+        assert hit_result == first_result
+        assert hit_time < first_time / 5
+        with open(os.path.join(tmp, "first.pdf"), "rb") as a, open(os.path.join(tmp, "second.pdf"), "rb") as b:
+            assert a.read() == b.read()
+
+        _, other_log, _ = impose(cache, input_file, os.path.join(tmp, "third.pdf"), signature_size=4)
+        assert "Cached booklet" not in other_log
+        create_numbered_pdf(input_file, 31)
+        _, changed_log, _ = impose(cache, input_file, os.path.join(tmp, "fourth.pdf"))
+        assert "Cached booklet" not in changed_log
+        assert len(cache.entries()) == 3
+        assert not [name for name in os.listdir(cache.directory) if name.startswith(".tmp-")]
+
+
+def test_lru_eviction():
+    """Past the size limit the least recently used entries go first"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, "cache"), max_bytes=2500)
+        booklet = os.path.join(tmp, "booklet.pdf")
+        with open(booklet, "wb") as booklet_fp:
+            booklet_fp.write(b"x" * 1000)
+
+        for key in ("a", "b"):
+            cache.put(key, booklet, {"output_pages": 1})
+        # Use "a" again so "b" becomes the oldest
+        past = time.time() - 10
+        os.utime(cache._path("b", "pdf"), (past, past))
+        os.utime(cache._path("a", "pdf"), (past + 1, past + 1))
+        assert cache.get("a", os.path.join(tmp, "out.pdf")) is not None
+
+        cache.put("c", booklet, {"output_pages": 1})
+        print(f"  kept {[key for _, _, key in cache.entries()]}")
+        assert sorted(key for _, _, key in cache.entries()) == ["a", "c"]
+        assert cache.get("b", os.path.join(tmp, "out.pdf")) is None
+        assert cache.size() <= 2500
+
+
+def _put_repeatedly(job):
+    cache_dir, booklet, rounds = job
+    cache = ResultCache(cache_dir)
+    for _ in range(rounds):
+        cache.put("shared", booklet, {"output_pages": os.path.getsize(booklet)})
+    return rounds
+
+
+def test_concurrent_writers():
+    """Two processes writing the same entry leave one complete copy"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "cache")
+        booklets = []
+        for name, size in (("small", 200_000), ("large", 400_000)):
+            booklets.append(os.path.join(tmp, f"{name}.pdf"))
+            with open(booklets[-1], "wb") as booklet_fp:
+                booklet_fp.write(name[0].encode() * size)
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            list(executor.map(_put_repeatedly, [(cache_dir, booklet, 20) for booklet in booklets]))
+
+        out = os.path.join(tmp, "out.pdf")
+        result = ResultCache(cache_dir).get("shared", out)
+        with open(out, "rb") as out_fp:
+            data = out_fp.read()
+        assert data in (b"s" * 200_000, b"l" * 400_000)
+        assert result["output_pages"] in (200_000, 400_000)
+        assert not [name for name in os.listdir(cache_dir) if name.startswith(".tmp-")]
+
+
+if __name__ == "__main__":
+    test_cache_hit_and_miss()
+    test_lru_eviction()
+    test_concurrent_writers()
+    print("OK Cache tests passed")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test PDF to EPUB conversion
+"""
+import io
+import os
+import sys
+import tempfile
+import zipfile
+from contextlib import redirect_stderr, redirect_stdout
+from xml.etree import ElementTree
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from booklet_cli import main
+from pdf_epub import chapter_structure, convert_pdf_to_epub
+from conftest import create_chapter
+
+OPF = "{http://www.idpf.org/2007/opf}"
+
+
+def create_book(filename, page_count):
+    pixels = bytes((i * 11) % 256 for i in range(32 * 32 * 3))
+    create_chapter(filename, 1, page_count, ImageReader(Image.frombytes("RGB", (32, 32), pixels)))
+
+
+def chapter_texts(epub):
+    return [epub.read(name).decode() for name in epub.namelist() if name.startswith("OEBPS/chapter_")]
+
+
+def test_chapter_structure():
+    """Chapters split as createChapterStructure does in the browser"""
+    chapters = chapter_structure(23, 10)
+    assert [chapter["title"] for chapter in chapters] == ["Chapter 1", "Chapter 2", "Chapter 3"]
+    assert chapters[-1]["pages"] == [21, 22, 23]
+    assert chapter_structure(3, "all") == [{"title": "Complete Document", "pages": [1, 2, 3]}]
+    assert len(chapter_structure(5, 1)) == 5
+
+
+def test_epub_container():
+    """mimetype comes first and uncompressed; text and a shared image are carried over"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_book(input_file, 12)
+        output_file = os.path.join(tmp, "book.epub")
+        result = convert_pdf_to_epub(input_file, output_file, "Test & Book", "Author", pages_per_chapter=5)
+        print(f"  {result['pages']} pages, {result['chapters']} chapters, {result['images']} image(s)")
+        assert result["pages"] == 12 and result["chapters"] == 3 and result["images"] == 1
+
+        with zipfile.ZipFile(output_file) as epub:
+            first = epub.infolist()[0]
+            assert first.filename == "mimetype" and first.compress_type == zipfile.ZIP_STORED
+            assert not first.extra and epub.read("mimetype") == b"application/epub+zip"
+            assert len([name for name in epub.namelist() if name.startswith("OEBPS/Images/")]) == 1
+
+            texts = chapter_texts(epub)
+            assert "Chapter 1 page 6" in texts[1] and "Chapter 1 page 12" in texts[2]
+            for name in ("OEBPS/nav.xhtml", "OEBPS/toc.ncx", "OEBPS/chapter_1.xhtml"):
+                ElementTree.fromstring(epub.read(name))
+            opf = ElementTree.fromstring(epub.read("OEBPS/content.opf"))
+            spine = [item.get("idref") for item in opf.iter(f"{OPF}itemref")]
+            assert spine == ["chapter_1", "chapter_2", "chapter_3"]
+            assert "Test &amp; Book" in epub.read("OEBPS/content.opf").decode()
+
+
+def test_workers_match_single_process():
+    """Extracting in worker processes writes the same chapters"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_book(input_file, 30)
+        single, pooled = os.path.join(tmp, "single.epub"), os.path.join(tmp, "pooled.epub")
+        convert_pdf_to_epub(input_file, single, "Book", "Author")
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert main(["epub", input_file, "-o", pooled, "--author", "Author", "--title", "Book", "-w", "2"]) == 0
+            assert main(["epub", os.path.join(tmp, "missing.pdf"), "--author", "Author"]) == 1
+        assert "30 pages in 3 chapter(s), 1 image(s)" in log.getvalue()
+        with zipfile.ZipFile(single) as single_epub, zipfile.ZipFile(pooled) as pooled_epub:
+            assert chapter_texts(single_epub) == chapter_texts(pooled_epub)
+
+
+def test_bad_settings_and_missing_pillow():
+    """-w 0 is refused, and images without Pillow fail with a clear error"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_book(input_file, 4)
+        output_file = os.path.join(tmp, "book.epub")
+
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            try:
+                main(["epub", input_file, "-o", output_file, "--author", "Author", "-w", "0"])
+            except SystemExit as e:
+                assert e.code == 2
+            else:
+                assert False, "-w 0 should be rejected"
+
+        saved = sys.modules.get("PIL")
+        sys.modules["PIL"] = None
+        try:
+            convert_pdf_to_epub(input_file, output_file, "Book", "Author")
+        except ImportError as e:
+            print(f"  OK {e}")
+            assert "pip install Pillow" in str(e)
+        else:
+            assert False, "converting images without Pillow should fail"
+        finally:
+            sys.modules["PIL"] = saved
+
+
+if __name__ == "__main__":
+    print("Testing EPUB conversion...")
+    test_chapter_structure()
+    test_epub_container()
+    test_workers_match_single_process()
+    test_bad_settings_and_missing_pillow()
+    print("OK EPUB tests passed")
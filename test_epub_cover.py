@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Test EPUB cover replacement by raw entry passthrough
+"""
+import io
+import os
+import tempfile
+import time
+import zipfile
+from contextlib import redirect_stdout
+from xml.dom import minidom
+import epub_cover
+from booklet_cli import main
+from epub_cover import replace_cover
+
+OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <dc:identifier id="uid">urn:uuid:0</dc:identifier>
+        <dc:title>Test</dc:title>
+    </metadata>
+    <manifest>
+        <item id="chapter_1" href="chapter_1.xhtml" media-type="application/xhtml+xml"/>
+        <item id="scan" href="Images/scan.bin" media-type="image/jpeg"/>
+    </manifest>
+    <spine><itemref idref="chapter_1"/></spine>
+</package>"""
+
+CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+    <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+
+class WriteOnly:
+    """A pipe-like output: no tell() or seek()"""
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+    def flush(self):
+        pass
+
+
+class ReadOnly:
+    """A pipe-like input: read() only"""
+    def __init__(self, data):
+        self.buffer = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.buffer.read(size)
+
+
+def create_epub(filename, image_bytes):
+    with zipfile.ZipFile(filename, "w") as epub:
+        epub.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip")
+        epub.writestr("META-INF/container.xml", CONTAINER, compress_type=zipfile.ZIP_DEFLATED)
+        epub.writestr("OEBPS/content.opf", OPF, compress_type=zipfile.ZIP_DEFLATED)
+        epub.writestr("OEBPS/chapter_1.xhtml", "<html>" + "text " * 5000 + "</html>",
+                      compress_type=zipfile.ZIP_DEFLATED)
+        epub.writestr("OEBPS/Images/scan.bin", os.urandom(image_bytes), compress_type=zipfile.ZIP_DEFLATED)
+
+
+def raw_entries(data):
+    """Raw bytes (header, data) of every entry, by name"""
+    epub = zipfile.ZipFile(io.BytesIO(data))
+    entries = sorted(epub.infolist(), key=lambda info: info.header_offset)
+    ends = [info.header_offset for info in entries[1:]] + [epub.start_dir]
+    return {info.filename: data[info.header_offset:end] for info, end in zip(entries, ends)}
+
+
+def cover_item(data):
+    opf = minidom.parseString(zipfile.ZipFile(io.BytesIO(data)).read("OEBPS/content.opf"))
+    items = [item for item in opf.getElementsByTagName("item") if item.getAttribute("id") == "cover-image"]
+    metas = [meta.getAttribute("content") for meta in opf.getElementsByTagName("meta")
+             if meta.getAttribute("name") == "cover"]
+    assert len(items) == 1 and metas == ["cover-image"]
+    return items[0].getAttribute("href"), items[0].getAttribute("media-type")
+
+
+def test_untouched_entries_are_copied_raw():
+    """Only the OPF and the cover are rewritten; the rest is byte for byte"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.epub")
+        create_epub(input_file, 16 * 1024 * 1024)
+        with open(input_file, "rb") as input_fp:
+            original = input_fp.read()
+
+        output = io.BytesIO()
+        start = time.perf_counter()
+        with open(input_file, "rb") as input_fp:
+            result = replace_cover(input_fp, output, b"\x89PNG cover", "front.png")
+        elapsed = time.perf_counter() - start
+        print(f"  {len(original) // 1024} KiB EPUB: {result['bytes_rewritten']} bytes rewritten "
+              f"in {elapsed * 1000:.1f} ms")
+        # Recompressing 16 MB takes far longer than copying it
+        assert elapsed < 0.5
+        assert result["raw_copy"] and result["entries_copied"] == 4 and result["cover"] == "OEBPS/Images/cover.png"
+
+        before, after = raw_entries(original), raw_entries(output.getvalue())
+        for name in ("mimetype", "META-INF/container.xml", "OEBPS/chapter_1.xhtml", "OEBPS/Images/scan.bin"):
+            assert after[name] == before[name], name
+        assert list(after) == list(before) + ["OEBPS/Images/cover.png"]
+
+        epub = zipfile.ZipFile(output)
+        assert epub.testzip() is None
+        assert epub.read("OEBPS/Images/cover.png") == b"\x89PNG cover"
+        assert cover_item(output.getvalue()) == ("Images/cover.png", "image/png")
+
+
+def test_replace_existing_cover_to_stream():
+    """A second cover replaces the first, written to an unseekable stream"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.epub")
+        create_epub(input_file, 1024)
+        first = os.path.join(tmp, "first.epub")
+        cover = os.path.join(tmp, "cover.jpg")
+        with open(cover, "wb") as cover_fp:
+            cover_fp.write(b"\xff\xd8 jpeg cover")
+        with redirect_stdout(io.StringIO()):
+            assert main(["cover", input_file, cover, "-o", first]) == 0
+            assert main(["cover", input_file, os.path.join(tmp, "missing.png")]) == 1
+
+        stream = WriteOnly()
+        with open(first, "rb") as input_fp:
+            result = replace_cover(input_fp, stream, b"GIF89a cover", "cover.gif")
+        epub = zipfile.ZipFile(io.BytesIO(stream.buffer.getvalue()))
+        assert epub.testzip() is None
+        assert epub.infolist()[0].filename == "mimetype"
+        assert [name for name in epub.namelist() if "cover" in name] == ["OEBPS/Images/cover.jpg",
+                                                                          "OEBPS/Images/cover.gif"]
+        assert cover_item(stream.buffer.getvalue()) == ("Images/cover.gif", "image/gif")
+
+
+def test_old_cover_kept_for_title_page():
+    """A title page still showing the old cover keeps its image"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.epub")
+        old_cover = b"\xff\xd8 old jpeg cover"
+        opf = OPF.replace('<item id="scan"', '<item id="cover-image" href="cover.jpeg" media-type="image/jpeg" '
+                                             'properties="cover-image"/>\n        <item id="scan"')
+        with zipfile.ZipFile(input_file, "w") as epub:
+            epub.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip")
+            epub.writestr("META-INF/container.xml", CONTAINER, compress_type=zipfile.ZIP_DEFLATED)
+            epub.writestr("OEBPS/content.opf", opf, compress_type=zipfile.ZIP_DEFLATED)
+            epub.writestr("OEBPS/titlepage.xhtml", '<html><body><img src="cover.jpeg"/></body></html>',
+                          compress_type=zipfile.ZIP_DEFLATED)
+            epub.writestr("OEBPS/cover.jpeg", old_cover)
+        with open(input_file, "rb") as input_fp:
+            original = input_fp.read()
+
+        output = io.BytesIO()
+        with open(input_file, "rb") as input_fp:
+            result = replace_cover(input_fp, output, b"\x89PNG cover", "front.png")
+        assert result["entries_copied"] == 4
+        assert raw_entries(output.getvalue())["OEBPS/cover.jpeg"] == raw_entries(original)["OEBPS/cover.jpeg"]
+        epub = zipfile.ZipFile(output)
+        assert epub.testzip() is None
+        assert epub.read("OEBPS/cover.jpeg") == old_cover
+        assert cover_item(output.getvalue()) == ("Images/cover.png", "image/png")
+
+
+def test_fallback_without_zipfile_internals():
+    """Without the ZipFile internals, entries are copied through the public API"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.epub")
+        create_epub(input_file, 1024)
+        with open(input_file, "rb") as input_fp:
+            original = input_fp.read()
+
+        saved = epub_cover.RAW_COPY_ATTRIBUTES
+        epub_cover.RAW_COPY_ATTRIBUTES = saved + ("_no_such_internal",)
+        try:
+            output = io.BytesIO()
+            # An unseekable input is spooled to a file first
+            result = replace_cover(ReadOnly(original), output, b"\x89PNG cover", "front.png")
+        finally:
+            epub_cover.RAW_COPY_ATTRIBUTES = saved
+        assert not result["raw_copy"] and result["entries_copied"] == 4
+
+        before, after = zipfile.ZipFile(io.BytesIO(original)), zipfile.ZipFile(output)
+        assert after.testzip() is None
+        assert after.namelist() == before.namelist() + ["OEBPS/Images/cover.png"]
+        for info in before.infolist():
+            if info.filename != "OEBPS/content.opf":
+                assert after.read(info.filename) == before.read(info.filename), info.filename
+                assert after.getinfo(info.filename).compress_type == info.compress_type
+        assert cover_item(output.getvalue()) == ("Images/cover.png", "image/png")
+
+
+if __name__ == "__main__":
+    print("Testing EPUB cover replacement...")
+    test_untouched_entries_are_copied_raw()
+    test_replace_existing_cover_to_stream()
+    test_old_cover_kept_for_title_page()
+    test_fallback_without_zipfile_internals()
+    print("OK EPUB cover tests passed")
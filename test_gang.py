@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test gang runs: short booklets packed onto shared press sheets
+"""
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader
+from booklet_cli import main
+from imposition_plan import fold_pages, gang_manifest, gang_sheets, plan_signatures, signature_pattern
+from improved_book_ordering import BookletProcessor
+from conftest import create_pdf
+
+
+def labels(page):
+    """Source pages drawn on a press sheet side (create_pdf writes 'Page N')"""
+    return Counter(int(number) for number in re.findall(r"Page (\d+)", page.extract_text()))
+
+
+def test_fold_pages_follow_signature_pattern():
+    """Folded sheets hold the pages signature_pattern gives them"""
+    for size in (4, 8, 12, 32):
+        pattern = signature_pattern(size, 2)
+        for fold in range(size // 4):
+            front, back = fold_pages(size, (size,), 0, fold)
+            assert tuple(front + back) == pattern[4 * fold:4 * fold + 4]
+    assert fold_pages(10, (8, 4), 1, 0) == ([-1, 8], [9, -1])
+
+
+def test_packing_hundreds_of_jobs():
+    """Hundreds of zines pack onto the fewest press sheets in milliseconds"""
+    generator = random.Random(25)
+    jobs = []
+    for number in range(500):
+        total_pages = generator.randint(3, 40)
+        jobs.append((f"zine{number}.pdf", total_pages, plan_signatures(total_pages, 4)))
+
+    for pages_per_sheet in (4, 8):
+        start = time.perf_counter()
+        sheets = gang_sheets([layout for _, _, layout in jobs], pages_per_sheet)
+        manifest = gang_manifest(jobs, sheets, pages_per_sheet)
+        elapsed = time.perf_counter() - start
+        folds = sum(size // 4 for _, _, layout in jobs for size in layout)
+        print(f"  {pages_per_sheet} per sheet: {manifest['press_sheets']} press sheets instead of "
+              f"{manifest['separate_press_sheets']}, packed in {elapsed * 1000:.1f} ms")
+        assert elapsed < 0.25
+        assert manifest["press_sheets"] == -(-folds // (pages_per_sheet // 2))
+        assert manifest["press_sheets"] < manifest["separate_press_sheets"]
+        pieces = [piece for sheet in sheets for piece in sheet]
+        assert len(pieces) == len(set(pieces)) == folds
+        assert sum(len(job["pieces"]) for job in manifest["jobs"]) == folds
+
+
+def test_gang_press_file():
+    """Every piece lands where the manifest says, numbered within its own job"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for number, page_count in enumerate((4, 8, 6, 12, 10)):
+            create_pdf(os.path.join(tmp, f"zine{number}.pdf"), page_count, (297, 420))
+        output_file = os.path.join(tmp, "press.pdf")
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert main(["gang", os.path.join(tmp, "zine*.pdf"), "-o", output_file]) == 0
+            assert main(["gang", os.path.join(tmp, "missing.pdf"), "-o", output_file]) == 1
+            assert main(["gang", os.path.join(tmp, "zine0.pdf"), "-p", "3", "-o", output_file]) == 2
+            assert main(["gang", os.path.join(tmp, "zine*.pdf"), os.path.join(tmp, "zine9.pdf"),
+                         "-o", output_file]) == 1
+        assert "onto 6 press sheet(s) instead of 7" in log.getvalue()
+        assert f"No PDF files found for '{os.path.join(tmp, 'zine9.pdf')}'" in log.getvalue()
+
+        with open(os.path.join(tmp, "press.gang.json")) as manifest_fp:
+            manifest = json.load(manifest_fp)
+        pages = PdfReader(output_file).pages
+        assert len(pages) == 2 * manifest["press_sheets"]
+        for sheet in manifest["sheets"]:
+            for side, page in zip(("front", "back"), pages[2 * sheet["sheet"] - 2:2 * sheet["sheet"]]):
+                expected = Counter(number for piece in sheet["pieces"] for number in piece[side] if number)
+                assert labels(page) == expected, (sheet["sheet"], side)
+
+        zine3 = next(job for job in manifest["jobs"] if job["job"].endswith("zine3.pdf"))
+        assert [(piece["signature"], piece["fold"]) for piece in zine3["pieces"]] == [(1, 1), (1, 2), (1, 3)]
+
+
+def test_single_job_matches_sheet_imposition():
+    """A gang of one is the job's own N-up booklet"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 16, (297, 420))
+        booklet = os.path.join(tmp, "booklet.pdf")
+        processor = BookletProcessor()
+        processor.sheet_layout = True
+        processor.quiet = True
+        with redirect_stdout(io.StringIO()):
+            assert processor.process_pdf(input_file, 16, 4, booklet)
+            assert BookletProcessor().gang_run([input_file], 16, 4, os.path.join(tmp, "press.pdf"),
+                                               os.path.join(tmp, "press.json"))
+        imposed = [page.extract_text() for page in PdfReader(booklet).pages]
+        ganged = [page.extract_text() for page in PdfReader(os.path.join(tmp, "press.pdf")).pages]
+        assert ganged == imposed
+
+        # The gang run leaves the processor's own layout alone
+        processor.sheet_layout = False
+        with redirect_stdout(io.StringIO()):
+            assert processor.gang_run([input_file], 16, 4, os.path.join(tmp, "press.pdf"),
+                                      os.path.join(tmp, "press.json"))
+            assert processor.process_pdf(input_file, 16, 4, booklet)
+        assert not processor.sheet_layout and len(PdfReader(booklet).pages) == 16
+
+
+def test_blank_press_sheet_matches_job_size():
+    """A press sheet holding only blank folds is the size of the job's other sheets"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "flyer.pdf")
+        create_pdf(input_file, 1, (297, 420))
+        output_file = os.path.join(tmp, "press.pdf")
+        with redirect_stdout(io.StringIO()):
+            assert main(["gang", input_file, "-s", "12", "-p", "4", "-o", output_file]) == 0
+        pages = PdfReader(output_file).pages
+        assert len(pages) == 4
+        assert {(float(page.mediabox.width), float(page.mediabox.height)) for page in pages} == {(594, 840)}
+
+
+if __name__ == "__main__":
+    print("Testing gang runs...")
+    test_fold_pages_follow_signature_pattern()
+    test_packing_hundreds_of_jobs()
+    test_gang_press_file()
+    test_single_job_matches_sheet_imposition()
+    test_blank_press_sheet_matches_job_size()
+    print("OK Gang run tests passed")
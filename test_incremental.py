@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test incremental re-imposition from a booklet manifest
+"""
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+from booklet_manifest import manifest_path
+from improved_book_ordering import BookletProcessor
+
+
+def create_book(filename, page_count, revised=()):
+    c = canvas.Canvas(filename)
+    for i in range(page_count):
+        c.drawString(72, 700, f"Page {i + 1}" + (" (revised)" if i in revised else ""))
+        c.showPage()
+    c.save()
+
+
+def page_texts(filename):
+    return [page.extract_text() for page in PdfReader(filename).pages]
+
+
+def impose(input_file, output_file, signature_size=8, pages_per_sheet=2, sheets=False):
+    processor = BookletProcessor()
+    processor.manifest = True
+    processor.sheet_layout = sheets
+    with redirect_stdout(io.StringIO()):
+        assert processor.process_pdf(input_file, signature_size, pages_per_sheet, output_file)
+
+
+def update(input_file, previous, output_file=None):
+    processor = BookletProcessor()
+    log = io.StringIO()
+    with redirect_stdout(log):
+        assert processor.update_pdf(input_file, previous, output_file)
+    return processor, log.getvalue()
+
+
+def test_update_rebuilds_changed_signatures():
+    """Only signatures with revised pages are rebuilt, and the result matches a full run"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original, revised = os.path.join(tmp, "v1.pdf"), os.path.join(tmp, "v2.pdf")
+        create_book(original, 38)
+        create_book(revised, 38, revised={2, 3, 29})
+        booklet = os.path.join(tmp, "booklet.pdf")
+        impose(original, booklet)
+
+        with open(manifest_path(booklet)) as manifest_fp:
+            manifest = json.load(manifest_fp)
+        assert manifest["layout"] == [8] * 5
+        assert manifest["signatures"][0]["sheets"][0] == {"output_pages": [0, 4], "source_pages": [7, 0, 1, 6]}
+
+        processor, log = update(revised, booklet)
+        print(f"  {log.splitlines()[3].strip()}")
+        assert processor.last_result["changed_signatures"] == 2
+
+        fresh = os.path.join(tmp, "fresh.pdf")
+        impose(revised, fresh)
+        assert page_texts(booklet) == page_texts(fresh)
+
+        # The manifest now describes the updated booklet: nothing left to rebuild
+        processor, _ = update(revised, booklet)
+        assert processor.last_result["changed_signatures"] == 0
+        assert page_texts(booklet) == page_texts(fresh)
+
+
+def test_update_with_sheet_layout():
+    """Sheet maps follow N-up press sheets, so splicing works with --sheets too"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original, revised = os.path.join(tmp, "v1.pdf"), os.path.join(tmp, "v2.pdf")
+        create_book(original, 40)
+        create_book(revised, 40, revised={17})
+        booklet, fresh = os.path.join(tmp, "booklet.pdf"), os.path.join(tmp, "fresh.pdf")
+        impose(original, booklet, (16, 16, 8), 4, sheets=True)
+
+        with open(manifest_path(booklet)) as manifest_fp:
+            signatures = json.load(manifest_fp)["signatures"]
+        assert signatures[-1]["output_pages"][1] == len(PdfReader(booklet).pages)
+
+        updated = os.path.join(tmp, "updated.pdf")
+        processor, _ = update(revised, booklet, updated)
+        assert processor.last_result["changed_signatures"] == 1
+        impose(revised, fresh, (16, 16, 8), 4, sheets=True)
+        assert page_texts(updated) == page_texts(fresh)
+
+
+def test_update_with_part_used_press_sheets():
+    """12-page signatures 4 per sheet end on a half-used press sheet; the map still fits"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original, revised = os.path.join(tmp, "v1.pdf"), os.path.join(tmp, "v2.pdf")
+        create_book(original, 24)
+        create_book(revised, 24, revised={20})
+        booklet, fresh = os.path.join(tmp, "booklet.pdf"), os.path.join(tmp, "fresh.pdf")
+        impose(original, booklet, 12, 4, sheets=True)
+
+        with open(manifest_path(booklet)) as manifest_fp:
+            manifest = json.load(manifest_fp)
+        assert manifest["output_pages"] == manifest["signatures"][-1]["output_pages"][1] == 8
+        assert len(PdfReader(booklet).pages) == 8
+
+        updated = os.path.join(tmp, "updated.pdf")
+        processor, _ = update(revised, booklet, updated)
+        assert processor.last_result["changed_signatures"] == 1
+        impose(revised, fresh, 12, 4, sheets=True)
+        assert page_texts(updated) == page_texts(fresh)
+
+        # A manifest whose sheet map doesn't match the booklet is not spliced from
+        with open(manifest_path(updated)) as manifest_fp:
+            manifest = json.load(manifest_fp)
+        manifest["signatures"][-1]["output_pages"][1] = 6
+        with open(manifest_path(updated), "w") as manifest_fp:
+            json.dump(manifest, manifest_fp)
+        processor, log = update(revised, updated)
+        assert "has 8 pages but its manifest maps 6" in log
+        assert "changed_signatures" not in processor.last_result
+        assert page_texts(updated) == page_texts(fresh)
+
+
+def test_update_falls_back_to_full_run():
+    """A new page count or an edited booklet means imposing the whole book"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original, longer = os.path.join(tmp, "v1.pdf"), os.path.join(tmp, "v2.pdf")
+        create_book(original, 20)
+        create_book(longer, 23)
+        booklet = os.path.join(tmp, "booklet.pdf")
+        impose(original, booklet)
+
+        processor, log = update(longer, booklet)
+        assert "Page count changed" in log
+        assert processor.last_result["original_pages"] == 23
+        assert len(PdfReader(booklet).pages) == 24
+
+        with open(booklet, "ab") as booklet_fp:
+            booklet_fp.write(b"\n% touched\n")
+        _, log = update(longer, booklet)
+        assert "changed since its manifest" in log
+
+
+def test_update_needs_manifest():
+    """Without a manifest there is nothing to update from"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, "v1.pdf")
+        create_book(original, 8)
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert not BookletProcessor().update_pdf(original, os.path.join(tmp, "missing.pdf"))
+        assert "No usable manifest" in log.getvalue()
+
+
+if __name__ == "__main__":
+    print("Testing incremental re-imposition...")
+    test_update_rebuilds_changed_signatures()
+    test_update_with_sheet_layout()
+    test_update_with_part_used_press_sheets()
+    test_update_falls_back_to_full_run()
+    test_update_needs_manifest()
+    print("OK All incremental update tests passed")
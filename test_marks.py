@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test sewing marks and cutting lines as shared stamps
+"""
+import contextlib
+import io
+import os
+import tempfile
+from PyPDF2 import PdfReader
+from improved_book_ordering import BookletProcessor
+from conftest import create_numbered_pdf
+
+
+def impose_with_marks(input_file, output_file, sheet_layout, sewing_marks, cutting_lines):
+    """Impose with marks and return the output pages"""
+    processor = BookletProcessor()
+    processor.sheet_layout = sheet_layout
+    processor.sewing_marks = sewing_marks
+    processor.cutting_lines = cutting_lines
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert processor.process_pdf(input_file, 16, 4, output_file)
+    return PdfReader(output_file, strict=True).pages
+
+
+def stamp_references(pages):
+    """Object numbers of the marks stamps used by each page"""
+    references = []
+    for page in pages:
+        xobjects = page["/Resources"].get("/XObject", {})
+        references.append({xobjects.raw_get(name).idnum for name in xobjects
+                           if name.startswith("/BookletMarks")})
+    return references
+
+
+def test_sheet_marks_are_shared():
+    """All sheets of the same size use one stamp object"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 64)
+        sheets = impose_with_marks(input_file, os.path.join(tmp, "out.pdf"), True, 3, "both")
+
+        references = stamp_references(sheets)
+        print(f"  {len(sheets)} sheets share stamps {set.union(*references)}")
+        assert len(sheets) == 16
+        assert len(set.union(*references)) == 1
+
+        stamp = sheets[0]["/Resources"]["/XObject"]["/BookletMarks0"].get_data()
+        # 3 holes in each of the 2 rows, a cut between the rows and one down the fold
+        assert stamp.count(b" c S") == 6
+        assert b"[8 4] 0 d" in stamp
+
+
+def test_page_marks_on_fold_side():
+    """Single booklet pages only get sewing marks on the outer side of a sheet"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 16)
+        pages = impose_with_marks(input_file, os.path.join(tmp, "out.pdf"), False, 4, "none")
+
+        marked = [bool(refs) for refs in stamp_references(pages)]
+        print(f"  marked pages: {marked}")
+        assert marked == [True, True, False, False] * 4
+        # Page content is kept and wrapped in q ... Q before the marks
+        assert pages[0].extract_text().split() == ["16", "16"]
+
+
+def test_no_marks_by_default():
+    """Without marks the output has no stamps at all"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 8)
+        pages = impose_with_marks(input_file, os.path.join(tmp, "out.pdf"), True, 0, "none")
+        assert stamp_references(pages) == [set()] * len(pages)
+
+
+if __name__ == "__main__":
+    test_sheet_marks_are_shared()
+    test_page_marks_on_fold_side()
+    test_no_marks_by_default()
+    print("OK Marks tests passed")
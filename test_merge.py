@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test the streaming chapter merge
+"""
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.lib.utils import ImageReader
+from booklet_cli import main
+from improved_book_ordering import BookletProcessor
+from pdf_merge import read_merge_list
+from conftest import create_chapter
+
+
+def create_chapters(tmp, counts=(3, 5, 2)):
+    pixels = bytes((i * 7) % 256 for i in range(64 * 64 * 3))
+    logo = ImageReader(Image.frombytes("RGB", (64, 64), pixels))
+    chapters = []
+    for chapter, page_count in enumerate(counts, 1):
+        path = os.path.join(tmp, f"chapter{chapter}.pdf")
+        create_chapter(path, chapter, page_count, logo)
+        chapters.append(path)
+    return chapters
+
+
+def image_ids(reader):
+    return {obj.idnum for page in reader.pages
+            for obj in page["/Resources"]["/XObject"].values()}
+
+
+def test_merge_shares_images():
+    """Pages keep their order and the logo every chapter embeds is written once"""
+    with tempfile.TemporaryDirectory() as tmp:
+        chapters = create_chapters(tmp)
+        output_file = os.path.join(tmp, "book.pdf")
+        processor = BookletProcessor()
+        with redirect_stdout(io.StringIO()):
+            assert processor.merge_pdfs(chapters, output_file)
+
+        result = processor.last_result
+        assert result["pages"] == 10
+        assert [chapter["first_page"] for chapter in result["files"]] == [1, 4, 9]
+        assert result["duplicates_dropped"] >= 2
+
+        reader = PdfReader(output_file)
+        texts = [page.extract_text().strip() for page in reader.pages]
+        assert texts[3] == "Chapter 2 page 1" and texts[-1] == "Chapter 3 page 2"
+        assert len(image_ids(reader)) == 1
+
+        # Every chapter loaded into one writer keeps a copy of the logo each
+        naive = PdfWriter()
+        for chapter in chapters:
+            for page in PdfReader(chapter).pages:
+                naive.add_page(page)
+        naive_bytes = io.BytesIO()
+        naive.write(naive_bytes)
+        print(f"  merged: {os.path.getsize(output_file)} bytes, naive merge: {len(naive_bytes.getvalue())} bytes")
+        assert os.path.getsize(output_file) < len(naive_bytes.getvalue())
+
+        # The merged book goes straight into imposition
+        with redirect_stdout(io.StringIO()):
+            assert processor.process_pdf(output_file, 4, 2, os.path.join(tmp, "booklet.pdf"))
+        assert processor.last_result["blank_pages"] == 2
+
+
+def test_merge_list():
+    """A merge list orders the chapters; relative paths follow the list"""
+    with tempfile.TemporaryDirectory() as tmp:
+        create_chapters(tmp)
+        text_list = os.path.join(tmp, "chapters.txt")
+        with open(text_list, "w") as list_fp:
+            list_fp.write("# running order\nchapter3.pdf\n\nchapter1.pdf\n")
+        assert read_merge_list(text_list) == [os.path.join(tmp, "chapter3.pdf"), os.path.join(tmp, "chapter1.pdf")]
+
+        json_list = os.path.join(tmp, "chapters.json")
+        with open(json_list, "w") as list_fp:
+            json.dump({"files": ["chapter2.pdf", "chapter1.pdf"]}, list_fp)
+
+        output_file = os.path.join(tmp, "book.pdf")
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert main(["merge", os.path.join(tmp, "chapter3.pdf"), "--list", json_list,
+                         "-o", output_file, "--optimize"]) == 0
+            assert main(["merge", "--list", os.path.join(tmp, "missing.txt"), "-o", output_file]) == 2
+        texts = [page.extract_text().strip() for page in PdfReader(output_file).pages]
+        assert texts == ["Chapter 3 page 1", "Chapter 3 page 2"] + [f"Chapter 2 page {i}" for i in range(1, 6)] \
+            + [f"Chapter 1 page {i}" for i in range(1, 4)]
+
+
+def test_merge_refuses_missing_chapter():
+    """A mistyped chapter stops the merge instead of being left out"""
+    with tempfile.TemporaryDirectory() as tmp:
+        chapters = create_chapters(tmp)
+        output_file = os.path.join(tmp, "book.pdf")
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert main(["merge", chapters[0], os.path.join(tmp, "chapter9.pdf"), chapters[2],
+                         "-o", output_file]) == 1
+            assert main(["merge", os.path.join(tmp, "chapter*.pdf"), "-o", output_file]) == 0
+        assert "No PDF files found for" in log.getvalue() and "chapter9.pdf" in log.getvalue()
+        assert len(PdfReader(output_file).pages) == 10
+
+
+if __name__ == "__main__":
+    print("Testing chapter merging...")
+    test_merge_shares_images()
+    test_merge_list()
+    test_merge_refuses_missing_chapter()
+    print("OK Merge tests passed")
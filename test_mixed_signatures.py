@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test the mixed signature planner and imposing books with mixed signatures
+"""
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader, PdfWriter
+from imposition_plan import (SIGNATURE_SIZES, imposition_indices, parse_signature_size, plan_signatures,
+                             press_sheets, signature_layout)
+from improved_book_ordering import BookletProcessor
+from conftest import create_pdf
+
+
+def exhaustive_best(total_pages, pages_per_sheet, sizes):
+    """(padded pages, press sheets, signatures) of the best layout, by plain dynamic programming."""
+    limit = total_pages + max(sizes)
+    best = {0: (0, 0)}
+    for pages in range(4, limit + 1, 4):
+        options = [(best[pages - size][0] + press_sheets(size, pages_per_sheet), best[pages - size][1] + 1)
+                   for size in sizes if pages - size in best]
+        if options:
+            best[pages] = min(options)
+    padded = min(pages for pages in best if pages >= total_pages)
+    return (padded,) + best[padded]
+
+
+def score(layout, pages_per_sheet):
+    return sum(layout), sum(press_sheets(size, pages_per_sheet) for size in layout), len(layout)
+
+
+def test_planner_examples():
+    """70 pages become 32+32+8 when the bindery stops at 32"""
+    assert plan_signatures(70, 2, (8, 16, 32)) == (32, 32, 8)
+    assert plan_signatures(70) == (64, 8)
+    assert plan_signatures(64) == (64,)
+    assert plan_signatures(1) == (4,)
+    assert plan_signatures(0) == ()
+    print("  70 pages, sizes up to 32: 32+32+8")
+
+
+def test_planner_is_optimal():
+    """The planner matches an exhaustive search for fewest blanks, sheets and signatures"""
+    for pages_per_sheet, sizes in ((2, SIGNATURE_SIZES), (4, SIGNATURE_SIZES), (4, (8, 12, 20)),
+                                   (2, (8, 16, 32)), (8, (12, 16, 48))):
+        for total_pages in range(0, 400, 7):
+            layout = plan_signatures(total_pages, pages_per_sheet, sizes)
+            assert set(layout) <= set(sizes)
+            assert list(layout) == sorted(layout, reverse=True)
+            assert score(layout, pages_per_sheet) == exhaustive_best(total_pages, pages_per_sheet, sizes), \
+                (total_pages, pages_per_sheet, sizes, layout)
+
+
+def test_planner_is_instant():
+    """Planning a 100k-page book takes milliseconds"""
+    start = time.perf_counter()
+    layout = plan_signatures(100001)
+    elapsed = time.perf_counter() - start
+    print(f"  100001 pages: {len(layout)} signatures in {elapsed * 1000:.2f} ms")
+    assert sum(layout) == 100004
+    assert elapsed < 0.05
+
+
+def test_layout_validation():
+    """Explicit mixes must hold the book without an all-blank signature"""
+    assert parse_signature_size("32+32+8") == (32, 32, 8)
+    assert parse_signature_size("32 32 8") == (32, 32, 8)
+    assert parse_signature_size("16") == 16
+    assert parse_signature_size("Auto") == "auto"
+    assert signature_layout(70, (32, 32, 8)) == (32, 32, 8)
+    assert signature_layout(33, 16) == (16, 16, 16)
+    for total_pages in (60, 80):
+        try:
+            signature_layout(total_pages, (32, 32, 8))
+        except ValueError:
+            continue
+        assert False, f"{total_pages} pages should not fit 32+32+8"
+
+
+def test_mixed_booklet():
+    """An auto-planned booklet follows each signature's own pattern, on every code path"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 70, (420, 595))
+        plan = list(imposition_indices(70, (32, 32, 8), 2))
+        # The closing 8-page signature carries pages 65-70 and both blanks
+        assert plan[64:] == [-1, 64, 65, -1, 69, 66, 67, 68]
+
+        for streaming, workers in ((False, 1), (True, 1), (False, 2)):
+            output_file = os.path.join(tmp, "out.pdf")
+            processor = BookletProcessor()
+            processor.signature_sizes = (8, 16, 32)
+            log = io.StringIO()
+            with redirect_stdout(log):
+                assert processor.process_pdf(input_file, "auto", 2, output_file,
+                                             streaming=streaming, workers=workers)
+            assert "Signatures: 32+32+8 pages" in log.getvalue()
+            assert processor.last_result["blank_pages"] == 2
+
+            pages = PdfReader(output_file).pages
+            assert len(pages) == 72
+            for page, source in zip(pages, plan):
+                if source >= 0:
+                    assert f"Page {source + 1}" in page.extract_text()
+            print(f"  streaming={streaming}, workers={workers}: 72 pages in signature order")
+
+
+def test_legacy_path_mixed():
+    """add_blank_pages and reorder_pages take a mixed layout too"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 10, (612, 792))
+
+        numbered = PdfWriter()
+        for page in PdfReader(input_file).pages:
+            numbered.add_page(page)
+        processor = BookletProcessor()
+        with redirect_stdout(io.StringIO()):
+            padded, added = processor.add_blank_pages(numbered, (8, 4))
+            reordered = processor.reorder_pages(padded, (8, 4), 2)
+        assert added == 2
+
+        expected = list(imposition_indices(10, (8, 4), 2))
+        assert expected == [7, 0, 1, 6, 5, 2, 3, 4, -1, 8, 9, -1]
+        for page, source in zip(reordered.pages, expected):
+            text = page.extract_text()
+            assert (f"Page {source + 1}" in text) if source >= 0 else not text
+
+
+if __name__ == "__main__":
+    print("Testing mixed signatures...")
+    test_planner_examples()
+    test_planner_is_optimal()
+    test_planner_is_instant()
+    test_layout_validation()
+    test_mixed_booklet()
+    test_legacy_path_mixed()
+    print("OK All mixed signature tests passed")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test page numbers written straight into page content
+"""
+import io
+import os
+import re
+import tempfile
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader, PdfWriter
+from booklet_cli import main
+from improved_book_ordering import BookletProcessor
+from page_numbers import PageNumberStamps, text_width
+from conftest import create_pdf
+
+
+def number_operations(page):
+    """(x, y, text) of the number drawn on a numbered page."""
+    data = page.get_contents()[-1].get_object().get_data()
+    x, y, text = re.search(rb"([\d.]+) ([\d.]+) Td \((.*)\) Tj", data).groups()
+    return float(x), float(y), text.decode("cp1252")
+
+
+def test_numbers_share_one_font():
+    """Every page gets its number; the font and the q stream are written once"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 12, (420, 595))
+        output_file = os.path.join(tmp, "out.pdf")
+        with redirect_stdout(io.StringIO()):
+            assert BookletProcessor().process_pdf(input_file, 4, 2, output_file)
+
+        pages = PdfReader(output_file).pages
+        fonts = {page["/Resources"]["/Font"].raw_get("/BookletPageNumber").idnum for page in pages}
+        assert len(fonts) == 1
+        assert len({page["/Contents"][0].idnum for page in pages}) == 1
+        for page in pages:
+            x, y, text = number_operations(page)
+            # The source page's own text is still there, with its number
+            assert f"Page {text}" in page.extract_text()
+            assert y == 30 and abs(x + text_width(text, 12) / 2 - 210) < 0.01
+
+
+def test_streamed_signatures_share_one_font():
+    """Streamed without --optimize, every signature uses the first one's font and q stream"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 24, (420, 595))
+        output_file = os.path.join(tmp, "out.pdf")
+        with redirect_stdout(io.StringIO()):
+            assert BookletProcessor().process_pdf(input_file, 8, 2, output_file, streaming=True)
+
+        pages = PdfReader(output_file).pages
+        assert len(pages) == 24
+        fonts = {page["/Resources"]["/Font"].raw_get("/BookletPageNumber").idnum for page in pages}
+        assert len(fonts) == 1
+        assert len({page["/Contents"][0].idnum for page in pages}) == 1
+        assert sorted(int(number_operations(page)[2]) for page in pages) == list(range(1, 25))
+
+
+def test_number_options_checked():
+    """Bad number formats and sizes are refused before any work is done"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 4, (420, 595))
+        output_file = os.path.join(tmp, "out.pdf")
+        log = io.StringIO()
+        with redirect_stdout(log):
+            for options in (["--number-format", "{n.foo}"], ["--number-format", "{n[0]}"],
+                            ["--number-format", "{page}"], ["--number-format", "{n:q}"],
+                            ["--number-size", "0"], ["--number-size", "-3"]):
+                assert main(["impose", input_file, "-s", "4", *options, "-o", output_file]) == 2, options
+        assert "Page number size must be positive, got -3" in log.getvalue()
+        assert not os.path.exists(output_file)
+
+
+def test_positions_and_format():
+    """Outside numbers alternate sides; the format is applied and escaped"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 2, (400, 600))
+        reader = PdfReader(input_file)
+        stamps = PageNumberStamps(PdfWriter(), "(p. {n})", "top-outside", font_size=10, margin=20)
+
+        odd = stamps.number_page(reader.pages[0], 1)
+        even = stamps.number_page(reader.pages[1], 2)
+        x, y, text = number_operations(odd)
+        print(f"  page 1: '{text}' at ({x}, {y})")
+        assert text == "\\(p. 1\\)"
+        assert y == 600 - 20 - 10
+        assert abs(x + text_width("(p. 1)", 10) - (400 - 20)) < 0.01
+        assert number_operations(even)[0] == 20
+
+        # The source pages are untouched
+        assert "/BookletPageNumber" not in reader.pages[0]["/Resources"]["/Font"]
+        assert not isinstance(reader.pages[0]["/Contents"], list)
+
+        try:
+            PageNumberStamps(PdfWriter(), position="middle")
+        except ValueError:
+            pass
+        else:
+            assert False, "unknown positions should be rejected"
+
+
+if __name__ == "__main__":
+    print("Testing page number stamps...")
+    test_numbers_share_one_font()
+    test_streamed_signatures_share_one_font()
+    test_number_options_checked()
+    test_positions_and_format()
+    print("OK Page number stamp tests passed")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test the optimized (deduplicated, object-stream) output
+"""
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader
+from improved_book_ordering import BookletProcessor
+from conftest import create_numbered_pdf, page_fingerprints
+
+
+def impose(input_file, output_file, optimize, **options):
+    processor = BookletProcessor()
+    processor.optimize = optimize
+    log = io.StringIO()
+    with redirect_stdout(log):
+        assert processor.process_pdf(input_file, 16, 2, output_file, **options)
+    return log.getvalue()
+
+
+def test_optimized_output_is_smaller_and_equivalent():
+    """Every mode writes the same pages, smaller, with object and xref streams"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_numbered_pdf(input_file, 40)
+        plain_file = os.path.join(tmp, "plain.pdf")
+        impose(input_file, plain_file, False)
+        expected = page_fingerprints(PdfReader(plain_file).pages)
+
+        for options in ({}, {"streaming": True}, {"workers": 2}):
+            optimized_file = os.path.join(tmp, "optimized.pdf")
+            log = impose(input_file, optimized_file, True, **options)
+            assert "Optimized output: saved" in log
+
+            with open(optimized_file, "rb") as optimized_fp:
+                data = optimized_fp.read()
+            print(f"  {options}: {os.path.getsize(plain_file)} -> {len(data)} bytes")
+            assert data.startswith(b"%PDF-1.5")
+            assert b"/ObjStm" in data and b"/XRef" in data
+            assert len(data) < os.path.getsize(plain_file) * 0.6
+
+            reader = PdfReader(io.BytesIO(data), strict=True)
+            assert page_fingerprints(reader.pages) == expected
+
+
+def test_saving_report():
+    """The reported saving matches a plain write of the same objects"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_numbered_pdf(input_file, 16)
+        processor = BookletProcessor()
+        processor.optimize = True
+        reader = PdfReader(input_file)
+        plan, _ = processor.plan_imposition(16, 16, 2)
+        with redirect_stdout(io.StringIO()):
+            writer = processor.write_plan(reader, plan, 16)
+            # A second copy of the book, from another reader, duplicates its font objects
+            for page in processor.write_plan(PdfReader(input_file), plan, 16).pages:
+                writer.add_page(page)
+
+        plain = io.BytesIO()
+        writer.write(plain)
+        optimized = io.BytesIO()
+        output = processor.write_optimized(writer, optimized, reader.pdf_header)
+        assert output.bytes_written == len(optimized.getvalue())
+        assert abs(output.plain_bytes - len(plain.getvalue())) < len(plain.getvalue()) * 0.02
+        assert output.duplicates_dropped > 0
+
+
+if __name__ == "__main__":
+    test_optimized_output_is_smaller_and_equivalent()
+    test_saving_report()
+    print("OK Optimize tests passed")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test signature-parallel processing of a single document
+"""
+import contextlib
+import io
+import os
+import tempfile
+from PyPDF2 import PdfReader
+from booklet_cli import main
+from improved_book_ordering import BookletProcessor
+from conftest import create_numbered_pdf, page_fingerprints
+
+
+def test_parallel_matches_serial():
+    """Chunks imposed in workers join into the same booklet as a serial run"""
+    processor = BookletProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 37)
+        serial = os.path.join(tmp, "serial.pdf")
+        parallel = os.path.join(tmp, "parallel.pdf")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert processor.process_pdf(input_file, 8, 4, serial)
+            assert processor.process_pdf(input_file, 8, 4, parallel, workers=2)
+
+        print(f"Parallel result: {processor.last_result}")
+        assert processor.last_result["output_pages"] == 40
+        expected = PdfReader(serial).pages
+        actual = PdfReader(parallel, strict=True).pages
+        assert page_fingerprints(actual) == page_fingerprints(expected)
+        assert "8" in actual[0].extract_text()
+
+
+def test_join_shares_resources():
+    """Identical resources from different chunks are written once"""
+    processor = BookletProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 32)
+        chunk_files = []
+        for i in range(3):
+            chunk_files.append(os.path.join(tmp, f"chunk_{i}.pdf"))
+            with contextlib.redirect_stdout(io.StringIO()):
+                processor.process_pdf(input_file, 32, 2, chunk_files[-1])
+
+        with open(os.path.join(tmp, "joined.pdf"), "wb") as output_fp:
+            output = processor.join_chunks(chunk_files, output_fp, "%PDF-1.4")
+
+        print(f"Dropped {output.duplicates_dropped} duplicate objects")
+        assert output.pages_written == 96
+        assert output.duplicates_dropped > 0
+        assert len(PdfReader(os.path.join(tmp, "joined.pdf"), strict=True).pages) == 96
+
+
+def test_impose_command():
+    """The impose command runs a single file without prompts"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 10)
+        output_file = os.path.join(tmp, "out.pdf")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            exit_code = main(["impose", input_file, "-s", "4", "-w", "2", "-o", output_file])
+
+        assert exit_code == 0
+        assert len(PdfReader(output_file).pages) == 12
+
+
+def test_worker_settings_checked():
+    """Worker counts below 1, and streaming combined with workers, are refused"""
+    processor = BookletProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 10)
+        output_file = os.path.join(tmp, "out.pdf")
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            assert not processor.process_pdf(input_file, 4, 2, output_file, workers=0)
+            assert not processor.process_pdf(input_file, 4, 2, output_file, workers=-2)
+            assert not processor.process_pdf(input_file, 4, 2, output_file, streaming=True, workers=2)
+            assert not processor.process_pdf(input_file, 4, 2, output_file, streaming=True, workers=None)
+        assert "Workers must be at least 1, got 0" in log.getvalue()
+        assert "use streaming or workers, not both" in log.getvalue()
+        assert not os.path.exists(output_file)
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            try:
+                main(["impose", input_file, "-s", "4", "-w", "0", "-o", output_file])
+            except SystemExit as e:
+                assert e.code == 2
+            else:
+                assert False, "-w 0 should be rejected"
+
+
+if __name__ == "__main__":
+    test_parallel_matches_serial()
+    test_join_shares_resources()
+    test_impose_command()
+    test_worker_settings_checked()
+    print("OK Parallel tests passed")
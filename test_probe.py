@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test the fast page-count and geometry probe
+"""
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader, PdfWriter
+from booklet_cli import main
+from improved_book_ordering import BookletProcessor
+from pdf_probe import RawPdf, probe_pdf
+from conftest import create_pdf, write_nested_pdf
+
+
+def test_fast_probe():
+    """Page count and boxes come from the page tree, inheritance and object streams included"""
+    with tempfile.TemporaryDirectory() as tmp:
+        nested = os.path.join(tmp, "nested.pdf")
+        write_nested_pdf(nested)
+        result = probe_pdf(nested)
+        print(f"  nested: {result['pages']} pages in {result['seconds'] * 1000:.2f} ms")
+        assert result["method"] == "fast" and result["pages"] == 5 and not result["encrypted"]
+        assert result["media_boxes"] == [[0, 0, 200, 250], [0, 0, 200, 250], [0, 0, 100, 100],
+                                         [0, 0, 300, 400], [0, 0, 300, 400]]
+
+        # Optimized output keeps its pages inside object streams
+        book = os.path.join(tmp, "book.pdf")
+        create_pdf(book, 6, (420, 595))
+        compressed = os.path.join(tmp, "compressed.pdf")
+        processor = BookletProcessor()
+        processor.optimize = True
+        with redirect_stdout(io.StringIO()):
+            assert processor.process_pdf(book, 8, 2, compressed)
+        result = probe_pdf(compressed)
+        assert result["method"] == "fast" and result["version"] == "1.5"
+        assert result["media_boxes"] == [[0, 0, 420, 595]] * 8
+
+
+def test_damaged_and_encrypted():
+    """A broken xref falls back to the full parse; encrypted files stay on the fast path"""
+    with tempfile.TemporaryDirectory() as tmp:
+        book = os.path.join(tmp, "book.pdf")
+        create_pdf(book, 3, (612, 792))
+        with open(book, "rb") as book_fp:
+            data = book_fp.read()
+        damaged = os.path.join(tmp, "damaged.pdf")
+        with open(damaged, "wb") as damaged_fp:
+            start = data.rindex(b"startxref")
+            damaged_fp.write(data[:start] + b"startxref\n99\n%%EOF\n")
+        result = probe_pdf(damaged)
+        assert result["method"] == "full" and result["pages"] == 3
+
+        for password, readable in (("", True), ("secret", False)):
+            writer = PdfWriter()
+            for page in PdfReader(book).pages:
+                writer.add_page(page)
+            writer.encrypt(password, "owner")
+            encrypted = os.path.join(tmp, f"encrypted_{readable}.pdf")
+            with open(encrypted, "wb") as encrypted_fp:
+                writer.write(encrypted_fp)
+            result = probe_pdf(encrypted)
+            print(f"  password {password!r}: {result['pages']} pages, {result['method']}")
+            assert result["encrypted"] and result["method"] == "fast"
+            assert result["pages"] == 3 and result["media_boxes"] == [[0, 0, 612, 792]] * 3
+
+        # Pages packed in object streams would need decrypting: the full parse decides
+        compressed = os.path.join(tmp, "compressed.pdf")
+        processor = BookletProcessor()
+        processor.optimize = True
+        with redirect_stdout(io.StringIO()):
+            assert processor.process_pdf(book, 4, 2, compressed)
+        with open(compressed, "rb") as compressed_fp:
+            raw = RawPdf(compressed_fp.read())
+        assert raw.describe()["pages"] == 4
+        raw.encrypted = True
+        try:
+            raw.describe()
+        except ValueError:
+            pass
+        else:
+            assert False, "encrypted object streams should be refused"
+
+
+def test_probe_command():
+    """probe scans directories and prints JSON"""
+    with tempfile.TemporaryDirectory() as tmp:
+        create_pdf(os.path.join(tmp, "a.pdf"), 2, (612, 792))
+        create_pdf(os.path.join(tmp, "b.pdf"), 5, (595, 842))
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert main(["probe", tmp, "--json"]) == 0
+        results = json.loads(log.getvalue())
+        assert [(os.path.basename(r["path"]), r["pages"]) for r in results] == [("a.pdf", 2), ("b.pdf", 5)]
+
+
+if __name__ == "__main__":
+    test_fast_probe()
+    test_damaged_and_encrypted()
+    test_probe_command()
+    print("OK Probe tests passed")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test reprinting a range of press sheets
+"""
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader
+import document_session
+from booklet_cli import main
+from imposition_plan import imposition_indices, reprint_plan, sheet_bounds, signature_sheets
+from improved_book_ordering import BookletProcessor
+from conftest import create_pdf
+
+LAYOUT = (32, 32, 8)
+
+
+def page_texts(pages):
+    return [page.extract_text().strip() for page in pages]
+
+
+def test_reprint_plan_matches_full_plan():
+    """Every sheet range picks the same entries as the full imposition"""
+    for total_pages, layout, pages_per_sheet in ((70, LAYOUT, 2), (70, LAYOUT, 4), (100, (16,) * 7, 8)):
+        plan = list(imposition_indices(total_pages, layout, pages_per_sheet))
+        bounds = list(sheet_bounds(layout, pages_per_sheet))
+        for first, last in ((1, 1), (2, min(4, len(bounds))), (1, len(bounds)), (len(bounds), len(bounds))):
+            parts = reprint_plan(total_pages, layout, pages_per_sheet, first, last)
+            expected = [page_index for sheet, _, start, end in bounds if first <= sheet <= last
+                        for page_index in plan[start:end]]
+            assert [page_index for _, _, entries in parts for page_index in entries] == expected
+    assert signature_sheets(LAYOUT, 2, 2, 3) == (9, 18)
+
+
+def test_reprint_matches_booklet():
+    """Reprinted sheets equal the booklet's, and only their source pages are read"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 70, (420, 595))
+        for pages_per_sheet, sheet_layout in ((2, False), (4, True)):
+            booklet = os.path.join(tmp, "booklet.pdf")
+            sheets_file = os.path.join(tmp, "sheets.pdf")
+            processor = BookletProcessor()
+            processor.quiet = True
+            processor.sheet_layout = sheet_layout
+            processor.cutting_lines = "both"
+            with redirect_stdout(io.StringIO()):
+                assert processor.process_pdf(input_file, LAYOUT, pages_per_sheet, booklet)
+
+            touched = []
+            original_page = document_session.DocumentSession.page
+
+            def recording_page(session, index):
+                touched.append(index)
+                return original_page(session, index)
+
+            document_session.DocumentSession.page = recording_page
+            try:
+                with redirect_stdout(io.StringIO()):
+                    assert processor.reprint_sheets(input_file, LAYOUT, pages_per_sheet, sheets_file, sheets=(3, 5))
+            finally:
+                document_session.DocumentSession.page = original_page
+
+            parts = reprint_plan(70, LAYOUT, pages_per_sheet, 3, 5)
+            needed = {page_index for _, _, entries in parts for page_index in entries if page_index >= 0}
+            print(f"  {pages_per_sheet} per sheet: {processor.last_result['output_pages']} pages "
+                  f"from {len(set(touched))} of 70 source pages")
+            assert set(touched) - {start for _, start, _ in parts} <= needed
+            assert processor.last_result["source_pages"] == len(needed)
+
+            # Output pages per press sheet: one per slot, or a front and back
+            per_sheet = 2 if sheet_layout else 2 * pages_per_sheet
+            expected = PdfReader(booklet).pages[2 * per_sheet:5 * per_sheet]
+            reprinted = PdfReader(sheets_file).pages
+            assert page_texts(reprinted) == page_texts(expected)
+            assert [page.mediabox for page in reprinted] == [page.mediabox for page in expected]
+
+
+def test_reprint_command():
+    """impose --reprint-signatures writes a whole signature; bad ranges are refused"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 70, (420, 595))
+        output_file = os.path.join(tmp, "last.pdf")
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert main(["impose", input_file, "-s", "32+32+8", "--reprint-signatures", "3",
+                         "-o", output_file]) == 0
+            assert main(["impose", input_file, "-s", "32+32+8", "--reprint-sheets", "9-8"]) == 2
+            assert main(["impose", input_file, "-s", "32+32+8", "--reprint-sheets", "18-19"]) == 1
+        texts = page_texts(PdfReader(output_file).pages)
+        # The 8-page signature holds pages 65-70 and two blanks, still numbered as in the book
+        assert len(texts) == 8 and texts[1].startswith("Page 65") and texts[0] == ""
+        assert "outside the job's 1-18" in log.getvalue()
+
+
+if __name__ == "__main__":
+    print("Testing sheet reprints...")
+    test_reprint_plan_matches_full_plan()
+    test_reprint_matches_booklet()
+    test_reprint_command()
+    print("OK Reprint tests passed")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test the HTTP job service against localhost
+"""
+import asyncio
+import io
+import json
+import os
+import tempfile
+from PyPDF2 import PdfReader
+from booklet_service import BookletService, http_request, run_load
+from conftest import create_numbered_pdf
+
+
+def test_job_lifecycle():
+    """Upload, status, download and delete over HTTP"""
+    async def scenario(tmp, input_file):
+        service = BookletService(os.path.join(tmp, "work"), workers=1)
+        host, port = await service.start()
+        try:
+            status, body = await http_request(host, port, "GET", "/health")
+            assert status == 200 and json.loads(body)["status"] == "ok"
+
+            status, body = await http_request(host, port, "POST", "/jobs?signature_size=8", upload=input_file)
+            assert status == 202
+            job_id = json.loads(body)["id"]
+
+            status, body = await http_request(host, port, "GET", f"/jobs/{job_id}?wait=30")
+            job = json.loads(body)
+            print(f"  {job}")
+            assert job["status"] == "done" and job["pages"] == 10 and job["blank_pages"] == 6
+
+            status, booklet = await http_request(host, port, "GET", f"/jobs/{job_id}/booklet")
+            assert status == 200 and len(PdfReader(io.BytesIO(booklet)).pages) == 16
+
+            status, body = await http_request(host, port, "GET", "/jobs")
+            assert [job["id"] for job in json.loads(body)["jobs"]] == [job_id]
+            assert (await http_request(host, port, "DELETE", f"/jobs/{job_id}"))[0] == 200
+            assert (await http_request(host, port, "GET", f"/jobs/{job_id}"))[0] == 404
+            assert os.listdir(service.work_dir) == []
+
+            assert (await http_request(host, port, "POST", "/jobs?signature_size=6", upload=input_file))[0] == 400
+            assert (await http_request(host, port, "GET", "/nothing"))[0] == 404
+        finally:
+            await service.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_numbered_pdf(input_file, 10)
+        asyncio.run(scenario(tmp, input_file))
+
+
+def test_load_and_limits():
+    """The load generator completes every job even when uploads hit the pending limit"""
+    async def scenario(input_file):
+        service = BookletService(workers=1, max_pending=2)
+        host, port = await service.start()
+        try:
+            report = await run_load(f"http://{host}:{port}", input_file, jobs=6, concurrency=4,
+                                    signature_size=8)
+        finally:
+            await service.close()
+        return report
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_numbered_pdf(input_file, 12)
+        report = asyncio.run(scenario(input_file))
+        print(f"  {report}")
+        assert report["completed"] == 6 and report["failed"] == 0
+        assert report["rejected"] > 0
+        assert report["pages_per_sec"] > 0
+
+
+if __name__ == "__main__":
+    test_job_lifecycle()
+    test_load_and_limits()
+    print("OK Service tests passed")
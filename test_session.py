@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test the open-once document session
+"""
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from PyPDF2 import PdfReader
+import improved_book_ordering
+from document_session import DocumentSession
+from improved_book_ordering import BookletProcessor
+from conftest import create_numbered_pdf, page_fingerprints, write_nested_pdf
+
+
+def test_page_index_matches_reader():
+    """Random access through the session gives the reader's pages, inheritance included"""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "nested.pdf")
+        write_nested_pdf(filename)
+        reader = PdfReader(filename)
+        with DocumentSession(filename) as session:
+            assert len(session.pages) == len(reader.pages) == 5
+            boxes = [tuple(float(v) for v in session.pages[i].mediabox) for i in (4, 0, 2, -1)]
+            print(f"  {boxes}")
+            assert boxes == [(0, 0, 300, 400), (0, 0, 200, 250), (0, 0, 100, 100), (0, 0, 300, 400)]
+            # Compare contents only: PyPDF2's own flattening lets the first
+            # branch's /MediaBox leak into its sibling
+            assert [content for content, _ in page_fingerprints(session.pages)] == \
+                [content for content, _ in page_fingerprints(reader.pages)]
+            assert "/Resources" in session.pages[3]
+
+
+def test_one_parse_per_job():
+    """Counting pages and imposing share one session; a changed file is reopened"""
+    opened = []
+
+    class CountingSession(DocumentSession):
+        def __init__(self, path, strict=False):
+            opened.append(path)
+            super().__init__(path, strict)
+
+    original = improved_book_ordering.DocumentSession
+    improved_book_ordering.DocumentSession = CountingSession
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            input_file = os.path.join(tmp, "book.pdf")
+            create_numbered_pdf(input_file, 10)
+            processor = BookletProcessor()
+
+            for streaming in (False, True):
+                opened.clear()
+                assert len(processor.open_document(input_file).pages) == 10
+                with redirect_stdout(io.StringIO()):
+                    assert processor.process_pdf(input_file, 8, 2, os.path.join(tmp, "out.pdf"),
+                                                 streaming=streaming)
+                assert opened == [input_file]
+                assert processor._session is None
+
+            processor.open_document(input_file)
+            create_numbered_pdf(input_file, 12)
+            assert len(processor.open_document(input_file).pages) == 12
+            assert len(opened) == 3
+            processor.close_document()
+    finally:
+        improved_book_ordering.DocumentSession = original
+
+
+if __name__ == "__main__":
+    test_page_index_matches_reader()
+    test_one_parse_per_job()
+    print("OK Session tests passed")
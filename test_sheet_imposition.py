@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test the N-up sheet imposition engine
+"""
+import contextlib
+import io
+import os
+import tempfile
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import NameObject, NumberObject, RectangleObject
+from improved_book_ordering import BookletProcessor
+from sheet_imposition import NUpImposer, sheet_grid
+from conftest import create_numbered_pdf
+
+
+def test_sheet_grids():
+    """Each row of a sheet is one 2-up booklet sheet"""
+    assert sheet_grid(2) == (1, 2)
+    assert sheet_grid(4) == (2, 2)
+    assert sheet_grid(16) == (8, 2)
+    try:
+        sheet_grid(6)
+    except ValueError as e:
+        print(f"  OK {e}")
+    else:
+        raise AssertionError("6 pages per sheet should be rejected")
+
+
+def test_slot_matrices():
+    """Upright and head-to-head slots land in the right cells"""
+    with tempfile.TemporaryDirectory() as tmp:
+        page = PdfReader(create_numbered_pdf(os.path.join(tmp, "in.pdf"), 1)).pages[0]
+        imposer = NUpImposer(PdfWriter(), 4, head_to_head=True)
+        imposer.cell_size = (612.0, 792.0)
+
+        assert imposer.slot_matrix(page, 0, 0) == (1.0, 0, 0, 1.0, 0.0, 792.0)
+        assert imposer.slot_matrix(page, 0, 1) == (1.0, 0, 0, 1.0, 612.0, 792.0)
+        # Second row is turned around: left page drawn in the right cell
+        assert imposer.slot_matrix(page, 1, 0) == (-1.0, 0, 0, -1.0, 1224.0, 792.0)
+        assert imposer.slot_matrix(page, 1, 1) == (-1.0, 0, 0, -1.0, 612.0, 792.0)
+
+
+def transform(matrix, x, y):
+    """Where ``matrix`` takes the point (x, y)"""
+    a, b, c, d, e, f = matrix
+    return (round(a * x + c * y + e, 6), round(b * x + d * y + f, 6))
+
+
+def test_rotated_and_cropped_pages():
+    """A page is placed as shown: cut to its CropBox and turned by /Rotate"""
+    page = PdfWriter().add_blank_page(300, 500)
+    page.cropbox = RectangleObject([50, 100, 250, 400])
+    page[NameObject("/Rotate")] = NumberObject(90)
+
+    imposer = NUpImposer(PdfWriter(), 2)
+    imposer.add_page(page)
+    # Turned a quarter, the 200 x 300 crop is shown 300 wide and 200 high
+    assert imposer.cell_size == (300.0, 200.0)
+    matrix = imposer.slot_matrix(page, 0, 1)
+    # Turned clockwise, the crop's top left corner ends up top right and its bottom right bottom left
+    assert transform(matrix, 50, 400) == (600.0, 200.0)
+    assert transform(matrix, 250, 100) == (300.0, 0.0)
+
+    xobject = imposer.form_xobject(page).get_object()
+    assert [float(v) for v in xobject["/BBox"]] == [50, 100, 250, 400]
+
+
+def test_four_up_sheets():
+    """Every page becomes one form XObject drawn on a 2x2 sheet"""
+    processor = BookletProcessor()
+    processor.sheet_layout = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 14)
+        output_file = os.path.join(tmp, "sheets.pdf")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert processor.process_pdf(input_file, 8, 4, output_file)
+
+        sheets = PdfReader(output_file, strict=True).pages
+        print(f"  {len(sheets)} sheet sides of {sheets[0].mediabox}")
+        assert len(sheets) == 4
+        assert [float(v) for v in sheets[0].mediabox] == [0, 0, 1224, 1584]
+
+        xobjects = [len(sheet["/Resources"]["/XObject"]) for sheet in sheets]
+        # 14 pages padded to 16: the two blanks leave empty slots
+        assert sum(xobjects) == 14
+        # Front of the first sheet: pattern 7, 0, 5, 2
+        assert sheets[0].extract_text().split() == ["8", "8", "1", "1", "6", "6", "3", "3"]
+
+
+def test_part_used_press_sheets():
+    """A signature's last, part-used press sheet still has a front and a back"""
+    for page_count, pages_per_sheet, front, back in ((12, 4, ["8", "5"], ["6", "7"]),
+                                                     (20, 8, ["12", "9"], ["10", "11"])):
+        processor = BookletProcessor()
+        processor.sheet_layout = True
+        with tempfile.TemporaryDirectory() as tmp:
+            input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), page_count)
+            output_file = os.path.join(tmp, "sheets.pdf")
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert processor.process_pdf(input_file, page_count, pages_per_sheet, output_file)
+
+            sheets = PdfReader(output_file).pages
+            print(f"  {page_count} pages, {pages_per_sheet} per sheet: {len(sheets)} sheet sides")
+            # 3 folded sheets at 2 per press sheet, 5 at 4: two press sheets, four sides
+            assert len(sheets) == 4
+            assert len({tuple(sheet.mediabox) for sheet in sheets}) == 1
+            assert sheets[2].extract_text().split()[::2] == front
+            assert sheets[3].extract_text().split()[::2] == back
+
+
+if __name__ == "__main__":
+    test_sheet_grids()
+    test_slot_matrices()
+    test_rotated_and_cropped_pages()
+    test_four_up_sheets()
+    test_part_used_press_sheets()
+    print("OK Sheet imposition tests passed")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test the plan-only dry run and its JSON sheet map
+"""
+import io
+import json
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+import pdf_probe
+from booklet_cli import main
+from imposition_plan import plan_job, plan_signatures, sheet_map, write_sheet_map
+from conftest import create_pdf
+
+
+def side_pages(side):
+    return [slot["page"] for slot in side]
+
+
+def test_sheet_map_matches_hand_layout():
+    """16 pages, 4 per sheet: the layout verify_sequence.py draws by hand"""
+    plan = sheet_map(16, (16,), 4)
+    assert plan["press_sheets"] == 2 and plan["blank_pages"] == 0
+    first = plan["sheets"][0]
+    assert side_pages(first["front"]) == [16, 1, 14, 3]
+    assert side_pages(first["back"]) == [2, 15, 4, 13]
+    assert [slot["slot"] for slot in first["back"]] == [0, 1, 2, 3]
+    assert side_pages(plan["sheets"][1]["front"]) == [12, 5, 10, 7]
+
+
+def test_blank_slots():
+    """Padding is flagged blank, and a short last press sheet carries fewer slots"""
+    plan = sheet_map(10, (8, 4), 4)
+    last = plan["sheets"][-1]
+    print(f"  sheet {last['sheet']}: front {side_pages(last['front'])}, back {side_pages(last['back'])}")
+    assert last == {"sheet": 2, "signature": 2,
+                    "front": [{"slot": 0, "page": None, "blank": True}, {"slot": 1, "page": 9, "blank": False}],
+                    "back": [{"slot": 0, "page": 10, "blank": False}, {"slot": 1, "page": None, "blank": True}]}
+    pages = sorted(slot["page"] for sheet in plan["sheets"] for side in ("front", "back")
+                   for slot in sheet[side] if not slot["blank"])
+    assert pages == list(range(1, 11))
+
+
+def test_large_job_is_instant():
+    """Mapping a 100k-page job takes milliseconds"""
+    start = time.perf_counter()
+    layout = plan_signatures(100001, 4)
+    output = io.StringIO()
+    summary = write_sheet_map(output, 100001, layout, 4)
+    elapsed = time.perf_counter() - start
+    print(f"  100001 pages: {summary['press_sheets']} press sheets, "
+          f"{len(output.getvalue()) // 1024} KiB of JSON in {elapsed * 1000:.1f} ms")
+    assert elapsed < 0.25
+    plan = json.loads(output.getvalue())
+    assert len(plan["sheets"]) == summary["press_sheets"]
+    assert plan["sheets"][-1]["back"][-1]["blank"]
+
+
+def test_plan_reads_no_content():
+    """The plan command plans from the page tree alone and saves the map"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_pdf(input_file, 70, (420, 595))
+        map_file = os.path.join(tmp, "book.sheets.json")
+
+        # Only the fast probe may run: no full parse, no page content
+        original = pdf_probe._describe_full
+        pdf_probe._describe_full = None
+        try:
+            log = io.StringIO()
+            with redirect_stdout(log):
+                assert main(["plan", input_file, "-s", "auto", "--allowed-sizes", "8", "16", "32",
+                             "--map", map_file]) == 0
+        finally:
+            pdf_probe._describe_full = original
+        assert "70 pages: 3 signature(s) of 32+32+8" in log.getvalue()
+        assert " 2 blank page(s)" in log.getvalue()
+        with open(map_file) as map_fp:
+            assert json.load(map_fp) == sheet_map(70, (32, 32, 8), 2)
+
+        summary = plan_job(70, "auto", 2, (8, 16, 32))
+        assert summary["layout"] == [32, 32, 8] and summary["blank_pages"] == 2
+        with redirect_stdout(io.StringIO()):
+            assert main(["plan", "70", "-s", "32+32+8", "-p", "3"]) == 2
+
+
+if __name__ == "__main__":
+    print("Testing sheet maps...")
+    test_sheet_map_matches_hand_layout()
+    test_blank_slots()
+    test_large_job_is_instant()
+    test_plan_reads_no_content()
+    print("OK Sheet map tests passed")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test the analytic signature pattern generator against the original tables
+"""
+from imposition_plan import signature_pattern, imposition_indices
+
+# The hand-written tables the generator replaces
+ORIGINAL_PATTERNS = {
+    2: {
+        4: [3, 0, 1, 2],
+        8: [7, 0, 1, 6, 5, 2, 3, 4],
+        16: [15, 0, 1, 14, 13, 2, 3, 12, 11, 4, 5, 10, 9, 6, 7, 8],
+        32: [31, 0, 1, 30, 29, 2, 3, 28, 27, 4, 5, 26, 25, 6, 7, 24,
+             23, 8, 9, 22, 21, 10, 11, 20, 19, 12, 13, 18, 17, 14, 15, 16]
+    },
+    4: {
+        4: [3, 0, 1, 2],
+        8: [7, 0, 5, 2, 1, 6, 3, 4],
+        16: [15, 0, 13, 2, 1, 14, 3, 12, 11, 4, 9, 6, 5, 10, 7, 8],
+        32: [31, 0, 29, 2, 1, 30, 3, 28, 27, 4, 25, 6, 5, 26, 7, 24,
+             23, 8, 21, 10, 9, 22, 11, 20, 19, 12, 17, 14, 13, 18, 15, 16]
+    }
+}
+
+
+def test_reproduces_original_tables():
+    """Every original table entry is generated exactly"""
+    for pages_per_sheet, patterns in ORIGINAL_PATTERNS.items():
+        for signature_size, expected in patterns.items():
+            generated = list(signature_pattern(signature_size, pages_per_sheet))
+            status = "OK" if generated == expected else "FAIL"
+            print(f"  {status} {pages_per_sheet} per sheet, sig {signature_size}")
+            assert generated == expected
+
+
+def test_new_sizes_are_permutations():
+    """New signature sizes use every page of the signature exactly once"""
+    for pages_per_sheet in (2, 4, 8, 16):
+        for signature_size in (12, 20, 24, 48, 64):
+            pattern = signature_pattern(signature_size, pages_per_sheet)
+            assert sorted(pattern) == list(range(signature_size))
+
+
+def test_invalid_sizes():
+    """Sizes that cannot be folded are rejected"""
+    for signature_size, pages_per_sheet in [(6, 2), (0, 2), (16, 3), (16, 1)]:
+        try:
+            signature_pattern(signature_size, pages_per_sheet)
+        except ValueError as e:
+            print(f"  OK {signature_size}/{pages_per_sheet}: {e}")
+        else:
+            raise AssertionError(f"{signature_size}/{pages_per_sheet} should be rejected")
+
+
+def test_document_indices():
+    """Whole-document index array marks padding pages with -1"""
+    indices = list(imposition_indices(10, 8, 2))
+    print(f"  10 pages, sig 8: {indices}")
+    assert indices == [7, 0, 1, 6, 5, 2, 3, 4, -1, 8, 9, -1, -1, -1, -1, -1]
+    assert len(imposition_indices(10000, 32, 4)) == 10016
+
+
+if __name__ == "__main__":
+    test_reproduces_original_tables()
+    test_new_sizes_are_permutations()
+    test_invalid_sizes()
+    test_document_indices()
+    print("OK All signature pattern tests passed")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test that the single-pass pipeline matches the old three-writer pipeline
+"""
+import os
+import tempfile
+from PyPDF2 import PdfReader
+from improved_book_ordering import BookletProcessor
+from conftest import create_numbered_pdf, page_fingerprints
+
+
+def test_plan_imposition():
+    """The plan pads with blanks (-1) and follows the signature pattern"""
+    processor = BookletProcessor()
+
+    plan, blanks = processor.plan_imposition(6, 8, 2)
+    print(f"6 pages, sig 8 -> {list(plan)} ({blanks} blank)")
+
+    assert blanks == 2
+    assert list(plan) == [-1, 0, 1, -1, 5, 2, 3, 4]
+
+
+def test_single_pass_matches_three_writers():
+    """write_plan produces the same pages as number -> pad -> reorder"""
+    processor = BookletProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 11)
+
+        for signature_size, pages_per_sheet in [(4, 2), (8, 4), (16, 2)]:
+            reader = PdfReader(input_file)
+            numbered = processor.add_page_numbers(reader)
+            padded, _ = processor.add_blank_pages(numbered, signature_size)
+            expected = processor.reorder_pages(padded, signature_size, pages_per_sheet)
+
+            plan, _ = processor.plan_imposition(len(reader.pages), signature_size, pages_per_sheet)
+            actual = processor.write_plan(PdfReader(input_file), plan, signature_size)
+
+            print(f"sig {signature_size}, {pages_per_sheet} per sheet: {len(actual.pages)} pages")
+            assert page_fingerprints(actual.pages) == page_fingerprints(expected.pages)
+
+
+if __name__ == "__main__":
+    test_plan_imposition()
+    test_single_pass_matches_three_writers()
+    print("OK Single-pass pipeline matches")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test that light commands start without loading the PDF machinery
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from booklet_cli import main
+from conftest import create_pdf
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Run a command line, then list which heavy modules it imported
+LOADED_MODULES = """
+import json, runpy, sys
+sys.argv = sys.argv[1:]
+from contextlib import redirect_stdout
+with redirect_stdout(sys.stderr):
+    try:
+        runpy.run_path(sys.argv[0], run_name="__main__")
+    except SystemExit:
+        pass
+heavy = ("PyPDF2", "reportlab", "improved_book_ordering")
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules if name.split(".")[0] in heavy})))
+"""
+
+
+def loaded_modules(*arguments):
+    completed = subprocess.run([sys.executable, "-c", LOADED_MODULES] + list(arguments), cwd=HERE,
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout)
+
+
+def test_light_commands_skip_pdf_libraries():
+    """probe, plan and --help never import PyPDF2 or ReportLab"""
+    sample = os.path.join(HERE, "test_16_pages.pdf")
+    for arguments in (["booklet_cli.py", "probe", sample], ["booklet_cli.py", "plan", "70", "-s", "auto"],
+                      ["booklet_cli.py", "plan", sample], ["booklet_cli.py", "impose", "--help"]):
+        loaded = loaded_modules(*arguments)
+        print(f"  {' '.join(arguments[1:3])}: {loaded or 'nothing heavy'}")
+        assert loaded == [], arguments
+
+    # Imposing does load them, from the same entry point
+    assert "PyPDF2" in loaded_modules("booklet_cli.py", "impose", os.path.join(HERE, "missing.pdf"))
+
+    # The pipeline module runs the same commands, having loaded them itself
+    completed = subprocess.run([sys.executable, "improved_book_ordering.py", "plan", "70"], cwd=HERE,
+                               capture_output=True, text=True, check=True)
+    assert "70 pages: 5 signature(s)" in completed.stdout
+
+
+def test_plan_command():
+    """plan reports the layout of a page count or a PDF"""
+    log = io.StringIO()
+    with redirect_stdout(log):
+        assert main(["plan", "70", "-s", "auto", "--allowed-sizes", "8", "16", "32"]) == 0
+    assert "3 signature(s) of 32+32+8 pages" in log.getvalue()
+    assert "2 blank page(s), 18 press sheet(s)" in log.getvalue()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "book.pdf")
+        create_pdf(pdf, 10, (612, 792))
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert main(["plan", pdf, "-s", "8", "-p", "4"]) == 0
+            assert main(["plan", "10", "-s", "32+8"]) == 2
+        print(f"  {log.getvalue().splitlines()[0].strip()}")
+        assert "10 pages: 2 signature(s) of 8 pages each" in log.getvalue()
+        assert "6 blank page(s), 2 press sheet(s)" in log.getvalue()
+        assert "Error:" in log.getvalue()
+
+
+if __name__ == "__main__":
+    print("Testing command line startup...")
+    test_light_commands_skip_pdf_libraries()
+    test_plan_command()
+    print("OK Startup tests passed")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test the bounded-memory streaming mode
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from PyPDF2 import PdfReader
+import pdf_stream_writer
+from improved_book_ordering import BookletProcessor
+from conftest import create_numbered_pdf, page_fingerprints
+
+# Run one streaming job in a fresh interpreter and print its peak RSS (KiB)
+PEAK_RSS_SCRIPT = """
+import contextlib, io, resource, sys
+from improved_book_ordering import BookletProcessor
+with contextlib.redirect_stdout(io.StringIO()):
+    ok = BookletProcessor().process_pdf(sys.argv[1], 16, 2, sys.argv[2], streaming=True)
+assert ok
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def peak_rss_kib(input_file, output_file):
+    """Peak RSS of a streaming run, measured in a child process"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-c", PEAK_RSS_SCRIPT, input_file, output_file],
+                            cwd=here, capture_output=True, text=True, check=True)
+    return int(result.stdout.strip())
+
+
+def test_streaming_matches_in_memory():
+    """Streaming mode writes the same pages as the in-memory pipeline"""
+    processor = BookletProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = create_numbered_pdf(os.path.join(tmp, "input.pdf"), 37)
+        in_memory = os.path.join(tmp, "in_memory.pdf")
+        streamed = os.path.join(tmp, "streamed.pdf")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert processor.process_pdf(input_file, 16, 4, in_memory)
+            assert processor.process_pdf(input_file, 16, 4, streamed, streaming=True)
+
+        print(f"Streaming result: {processor.last_result}")
+        assert processor.last_result == {"original_pages": 37, "blank_pages": 11, "output_pages": 48}
+        expected = PdfReader(in_memory).pages
+        actual = PdfReader(streamed, strict=True).pages
+        assert page_fingerprints(actual) == page_fingerprints(expected)
+
+
+def test_streaming_peak_rss_is_flat():
+    """Peak RSS barely moves between a 100-page and a 5,000-page book"""
+    with tempfile.TemporaryDirectory() as tmp:
+        small = create_numbered_pdf(os.path.join(tmp, "small.pdf"), 100)
+        large = create_numbered_pdf(os.path.join(tmp, "large.pdf"), 5000)
+        output_file = os.path.join(tmp, "out.pdf")
+
+        small_rss = peak_rss_kib(small, output_file)
+        large_rss = peak_rss_kib(large, output_file)
+
+        print(f"Peak RSS: 100 pages {small_rss} KiB, 5000 pages {large_rss} KiB")
+        # Only the reader's xref table and the output's offset table grow
+        # with the page count: a few bytes per object.
+        assert large_rss - small_rss < 8 * 1024
+
+
+def test_pdf_writer_internals():
+    """The PdfWriter internals streaming relies on are still there, or output refuses to start"""
+    pdf_stream_writer.check_pdf_writer_internals()
+
+    saved = pdf_stream_writer.PDF_WRITER_INTERNALS
+    pdf_stream_writer.PDF_WRITER_INTERNALS = saved + ("_no_such_internal",)
+    try:
+        pdf_stream_writer.StreamingPdfWriter(io.BytesIO())
+    except RuntimeError as e:
+        print(f"  OK {e}")
+        assert "PdfWriter._no_such_internal" in str(e)
+    else:
+        raise AssertionError("a missing PdfWriter internal should be reported")
+    finally:
+        pdf_stream_writer.PDF_WRITER_INTERNALS = saved
+
+
+if __name__ == "__main__":
+    test_streaming_matches_in_memory()
+    test_streaming_peak_rss_is_flat()
+    test_pdf_writer_internals()
+    print("OK Streaming tests passed")
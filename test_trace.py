@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test stage tracing and quiet mode
+"""
+import io
+import json
+import booklet_trace
+import os
+import tempfile
+from contextlib import redirect_stdout
+from booklet_trace import StageTracer
+from booklet_cli import main
+from improved_book_ordering import BookletProcessor
+from conftest import create_numbered_pdf
+
+
+def test_stage_records():
+    """Every stage of process_pdf is timed, with nested signatures and callbacks"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_numbered_pdf(input_file, 10)
+
+        processor = BookletProcessor()
+        processor.tracer = StageTracer(track_allocations=True)
+        finished = []
+        processor.tracer.add_callback(lambda record: finished.append(record["name"]))
+        with redirect_stdout(io.StringIO()):
+            assert processor.process_pdf(input_file, 4, 2, os.path.join(tmp, "out.pdf"))
+
+        summary = processor.tracer.summary()
+        print(f"  {[(name, round(r['wall_seconds'], 4)) for name, r in summary.items()]}")
+        assert list(summary) == ["read", "plan", "number_and_impose", "serialize"]
+        assert summary["read"]["pages"] == 10 and summary["serialize"]["pages"] == 12
+        assert finished.count("signature") == 3 and finished[-1] == "serialize"
+        for record in processor.tracer.records:
+            assert record["wall_seconds"] >= 0 and record["cpu_seconds"] >= 0
+            assert "allocated_bytes" in record and "peak_allocated_bytes" in record
+        signatures = [r for r in processor.tracer.records if r["name"] == "signature"]
+        assert all(r["depth"] == 1 for r in signatures)
+
+
+def test_trace_export():
+    """The impose command writes JSON records and Chrome trace events"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_numbered_pdf(input_file, 8)
+
+        for trace_format in ("json", "chrome"):
+            trace_file = os.path.join(tmp, f"trace_{trace_format}.json")
+            log = io.StringIO()
+            with redirect_stdout(log):
+                assert main(["impose", input_file, "-s", "4", "-o", os.path.join(tmp, "out.pdf"),
+                             "--quiet", "--trace", trace_file, "--trace-format", trace_format]) == 0
+            assert "Processing signature" not in log.getvalue()
+            assert "Stage timings" in log.getvalue()
+
+            with open(trace_file) as trace_fp:
+                trace = json.load(trace_fp)
+            if trace_format == "json":
+                assert [r["name"] for r in trace["stages"] if r["depth"] == 0] == \
+                    ["read", "plan", "number_and_impose", "serialize"]
+            else:
+                events = trace["traceEvents"]
+                print(f"  {len(events)} trace events")
+                assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+                assert {"read", "signature", "serialize"} <= {e["name"] for e in events}
+
+
+def test_quiet_streaming():
+    """Streaming runs are traced per signature and stay quiet"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "book.pdf")
+        create_numbered_pdf(input_file, 8)
+
+        processor = BookletProcessor()
+        processor.quiet = True
+        processor.tracer = StageTracer()
+        log = io.StringIO()
+        with redirect_stdout(log):
+            assert processor.process_pdf(input_file, 4, 2, os.path.join(tmp, "out.pdf"), streaming=True)
+        assert "1/2" not in log.getvalue()
+        assert list(processor.tracer.summary()) == ["read", "plan", "number_impose_and_serialize"]
+        assert [r["name"] for r in processor.tracer.records].count("signature") == 2
+
+
+def test_without_resource():
+    """Where the resource module is missing, stages still time CPU but carry no RSS"""
+    saved = booklet_trace.resource
+    booklet_trace.resource = None
+    try:
+        tracer = StageTracer()
+        with tracer.stage("read", pages=4):
+            sum(range(10000))
+    finally:
+        booklet_trace.resource = saved
+    record = tracer.records[0]
+    assert record["peak_rss_kib"] is None
+    assert record["cpu_seconds"] >= 0
+
+
+if __name__ == "__main__":
+    test_stage_records()
+    test_trace_export()
+    test_quiet_streaming()
+    test_without_resource()
+    print("OK Trace tests passed")